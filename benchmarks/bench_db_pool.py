@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк пула SQLite-соединений (data/pool.py) против нового соединения на каждый запрос
+Использование: python benchmarks/bench_db_pool.py [--calls 5000] [--db data/database.db]
+Работает на копии базы во временной папке, исходный файл не меняется
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+# Добавляем корневую директорию в путь
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import data.db as db
+
+APPLICATION_QUERY = """
+    SELECT id, tg_id, parent_name, student_name, age, contact, course,
+           lesson_date, lesson_link, status, created_at, reminder_sent
+    FROM applications
+    WHERE tg_id = ?
+    ORDER BY created_at DESC LIMIT 1
+"""
+COURSES_QUERY = "SELECT id, name, description, active FROM courses WHERE active = 1"
+
+
+def measure(func, calls: int) -> float:
+    """Среднее время вызова в микросекундах"""
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def unpooled(db_path: str, query: str, params: tuple = ()):
+    """Поведение до пула: новое соединение на каждый вызов, которое не закрывается явно"""
+    def call():
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        return cursor.fetchall()
+    return call
+
+
+def pooled(query: str, params: tuple = ()):
+    def call():
+        with db.get_read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            return cursor.fetchall()
+    return call
+
+
+def main():
+    """Главная функция"""
+    parser = argparse.ArgumentParser(description="Бенчмарк пула соединений SQLite")
+    parser.add_argument("--calls", type=int, default=5000, help="Число вызовов на каждый запрос")
+    parser.add_argument("--db", default="data/database.db", help="База, копия которой используется")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        if os.path.exists(args.db):
+            shutil.copy(args.db, db_path)
+        db.DB_NAME = db_path
+        db.init_db()
+        db.migrate_database()
+
+        print(f"📊 {args.calls} вызовов, база {args.db}")
+        for name, query, params in (
+            ("get_application_by_tg_id", APPLICATION_QUERY, ("42",)),
+            ("active courses", COURSES_QUERY, ()),
+        ):
+            before = measure(unpooled(db_path, query, params), args.calls)
+            after = measure(pooled(query, params), args.calls)
+            print(f"  {name:<26} без пула {before:7.1f} us/call, с пулом {after:6.1f} us/call")
+        db.close_pool()
+
+
+if __name__ == "__main__":
+    main()
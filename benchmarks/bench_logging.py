@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк задержки хендлера из-за логирования: запись в файл и консоль из потока хендлера
+(как до очереди логов) против DroppingQueueHandler + LogListener
+Использование: python benchmarks/bench_logging.py [--iterations 5000]
+Каждый режим запускается в отдельном процессе дважды: stderr в файл и stderr в читателя,
+который периодически зависает (модель медленного терминала или journald)
+"""
+
+import argparse
+import glob
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Добавляем корневую директорию в путь
+sys.path.append(ROOT)
+
+# Читатель консоли, который каждые 0.5 с зависает на 0.5 с: буфер канала заполняется,
+# и запись в stderr блокируется до следующего чтения
+SLOW_READER = """
+import sys, time
+started = time.monotonic()
+while sys.stdin.buffer.read1(4096):
+    if time.monotonic() - started > 0.5:
+        time.sleep(0.5)
+        started = time.monotonic()
+"""
+
+
+def direct_logger(log_file: str) -> logging.Logger:
+    """Логгер с обработчиками файла и консоли, которые пишут в потоке вызывающего"""
+    from utils.logger import LOG_FORMAT
+    formatter = logging.Formatter(LOG_FORMAT, datefmt='%Y-%m-%d %H:%M:%S')
+    logger = logging.getLogger("bench")
+    logger.setLevel(logging.INFO)
+    for handler in (logging.FileHandler(log_file, encoding='utf-8'), logging.StreamHandler()):
+        handler.setFormatter(formatter)
+        logger.addHandler(handler)
+    return logger
+
+
+def run_worker(mode: str, log_file: str, iterations: int):
+    """Хендлер пишет 3 строки и ждет 1 мс; выводит строку со статистикой задержки вызова"""
+    import utils.logger as logger_module
+    if mode == "queue":
+        logger_module.LOG_FILE = log_file
+        logger = logger_module.setup_logger("bench")
+    else:
+        logger = direct_logger(log_file)
+
+    latencies = []
+    for i in range(iterations):
+        time.sleep(0.001)
+        start = time.perf_counter()
+        logger.info(f"⏱️ handle_my_lesson response time: {0.012:.3f}s user {i}")
+        logger.info(f"📊 Admin activity: {i} - view applications")
+        logger.info(f"USER {i}: open menu - details")
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    if mode == "queue":
+        logger_module.stop_logging()
+    shutdown = time.perf_counter() - start
+    latencies.sort()
+    # Вместе с архивами, если файл успел ротироваться (LOG_MAX_BYTES)
+    written = 0
+    for path in [log_file] + glob.glob(f"{glob.escape(log_file)}.*"):
+        with open(path, encoding='utf-8') as f:
+            written += sum(1 for _ in f)
+    print(f"mean {statistics.mean(latencies) * 1e6:7.0f} us, p50 {latencies[len(latencies) // 2] * 1e6:6.0f} us, "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1e6:8.0f} us, max {latencies[-1] * 1e6:8.0f} us, "
+          f"остановка {shutdown:.2f} s, "
+          f"записано {written}/{iterations * 3}")
+
+
+def run_mode(mode: str, slow_console: bool, iterations: int, tmp: str) -> str:
+    log_file = os.path.join(tmp, f"{mode}_{int(slow_console)}.log")
+    command = [sys.executable, os.path.abspath(__file__), "--worker", mode,
+               "--log-file", log_file, "--iterations", str(iterations)]
+    if slow_console:
+        reader = subprocess.Popen([sys.executable, "-c", SLOW_READER], stdin=subprocess.PIPE)
+        try:
+            result = subprocess.run(command, stdout=subprocess.PIPE, stderr=reader.stdin, text=True, cwd=ROOT)
+        finally:
+            reader.stdin.close()
+            reader.wait()
+    else:
+        with open(os.path.join(tmp, "stderr.log"), "w") as stderr:
+            result = subprocess.run(command, stdout=subprocess.PIPE, stderr=stderr, text=True, cwd=ROOT)
+    # Последняя строка — результат, выше могут быть сообщения о ротации
+    return result.stdout.strip().splitlines()[-1] if result.stdout.strip() else f"❌ код {result.returncode}"
+
+
+def main():
+    """Главная функция"""
+    parser = argparse.ArgumentParser(description="Задержка хендлера из-за логирования")
+    parser.add_argument("--iterations", type=int, default=5000, help="Вызовов хендлера")
+    parser.add_argument("--worker", choices=("direct", "queue"), help=argparse.SUPPRESS)
+    parser.add_argument("--log-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.log_file, args.iterations)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for slow_console in (False, True):
+            console = "stderr в зависающего читателя" if slow_console else "stderr в файл"
+            print(f"📊 {console}, {args.iterations} вызовов по 3 строки")
+            for mode, label in (("direct", "запись в потоке хендлера"), ("queue", "очередь + LogListener")):
+                print(f"  {label:<26} {run_mode(mode, slow_console, args.iterations, tmp)}")
+
+
+if __name__ == "__main__":
+    main()
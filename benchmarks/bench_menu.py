@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк клавиатур: заранее собранные меню и реестр против сборки ReplyKeyboardMarkup на каждый ответ
+Использование: python benchmarks/bench_menu.py [--calls 50000]
+Нужен config.env (как для запуска бота): utils/menu.py берет ADMIN_ID из config
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+# Добавляем корневую директорию в путь
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telebot import apihelper, types
+from config import ADMIN_ID
+from utils import menu
+
+
+def legacy_main_menu():
+    """get_main_menu до перехода на заранее собранные клавиатуры"""
+    markup = types.ReplyKeyboardMarkup(resize_keyboard=True)
+    markup.add("📅 Мое занятие", "📋 Записаться")
+    markup.add("ℹ️ О преподавателе", "💰 Цены и форматы")
+    markup.add("📚 Доступные курсы", "⭐ Отзывы")
+    markup.add("🆘 Обратиться к админу")
+    return markup
+
+
+def legacy_admin_menu():
+    markup = types.ReplyKeyboardMarkup(resize_keyboard=True)
+    markup.row("📋 Список заявок", "📚 Редактировать курсы")
+    markup.row("📝 Управление уроками")
+    markup.add("📨 Обращения пользователей", "📊 Статистика отзывов")
+    markup.add("⬇️ Выгрузить данные")
+    return markup
+
+
+def legacy_appropriate_menu(user_id):
+    return legacy_admin_menu() if str(user_id) == str(ADMIN_ID) else legacy_main_menu()
+
+
+def legacy_confirm_menu(action_type):
+    markup = types.InlineKeyboardMarkup(row_width=2)
+    markup.add(
+        types.InlineKeyboardButton("✅ Да, подтверждаю", callback_data=f"confirm_{action_type}"),
+        types.InlineKeyboardButton("❌ Отмена", callback_data="cancel_action")
+    )
+    return markup
+
+
+def measure(func, calls: int) -> float:
+    """Среднее время вызова в микросекундах"""
+    start = time.perf_counter()
+    for i in range(calls):
+        func(i)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def peak_memory(func, calls: int = 1000) -> int:
+    """Пиковое выделение памяти за calls вызовов"""
+    tracemalloc.start()
+    for i in range(calls):
+        func(i)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    """Главная функция"""
+    parser = argparse.ArgumentParser(description="Бенчмарк сборки и сериализации клавиатур")
+    parser.add_argument("--calls", type=int, default=50000, help="Число вызовов")
+    args = parser.parse_args()
+
+    user_ids = (ADMIN_ID, 1, 2)
+    # Клавиатуры должны сериализоваться в тот же JSON, что и прежние сборщики
+    for user_id in user_ids:
+        assert menu.get_appropriate_menu(user_id).to_json() == legacy_appropriate_menu(user_id).to_json()
+    assert menu.create_confirm_menu("delete_course").to_json() == legacy_confirm_menu("delete_course").to_json()
+
+    # Путь ответа: выбор меню и сериализация, которую telebot делает при отправке
+    def reply_old(i):
+        return apihelper._convert_markup(legacy_appropriate_menu(user_ids[i % 3]))
+
+    def reply_new(i):
+        return apihelper._convert_markup(menu.get_appropriate_menu(user_ids[i % 3]))
+
+    def confirm_old(i):
+        return apihelper._convert_markup(legacy_confirm_menu("delete_course"))
+
+    def confirm_new(i):
+        return apihelper._convert_markup(menu.create_confirm_menu("delete_course"))
+
+    print(f"📊 {args.calls} вызовов, JSON совпадает с прежними сборщиками")
+    print(f"  ответ с меню:        {measure(reply_old, args.calls):6.2f} -> {measure(reply_new, args.calls):5.2f} us, "
+          f"пик памяти за 1000 ответов {peak_memory(reply_old)} -> {peak_memory(reply_new)} B")
+    print(f"  create_confirm_menu: {measure(confirm_old, args.calls):6.2f} -> {measure(confirm_new, args.calls):5.2f} us")
+    print(f"  реестр: {menu.get_markup_registry_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк GCRARateLimiter против прежнего rate limit на списках временных меток в StateManager
+Использование: python benchmarks/bench_rate_limiter.py [--users 100000] [--limit 30]
+Прежний алгоритм воспроизводится на StateManager во временной папке, чтобы посчитать
+и объем записанного журнала
+"""
+
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Добавляем корневую директорию в путь
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from state.backends import MemoryBackend
+from state.state_manager import StateManager
+from utils.rate_limiter import GCRARateLimiter
+
+
+def legacy_check(manager: StateManager, user_id: int, limit: int, now: float) -> bool:
+    """SecurityManager.check_rate_limit до перехода на GCRA: список меток за минуту, две записи в StateManager"""
+    timestamps = [ts for ts in manager.get_rate_limit_data(user_id) if now - ts < 60]
+    manager.set_rate_limit_data(user_id, timestamps)
+    if len(timestamps) >= limit:
+        return False
+    timestamps.append(now)
+    manager.set_rate_limit_data(user_id, timestamps)
+    return True
+
+
+def bench_legacy(users: int, limit: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        storage_file = os.path.join(tmp, "state.json")
+        manager = StateManager(storage_file, backend=MemoryBackend(storage_file), compact_threshold=10 ** 9)
+        now = time.time()
+        start = time.perf_counter()
+        for user_id in range(users):
+            legacy_check(manager, user_id, limit, now)
+        cold = (time.perf_counter() - start) / users * 1e6
+        start = time.perf_counter()
+        for i in range(users):
+            legacy_check(manager, i % 1000, limit, now + 1 + i * 0.0001)
+        hot = (time.perf_counter() - start) / users * 1e6
+        journal = sum(os.path.getsize(path) for path in glob.glob(f"{storage_file}.journal.*"))
+        manager._running = False
+        manager._backend.close()
+    print(f"📊 список + StateManager: {cold:.2f} us/check ({users} разных пользователей), "
+          f"{hot:.2f} us/check (1000 активных), журнал {journal / 1024 / 1024:.1f} MB за {users * 2} проверок")
+
+
+def bench_gcra(users: int, limit: int):
+    now = 1000.0
+    limiter = GCRARateLimiter(limit, 60)
+    start = time.perf_counter()
+    for user_id in range(users):
+        limiter.check(user_id, now=now)
+    cold = (time.perf_counter() - start) / users * 1e6
+    start = time.perf_counter()
+    for i in range(users):
+        limiter.check(i % 1000, now=now + 1)
+    hot = (time.perf_counter() - start) / users * 1e6
+    tracked = len(limiter._tat)
+
+    # Память отдельным проходом: tracemalloc замедляет проверки
+    tracemalloc.start()
+    limiter = GCRARateLimiter(limit, 60)
+    for user_id in range(users):
+        limiter.check(user_id, now=now)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"📊 GCRA: {cold:.2f} us/check ({users} разных пользователей), {hot:.2f} us/check "
+          f"(1000 активных при {tracked} отслеживаемых), ~{current / users:.0f} B/пользователя")
+
+    # Пользователи приходят равномерно за 3 минуты: устаревшие записи вытесняются по ходу проверок
+    limiter = GCRARateLimiter(limit, 60)
+    for user_id in range(users):
+        limiter.check(user_id, now=now + user_id * (180 / users))
+    print(f"📊 GCRA: {users} пользователей за 180 s, отслеживается {len(limiter._tat)}, {limiter.get_stats()}")
+
+
+def main():
+    """Главная функция"""
+    parser = argparse.ArgumentParser(description="Бенчмарк ограничителя частоты запросов")
+    parser.add_argument("--users", type=int, default=100000, help="Число разных пользователей")
+    parser.add_argument("--limit", type=int, default=30, help="Запросов в минуту (RATE_LIMIT_PER_MINUTE)")
+    parser.add_argument("--skip-legacy", action="store_true", help="Не запускать прежний алгоритм")
+    args = parser.parse_args()
+
+    if not args.skip_legacy:
+        bench_legacy(args.users, args.limit)
+    bench_gcra(args.users, args.limit)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк конкурентного доступа к StateManager с MemoryBackend, разделенным на части (STATE_SHARDS)
+Использование: python benchmarks/bench_state.py [--threads 16] [--ops 128000] [--shards 1 16]
+Потоки выполняют get/set_rate_limit_data по своим пользователям. Для каждого числа частей выводятся
+ops/s, доля блокировок, которые пришлось ждать, и суммарное ожидание; затем проверяется, что
+после «падения» без финального сохранения состояние восстанавливается из снимка и журнала
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Добавляем корневую директорию в путь
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from state.backends import MemoryBackend
+from state.state_manager import StateManager
+
+
+class CountingLock:
+    """threading.Lock со счетчиками захватов, ожиданий и времени ожидания"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.contended = 0
+        self.wait = 0.0
+
+    def acquire(self):
+        self.acquired += 1
+        if not self._lock.acquire(False):
+            self.contended += 1
+            start = time.perf_counter()
+            self._lock.acquire()
+            self.wait += time.perf_counter() - start
+
+    def release(self):
+        self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+
+def run(storage_file: str, shards: int, threads: int, ops: int, compact_interval: float) -> dict:
+    backend = MemoryBackend(storage_file, shards=shards)
+    for shard in backend._shards:
+        shard.lock = CountingLock()
+    manager = StateManager(storage_file, backend=backend, compact_threshold=10 ** 9)
+    per_thread = ops // threads
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(index: int):
+        barrier.wait()
+        for i in range(per_thread):
+            user_id = index * 100000 + i % 500
+            data = manager.get_rate_limit_data(user_id)
+            manager.set_rate_limit_data(user_id, data[-29:] + [i])
+
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    for thread in workers:
+        thread.start()
+
+    # Сжатие журнала параллельно с записью: проверяет согласованность снимка по частям
+    running = True
+
+    def compactor():
+        while running:
+            manager._save_state()
+            time.sleep(compact_interval)
+
+    compact_thread = threading.Thread(target=compactor) if compact_interval > 0 else None
+    barrier.wait()
+    start = time.perf_counter()
+    if compact_thread:
+        compact_thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    running = False
+    if compact_thread:
+        compact_thread.join()
+
+    locks = [shard.lock for shard in backend._shards]
+    acquired = sum(lock.acquired for lock in locks)
+    expected = dict(backend.items("rate_limit_data"))
+    # «Падение»: без финального сохранения, восстановление только из снимка и журнала
+    manager._running = False
+    backend.close()
+    reloaded = MemoryBackend(storage_file, shards=shards)
+    restored = StateManager(storage_file, backend=reloaded, compact_threshold=10 ** 9)
+    consistent = dict(reloaded.items("rate_limit_data")) == expected
+    restored._running = False
+    reloaded.close()
+
+    return {
+        "ops_per_sec": per_thread * threads * 2 / elapsed,
+        "contended_pct": sum(lock.contended for lock in locks) / max(1, acquired) * 100,
+        "wait_ms": sum(lock.wait for lock in locks) * 1000,
+        "consistent": consistent
+    }
+
+
+def main():
+    """Главная функция"""
+    parser = argparse.ArgumentParser(description="Конкурентный доступ к StateManager")
+    parser.add_argument("--threads", type=int, default=16, help="Число потоков-обработчиков")
+    parser.add_argument("--ops", type=int, default=128000, help="Всего пар get/set на все потоки")
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 16], help="Числа частей для сравнения")
+    parser.add_argument("--compact-interval", type=float, default=0.05,
+                        help="Интервал сжатия журнала во время записи, секунды (0 — без сжатия)")
+    args = parser.parse_args()
+
+    for shards in args.shards:
+        with tempfile.TemporaryDirectory() as tmp:
+            result = run(os.path.join(tmp, "state.json"), shards, args.threads, args.ops // 2,
+                         args.compact_interval)
+        print(f"📊 shards={shards:2d} threads={args.threads}: {result['ops_per_sec']:,.0f} ops/s, "
+              f"ожиданий блокировки {result['contended_pct']:.2f}%, суммарное ожидание {result['wait_ms']:.0f} ms, "
+              f"восстановление после падения {'✅' if result['consistent'] else '❌'}")
+
+
+if __name__ == "__main__":
+    main()
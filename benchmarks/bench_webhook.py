@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Сравнение пропускной способности long polling и webhook на имитации Telegram Bot API
+Использование: python benchmarks/bench_webhook.py [--rtt 0.02] [--updates 3000] [--send]
+Локальный HTTP-сервер отвечает на getUpdates/sendMessage с задержкой --rtt,
+апдейты обрабатывает тот же UpdateDispatcher, что и в боте
+"""
+
+import argparse
+import collections
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+# Добавляем корневую директорию в путь
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telebot import TeleBot, apihelper
+from services.dispatcher import UpdateDispatcher
+from services.webhook import WebhookServer
+
+CHATS = 200
+# Telegram держит до 40 параллельных соединений к webhook
+WEBHOOK_CONNECTIONS = 40
+TOKEN = "123:abcdefghijklmnopqrstuvwxyzABCDEFGH"
+
+
+def make_update(update_id: int) -> dict:
+    chat_id = update_id % CHATS + 1
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id, "date": 0, "text": f"m{update_id}",
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "u"}
+        }
+    }
+
+
+class FakeTelegram(BaseHTTPRequestHandler):
+    """Минимальный Bot API: getMe, getUpdates (до 100 апдейтов за запрос) и любые send* методы"""
+
+    protocol_version = "HTTP/1.1"
+    rtt = 0.02
+    pending = collections.deque()
+    condition = threading.Condition()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        time.sleep(self.rtt)
+        if "/getUpdates" in self.path:
+            query = self.path.split("?", 1)[1] if "?" in self.path else body.decode()
+            params = {key: value[0] for key, value in parse_qs(query).items()}
+            offset = int(params.get("offset", 0))
+            with self.condition:
+                while self.pending and self.pending[0]["update_id"] < offset:
+                    self.pending.popleft()
+                if not self.pending:
+                    self.condition.wait(min(float(params.get("timeout", 0)), 1))
+                result = list(self.pending)[:100]
+        elif "/getMe" in self.path:
+            result = {"id": 123, "is_bot": True, "first_name": "bench", "username": "bench"}
+        else:
+            result = {"message_id": 1, "date": 0, "chat": {"id": 1, "type": "private"}}
+        data = json.dumps({"ok": True, "result": result}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_bot(total: int, send: bool):
+    bot = TeleBot(TOKEN, threaded=False)
+    done = threading.Event()
+    handled = [0]
+    lock = threading.Lock()
+
+    @bot.message_handler(func=lambda message: True)
+    def handle(message):
+        if send:
+            bot.send_message(message.chat.id, "ok")
+        with lock:
+            handled[0] += 1
+            if handled[0] == total:
+                done.set()
+
+    dispatcher = UpdateDispatcher(bot, workers=16, queue_limit=10000, chat_queue_limit=1000)
+    dispatcher.start()
+    return bot, dispatcher, done
+
+
+def run_polling(total: int, send: bool) -> float:
+    bot, dispatcher, done = make_bot(total, send)
+    with FakeTelegram.condition:
+        FakeTelegram.pending.extend(make_update(i) for i in range(1, total + 1))
+        FakeTelegram.condition.notify_all()
+    start = time.time()
+    threading.Thread(target=lambda: bot.polling(non_stop=True, timeout=1, long_polling_timeout=1),
+                     daemon=True).start()
+    done.wait(120)
+    elapsed = time.time() - start
+    bot.stop_polling()
+    dispatcher.stop()
+    FakeTelegram.pending.clear()
+    return elapsed
+
+
+def run_webhook(total: int, send: bool, batch: int, rtt: float) -> float:
+    bot, dispatcher, done = make_bot(total, send)
+    server = WebhookServer(bot, host="127.0.0.1", port=0, path="/webhook", secret_token="bench")
+    server.start()
+    updates = [make_update(i) for i in range(1, total + 1)]
+    chunks = iter([updates[i:i + batch] for i in range(0, total, batch)])
+    chunks_lock = threading.Lock()
+
+    def sender():
+        conn = http.client.HTTPConnection("127.0.0.1", server.port)
+        while True:
+            with chunks_lock:
+                chunk = next(chunks, None)
+            if chunk is None:
+                break
+            time.sleep(rtt)
+            body = json.dumps(chunk[0] if batch == 1 else chunk).encode()
+            conn.request("POST", "/webhook", body, {"Content-Type": "application/json",
+                                                    "X-Telegram-Bot-Api-Secret-Token": "bench"})
+            conn.getresponse().read()
+        conn.close()
+
+    start = time.time()
+    senders = [threading.Thread(target=sender) for _ in range(WEBHOOK_CONNECTIONS)]
+    for thread in senders:
+        thread.start()
+    done.wait(120)
+    elapsed = time.time() - start
+    for thread in senders:
+        thread.join()
+    server.stop()
+    dispatcher.stop()
+    return elapsed
+
+
+def main():
+    """Главная функция"""
+    parser = argparse.ArgumentParser(description="Long polling против webhook на имитации Bot API")
+    parser.add_argument("--rtt", type=float, default=0.02, help="Сетевая задержка до Telegram, секунды")
+    parser.add_argument("--updates", type=int, default=3000, help="Число апдейтов")
+    parser.add_argument("--batch", type=int, default=20, help="Апдейтов в одном запросе для пакетного webhook")
+    parser.add_argument("--send", action="store_true", help="Хендлер отвечает через sendMessage")
+    args = parser.parse_args()
+
+    FakeTelegram.rtt = args.rtt
+    telegram = ThreadingHTTPServer(("127.0.0.1", 0), FakeTelegram)
+    telegram.daemon_threads = True
+    threading.Thread(target=telegram.serve_forever, daemon=True).start()
+    apihelper.API_URL = f"http://127.0.0.1:{telegram.server_address[1]}/bot{{0}}/{{1}}"
+
+    label = f"RTT {args.rtt * 1000:.0f} ms"
+    for name, run in (
+        ("polling", lambda: run_polling(args.updates, args.send)),
+        ("webhook", lambda: run_webhook(args.updates, args.send, 1, args.rtt)),
+        (f"webhook batch {args.batch}", lambda: run_webhook(args.updates, args.send, args.batch, args.rtt)),
+    ):
+        elapsed = run()
+        print(f"{label} {name:<18} {args.updates / elapsed:8.0f} updates/s ({elapsed:.2f} s)")
+    telegram.shutdown()
+
+
+if __name__ == "__main__":
+    main()
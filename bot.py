@@ -2,15 +2,21 @@
 """
 ВАЖНО:
 - Не запускайте несколько экземпляров этого бота одновременно (ни на одном, ни на разных компьютерах/серверах).
-- Не используйте одновременно polling и webhook! В этом проекте используется только polling (bot.infinity_polling).
+- Не используйте одновременно polling и webhook! Режим выбирается в config.py (BOT_MODE=polling | webhook).
 - Если бот запускается автоматически (systemd, планировщик задач, автозапуск), убедитесь, что нет дубликатов.
 - Если видите ошибку 409 Conflict — завершите все лишние процессы python с этим ботом.
 """
 from telebot import TeleBot
-from config import API_TOKEN, CHECK_INTERVAL
-from data.db import init_db, migrate_database
+from config import API_TOKEN, CHECK_INTERVAL, BOT_MODE
+from data.db import init_db, migrate_database, close_pool
 from services.monitor import init_review_monitor, stop_review_monitor, init_lesson_reminder_monitor, stop_lesson_reminder_monitor
-from utils.logger import setup_logger, log_bot_startup, log_bot_shutdown, log_error
+from services.dispatcher import init_update_dispatcher, stop_update_dispatcher, get_update_dispatcher
+from services.webhook import init_webhook_server, stop_webhook_server
+from services.outbound import init_outbound_queue, outbound_queue
+from services.router import init_message_router, get_message_router
+from services.export import init_export_worker, stop_export_worker, get_export_worker
+from utils.logger import setup_logger, log_bot_startup, log_bot_shutdown, log_error, stop_logging, get_logging_stats
+from utils.security_logger import security_logger, init_security_event_store, stop_security_event_store
 from utils.exceptions import (
     BotException, DatabaseException, ConfigurationException, 
     TelegramAPIException, handle_exception
@@ -35,9 +41,13 @@ logger = setup_logger('bot')
 def signal_handler(signum, frame):
     """Обработчик сигналов для корректного завершения работы"""
     logger.info(f"Received signal {signum}, shutting down...")
+    stop_webhook_server()
+    stop_update_dispatcher()
+    stop_export_worker()
     stop_review_monitor()
     stop_lesson_reminder_monitor()
     log_bot_shutdown(logger)
+    stop_security_event_store()
     
     # Безопасная остановка FSM
     try:
@@ -45,6 +55,14 @@ def signal_handler(signum, frame):
     except Exception as e:
         logger.warning(f"Ошибка при остановке FSM: {e}")
     
+    # Закрываем соединения с БД
+    try:
+        close_pool()
+    except Exception as e:
+        logger.warning(f"Ошибка при закрытии пула соединений БД: {e}")
+    
+    # Дописываем очередь логов до выхода
+    stop_logging()
     sys.exit(0)
 
 # Регистрируем обработчики сигналов
@@ -53,9 +71,13 @@ signal.signal(signal.SIGTERM, signal_handler)
 
 # Инициализация бота и БД
 try:
-    # Улучшенная инициализация бота с настройками
+    # Хендлеры выполняются в воркерах диспетчера (services/dispatcher.py),
+    # поэтому собственный пул потоков TeleBot не нужен
     bot = TeleBot(API_TOKEN, parse_mode="HTML", threaded=False)
     
+    # Все исходящие сообщения проходят через очередь с лимитами Telegram
+    init_outbound_queue(bot)
+    
     # Инициализируем БД
     init_db()
     
@@ -75,6 +97,9 @@ try:
     else:
         logger.warning("⚠️ Database migration failed, but bot will continue")
     
+    # События безопасности пишутся в таблицу security_events фоновым потоком
+    init_security_event_store()
+    
     logger.info("✅ Bot and database initialized successfully")
 except Exception as e:
     error_msg = handle_exception(e, logger, "Bot initialization")
@@ -135,15 +160,16 @@ def log_system_stats():
     """Периодически логирует статистику системы"""
     import time
     import psutil
-    from data.db import get_pending_applications, get_assigned_applications
+    from data.db import get_pending_applications_page, get_assigned_applications_page
     
     while True:
         try:
             time.sleep(3600)  # Каждые 60 минут
             
             # Статистика БД
-            pending_apps = len(get_pending_applications())
-            assigned_apps = len(get_assigned_applications())
+            # Счетчики из COUNT(*) страницы, без выборки всех заявок
+            pending_apps = get_pending_applications_page(limit=1).total
+            assigned_apps = get_assigned_applications_page(limit=1).total
             
             # Статистика системы
             memory_usage = psutil.Process().memory_info().rss / 1024 / 1024  # МБ
@@ -154,6 +180,17 @@ def log_system_stats():
             logger.info(f"💾 Memory usage: {memory_usage:.1f} MB, CPU: {cpu_percent:.1f}%")
             logger.info(f"📊 Daily stats: {pending_apps + assigned_apps} total applications in system")
             
+            # Статистика диспетчера апдейтов
+            dispatcher = get_update_dispatcher()
+            if dispatcher:
+                logger.info(f"📨 Dispatcher stats: {dispatcher.get_stats()}")
+            logger.info(f"📤 Outbound queue stats: {outbound_queue.get_stats()}")
+            logger.info(f"🔀 Router stats: {get_message_router().get_stats()}")
+            if get_export_worker():
+                logger.info(f"📊 Export stats: {get_export_worker().get_stats()}")
+            logger.info(f"🔒 Security events stats: {security_logger.events.get_stats()}")
+            logger.info(f"📝 Logging stats: {get_logging_stats()}")
+            
         except Exception as e:
             logger.error(f"Error in system stats logging: {e}")
 
@@ -183,6 +220,10 @@ def periodic_database_integrity_check():
             else:
                 logger.info("✅ Периодическая проверка целостности БД пройдена успешно")
             
+            # Индекс блокировок должен совпадать с хранилищами
+            from utils.ban_index import ban_index
+            ban_index.verify()
+            
         except Exception as e:
             logger.error(f"Error in database integrity check: {e}")
 
@@ -210,6 +251,16 @@ try:
 except Exception as e:
     logger.warning(f"⚠️ Failed to clear old rate limit data: {e}")
 
+# Загрузка индекса блокировок (StateManager + contacts)
+try:
+    from utils.ban_index import init_ban_index
+    init_ban_index()
+except Exception as e:
+    logger.error(f"❌ Failed to load ban index: {e}")
+
+# Маршрутизатор точных текстов и команд регистрируется первым хендлером TeleBot
+init_message_router(bot)
+
 # Регистрация всех обработчиков с обработкой ошибок
 try:
     # Сначала регистрируем админские обработчики (включая /start для админа)
@@ -265,22 +316,54 @@ def fallback_handler(message):
     except Exception as e:
         logger.error(f"Error in fallback handler: {e}")
 
+# Отчет о дублирующихся и перекрытых маршрутах
+try:
+    get_message_router().report()
+except Exception as e:
+    logger.warning(f"⚠️ Failed to build routing report: {e}")
+
+# Запуск диспетчера апдейтов: параллельная обработка с сохранением порядка внутри чата
+try:
+    init_update_dispatcher(bot)
+    logger.info("✅ Update dispatcher started")
+except Exception as e:
+    logger.error(f"❌ Failed to start update dispatcher, updates will be processed sequentially: {e}")
+
+# Выгрузки выполняются в отдельном потоке, не занимая воркеры диспетчера
+try:
+    init_export_worker(bot)
+except Exception as e:
+    logger.error(f"❌ Failed to start export worker, exports will run in handler threads: {e}")
+
 # Логируем запуск бота
 log_bot_startup(logger)
 
 
 # Запуск бота с улучшенной обработкой ошибок
 try:
-    logger.info("🚀 Starting bot polling...")
-    bot.infinity_polling(timeout=60, long_polling_timeout=60)
+    if BOT_MODE == "webhook":
+        logger.info("🚀 Starting webhook server...")
+        init_webhook_server(bot).serve_forever()
+    else:
+        logger.info("🚀 Starting bot polling...")
+        bot.infinity_polling(timeout=60, long_polling_timeout=60)
 except KeyboardInterrupt:
     logger.info("⚠️ Bot stopped by user (Ctrl+C)")
+    stop_webhook_server()
+    stop_update_dispatcher()
+    stop_export_worker()
     log_bot_shutdown(logger)
+    stop_security_event_store()
     # Останавливаем StateManager
     try:
         state_manager.stop()
     except Exception as e:
         logger.warning(f"Ошибка при остановке FSM: {e}")
+    try:
+        close_pool()
+    except Exception as e:
+        logger.warning(f"Ошибка при закрытии пула соединений БД: {e}")
+    stop_logging()
 except Exception as e:
     # Обработка ошибки 409 (Conflict: terminated by other getUpdates request)
     if isinstance(e, telebot.apihelper.ApiTelegramException) and '409' in str(e):
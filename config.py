@@ -41,19 +41,58 @@ ADMIN_ID = validate_admin_id(
 
 # Database Configuration
 DB_NAME = os.getenv("DB_NAME", "data/database.db")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_HEALTH_CHECK_INTERVAL = int(os.getenv("DB_HEALTH_CHECK_INTERVAL", "60"))
+DB_STORAGE_PROFILE = os.getenv("DB_STORAGE_PROFILE", "wal")  # legacy | wal | wal_durable
+
+# State Storage Configuration
+STATE_BACKEND = os.getenv("STATE_BACKEND", "memory")  # memory | sqlite
+STATE_DB_PATH = os.getenv("STATE_DB_PATH", "state/state.db")
+STATE_CACHE_SIZE = int(os.getenv("STATE_CACHE_SIZE", "10000"))
+STATE_SHARDS = int(os.getenv("STATE_SHARDS", "16"))  # Части memory-бэкенда со своими блокировками
+STATE_USER_DATA_TTL = int(os.getenv("STATE_USER_DATA_TTL", "86400"))  # Незавершенные диалоги, сек
+STATE_RATE_LIMIT_TTL = int(os.getenv("STATE_RATE_LIMIT_TTL", "3600"))
 
 # Logging Configuration
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 LOG_FILE = os.getenv("LOG_FILE", "bot.log")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))  # Записей в очереди логов; сверх лимита отбрасываются
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", "1048576"))  # Ротация bot.log и security.log по размеру
+LOG_ROTATE_INTERVAL = int(os.getenv("LOG_ROTATE_INTERVAL", "0"))  # И по времени, сек; 0 — только по размеру
+LOG_MODE = os.getenv("LOG_MODE", "text")  # text | json (JSON-строки в файлах, см. utils/log_query.py)
 
 # Monitoring Configuration
 CHECK_INTERVAL = int(os.getenv("CHECK_INTERVAL", "60"))
 
+# Update Source Configuration
+BOT_MODE = os.getenv("BOT_MODE", "polling")  # polling | webhook
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")  # Публичный HTTPS-адрес (например, за reverse proxy)
+WEBHOOK_SECRET_TOKEN = os.getenv("WEBHOOK_SECRET_TOKEN", "")
+WEBHOOK_MAX_BODY = int(os.getenv("WEBHOOK_MAX_BODY", "1048576"))
+
+# Dispatcher Configuration
+DISPATCHER_WORKERS = int(os.getenv("DISPATCHER_WORKERS", "8"))
+DISPATCHER_QUEUE_LIMIT = int(os.getenv("DISPATCHER_QUEUE_LIMIT", "1000"))
+DISPATCHER_CHAT_QUEUE_LIMIT = int(os.getenv("DISPATCHER_CHAT_QUEUE_LIMIT", "50"))
+
+# Outbound Queue Configuration (лимиты Telegram: ~30 сообщений/сек всего, ~1/сек в один чат)
+OUTBOUND_GLOBAL_RATE = float(os.getenv("OUTBOUND_GLOBAL_RATE", "30"))
+OUTBOUND_CHAT_RATE = float(os.getenv("OUTBOUND_CHAT_RATE", "1"))
+OUTBOUND_CHAT_BURST = int(os.getenv("OUTBOUND_CHAT_BURST", "5"))
+OUTBOUND_MAX_RETRIES = int(os.getenv("OUTBOUND_MAX_RETRIES", "3"))
+
 # Security Configuration
 MAX_MESSAGE_LENGTH = int(os.getenv("MAX_MESSAGE_LENGTH", "1000"))
 MAX_NAME_LENGTH = int(os.getenv("MAX_NAME_LENGTH", "50"))
 RATE_LIMIT_PER_MINUTE = int(os.getenv("RATE_LIMIT_PER_MINUTE", "30"))
 BAN_THRESHOLD = int(os.getenv("BAN_THRESHOLD", "5"))
+SECURITY_EVENT_FLUSH_INTERVAL = float(os.getenv("SECURITY_EVENT_FLUSH_INTERVAL", "1"))  # Сброс буфера событий в БД, сек
+SECURITY_EVENT_BUFFER_LIMIT = int(os.getenv("SECURITY_EVENT_BUFFER_LIMIT", "1000"))
+SECURITY_EVENT_RETENTION_DAYS = int(os.getenv("SECURITY_EVENT_RETENTION_DAYS", "90"))
 
 # Проверяем наличие всех критических переменных при импорте
 def validate_all_config():
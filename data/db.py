@@ -1,10 +1,156 @@
-import sqlite3
+import threading
 from datetime import datetime
 import re
 import os
+from collections import OrderedDict, namedtuple
+from data.pool import ConnectionPool
+
+# Опциональный импорт config для случаев, когда dotenv/config.env недоступны (utils/db_check.py)
+try:
+    from config import DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_HEALTH_CHECK_INTERVAL, DB_STORAGE_PROFILE
+except (ImportError, ValueError):
+    DB_POOL_SIZE = 8
+    DB_POOL_TIMEOUT = 10
+    DB_HEALTH_CHECK_INTERVAL = 60
+    DB_STORAGE_PROFILE = "wal"
 
 DB_NAME = "data/database.db"
 
+# Профили хранилища: PRAGMA для соединения писателя и для соединений читателей
+STORAGE_PROFILES = {
+    # Классический rollback-журнал (поведение до перехода на WAL)
+    "legacy": {
+        "writer": {"journal_mode": "DELETE", "synchronous": "FULL", "busy_timeout": 5000},
+        "reader": {"busy_timeout": 5000},
+    },
+    # WAL: читатели не блокируют писателя, писатель не блокирует читателей
+    "wal": {
+        "writer": {"journal_mode": "WAL", "synchronous": "NORMAL", "cache_size": -16000,
+                   "temp_store": "MEMORY", "busy_timeout": 5000},
+        "reader": {"cache_size": -16000, "mmap_size": 67108864,
+                   "temp_store": "MEMORY", "busy_timeout": 5000},
+    },
+    # WAL с fsync на каждый коммит — медленнее, но без потери последних транзакций при сбое питания
+    "wal_durable": {
+        "writer": {"journal_mode": "WAL", "synchronous": "FULL", "cache_size": -16000,
+                   "temp_store": "MEMORY", "busy_timeout": 5000},
+        "reader": {"cache_size": -16000, "mmap_size": 67108864,
+                   "temp_store": "MEMORY", "busy_timeout": 5000},
+    },
+}
+
+_pool = None
+_read_pool = None
+_pool_lock = threading.Lock()
+
+# Подписчики на изменение даты урока: callback(app_id, lesson_ts или None)
+_lesson_listeners = []
+
+def add_lesson_listener(callback):
+    """Подписывает callback на назначение, перенос и архивирование уроков"""
+    if callback not in _lesson_listeners:
+        _lesson_listeners.append(callback)
+
+def remove_lesson_listener(callback):
+    """Отписывает callback от изменений уроков"""
+    if callback in _lesson_listeners:
+        _lesson_listeners.remove(callback)
+
+def _notify_lesson_changed(app_id, lesson_ts):
+    for callback in list(_lesson_listeners):
+        try:
+            callback(app_id, lesson_ts)
+        except Exception as e:
+            print(f"⚠️ Ошибка в подписчике изменений урока: {e}")
+
+# Подписчики на блокировку пользователя через обращения (индекс банов)
+_ban_listeners = []
+
+def add_ban_listener(callback):
+    """Подписывает callback(user_tg_id, reason) на блокировку пользователя через обращения"""
+    if callback not in _ban_listeners:
+        _ban_listeners.append(callback)
+
+def _notify_user_banned(user_tg_id, reason):
+    for callback in list(_ban_listeners):
+        try:
+            callback(user_tg_id, reason)
+        except Exception as e:
+            print(f"⚠️ Ошибка в подписчике блокировок: {e}")
+
+# Подписчики на очистку обращений: вместе со строками пропадают и блокировки через обращения
+_contacts_cleared_listeners = []
+
+def add_contacts_cleared_listener(callback):
+    """Подписывает callback() на очистку таблицы contacts"""
+    if callback not in _contacts_cleared_listeners:
+        _contacts_cleared_listeners.append(callback)
+
+def _notify_contacts_cleared():
+    for callback in list(_contacts_cleared_listeners):
+        try:
+            callback()
+        except Exception as e:
+            print(f"⚠️ Ошибка в подписчике очистки обращений: {e}")
+
+# Кэш профилей пользователя для проверки возможности записи (tg_id -> профиль)
+PROFILE_CACHE_SIZE = 4096
+_profile_cache = OrderedDict()
+_profile_lock = threading.Lock()
+_profile_generation = 0     # Растет при каждой инвалидации: устаревший результат чтения не попадет в кэш
+
+# Каталог курсов: снимок таблицы courses, пересобирается после изменений
+_courses_lock = threading.Lock()
+_courses_version = 0
+_course_catalog = None
+
+
+class CourseCatalog:
+    """Неизменяемый снимок каталога курсов: строки (id, name, description, active) по убыванию id"""
+
+    def __init__(self, version, rows):
+        self.version = version
+        self.courses = tuple(rows)
+        self.active = tuple(c for c in self.courses if c[3])
+        self.by_id = {c[0]: c for c in self.active}
+        self.id_by_name = {c[1]: c[0] for c in self.active}
+
+
+def get_course_catalog():
+    """Возвращает актуальный снимок каталога курсов (запрос к БД — только после изменений)"""
+    global _course_catalog
+    with _courses_lock:
+        if _course_catalog is not None:
+            return _course_catalog
+        version = _courses_version
+
+    with get_read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, name, description, active FROM courses ORDER BY id DESC")
+        catalog = CourseCatalog(version, cursor.fetchall())
+
+    with _courses_lock:
+        # Если каталог успели изменить во время чтения, снимок не кэшируем
+        if version == _courses_version:
+            _course_catalog = catalog
+    return catalog
+
+def _invalidate_course_catalog():
+    global _courses_version, _course_catalog
+    with _courses_lock:
+        _courses_version += 1
+        _course_catalog = None
+
+def invalidate_user_profile(tg_id=None):
+    """Сбрасывает кэшированный профиль пользователя (None — всех)"""
+    global _profile_generation
+    with _profile_lock:
+        _profile_generation += 1
+        if tg_id is None:
+            _profile_cache.clear()
+        else:
+            _profile_cache.pop(str(tg_id), None)
+
 def parse_date_string(date_str):
     """Парсит строку даты в формате 'DD.MM HH:MM' в datetime объект"""
     if not date_str or date_str == 'None':
@@ -36,6 +182,32 @@ def parse_date_string(date_str):
         print(f"⚠️ Не удалось распарсить дату '{date_str}': {e}")
         return None
 
+def parse_lesson_datetime(value):
+    """Разбирает lesson_date в том виде, в котором он хранится в БД"""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        pass
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M:%S.%f"):
+        try:
+            return datetime.strptime(value, fmt)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+def lesson_date_to_timestamp(value):
+    """Переводит lesson_date в epoch-секунды (локальное время) для колонки lesson_ts"""
+    dt = parse_lesson_datetime(value)
+    if dt is None and isinstance(value, str):
+        # Старые записи могли сохраниться как введено: 'DD.MM HH:MM'. Год — как в
+        # parse_date_string: прошедшая дата относится к следующему году
+        dt = parse_date_string(value.strip())
+    return int(dt.timestamp()) if dt else None
+
 def format_date_for_display(dt):
     """Форматирует datetime объект для отображения в формате 'DD.MM HH:MM'"""
     if not dt:
@@ -49,10 +221,62 @@ def format_date_for_display(dt):
     
     return dt.strftime("%d.%m %H:%M")
 
+def get_storage_profile():
+    """Возвращает PRAGMA выбранного профиля хранилища"""
+    profile = STORAGE_PROFILES.get(DB_STORAGE_PROFILE)
+    if profile is None:
+        print(f"⚠️ Неизвестный профиль хранилища '{DB_STORAGE_PROFILE}', используется 'wal'")
+        profile = STORAGE_PROFILES["wal"]
+    return profile
+
+def get_pool():
+    """Возвращает пул писателя: одно соединение, все записи идут последовательно"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    DB_NAME,
+                    max_size=1,
+                    timeout=DB_POOL_TIMEOUT,
+                    health_check_interval=DB_HEALTH_CHECK_INTERVAL,
+                    pragmas=get_storage_profile()["writer"]
+                )
+    return _pool
+
+def get_read_pool():
+    """Возвращает пул соединений только для чтения (создается при первом обращении)"""
+    global _read_pool
+    if _read_pool is None:
+        # Писатель должен первым открыть файл: он создает БД и включает журнал
+        with get_connection():
+            pass
+        with _pool_lock:
+            if _read_pool is None:
+                _read_pool = ConnectionPool(
+                    DB_NAME,
+                    max_size=DB_POOL_SIZE,
+                    timeout=DB_POOL_TIMEOUT,
+                    health_check_interval=DB_HEALTH_CHECK_INTERVAL,
+                    pragmas=get_storage_profile()["reader"],
+                    read_only=True
+                )
+    return _read_pool
+
 def get_connection():
-    import os
-    path = os.path.abspath(DB_NAME)
-    return sqlite3.connect(DB_NAME)
+    """Арендует соединение писателя. Использовать только как `with get_connection() as conn:`"""
+    return get_pool().connection()
+
+def get_read_connection():
+    """Арендует соединение только для чтения. Использовать как `with get_read_connection() as conn:`"""
+    return get_read_pool().connection()
+
+def close_pool():
+    """Закрывает все соединения пулов (вызывается при остановке бота)"""
+    with _pool_lock:
+        for pool in (_pool, _read_pool):
+            if pool is not None:
+                pool.close()
 
 def check_database_integrity():
     """
@@ -60,7 +284,7 @@ def check_database_integrity():
     Возвращает: (is_ok, error_message)
     """
     try:
-        with get_connection() as conn:
+        with get_read_connection() as conn:
             cursor = conn.cursor()
             
             # Проверяем целостность БД
@@ -91,6 +315,34 @@ def check_database_integrity():
         return False, error_msg
 
 
+EXPORT_WATERMARKS_TABLE = """
+    CREATE TABLE IF NOT EXISTS export_watermarks (
+        dataset TEXT PRIMARY KEY,
+        key_value TEXT,
+        key_id INTEGER,
+        exported_at DATETIME DEFAULT (datetime('now', 'localtime')),
+        rows INTEGER
+    )
+"""
+
+# События безопасности (utils/security_logger.py): отчет — GROUP BY по (event_type, ts),
+# выгрузка — диапазон по ts
+SECURITY_EVENTS_TABLE = """
+    CREATE TABLE IF NOT EXISTS security_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts INTEGER NOT NULL,
+        event_type TEXT NOT NULL,
+        level TEXT,
+        user_id INTEGER,
+        username TEXT,
+        details TEXT
+    )
+"""
+SECURITY_EVENTS_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_security_events_type_ts ON security_events(event_type, ts)",
+    "CREATE INDEX IF NOT EXISTS idx_security_events_ts ON security_events(ts)",
+)
+
 def init_db():
     with get_connection() as conn:
         cursor = conn.cursor()
@@ -109,7 +361,8 @@ def init_db():
                 created_at DATETIME DEFAULT (datetime('now', 'localtime')),
                 reminder_sent BOOLEAN DEFAULT 0,
                 review_request_sent BOOLEAN DEFAULT 0,
-                last_admin_notification DATETIME
+                last_admin_notification DATETIME,
+                lesson_ts INTEGER
             )
         """)
         
@@ -119,7 +372,17 @@ def init_db():
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_applications_lesson_date ON applications(lesson_date)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_applications_created_at ON applications(created_at)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_applications_course ON applications(course)")
-        
+        # Ключи страниц (…, created_at, id): заявки без даты и обращения по статусу
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_applications_lesson_created ON applications(lesson_date, created_at)")
+        # Выборки напоминаний и запросов отзывов по диапазону lesson_ts. В старой БД колонок
+        # еще нет: их и индексы добавит migrate_database
+        cursor.execute("PRAGMA table_info(applications)")
+        columns = [row[1] for row in cursor.fetchall()]
+        if 'lesson_ts' in columns:
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_applications_reminder ON applications(reminder_sent, lesson_ts)")
+            if 'review_request_sent' in columns:
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_applications_review ON applications(review_request_sent, lesson_ts)")
+
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS courses (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -152,6 +415,7 @@ def init_db():
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_contacts_status ON contacts(status)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_contacts_created_at ON contacts(created_at)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_contacts_banned ON contacts(banned)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_contacts_status_created ON contacts(status, created_at)")
         
         # Таблица отзывов
         cursor.execute("""
@@ -198,6 +462,9 @@ def init_db():
         if 'archived_at' not in columns:
             cursor.execute("ALTER TABLE archive ADD COLUMN archived_at DATETIME")
             cursor.execute("UPDATE archive SET archived_at = datetime('now', 'localtime') WHERE archived_at IS NULL")
+        # archive_application раньше не заполнял archived_at, а это первый столбец ключа
+        # списка архива: (NULL, id) < (?, ?) не дает строк, и листание обрывается
+        cursor.execute("UPDATE archive SET archived_at = datetime('now', 'localtime') WHERE archived_at IS NULL")
         
         # Индексы для archive
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_archive_tg_id ON archive(tg_id)")
@@ -205,6 +472,13 @@ def init_db():
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_archive_archived_at ON archive(archived_at)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_archive_cancelled_by ON archive(cancelled_by)")
         
+        # Водяные знаки выгрузок: ключ последней выгруженной строки по каждому набору
+        cursor.execute(EXPORT_WATERMARKS_TABLE)
+        
+        cursor.execute(SECURITY_EVENTS_TABLE)
+        for index_sql in SECURITY_EVENTS_INDEXES:
+            cursor.execute(index_sql)
+        
         conn.commit()
 
 
@@ -232,9 +506,10 @@ def add_application(tg_id, parent_name, student_name, age, contact, course):
             VALUES (?, ?, ?, ?, ?, ?, ?)
         """, (tg_id, parent_name, student_name, age, contact, course, 'Ожидает'))
         conn.commit()
+    invalidate_user_profile(tg_id)
 
 def get_application_by_tg_id(tg_id):
-    with get_connection() as conn:
+    with get_read_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("""
             SELECT id, tg_id, parent_name, student_name, age, contact, course, 
@@ -245,18 +520,219 @@ def get_application_by_tg_id(tg_id):
         """, (tg_id,))
         return cursor.fetchone()
 
-def get_pending_applications():
-    with get_connection() as conn:
+def get_user_profile(tg_id):
+    """
+    Профиль для проверки возможности записи за один запрос: последняя заявка
+    (id ... created_at, те же индексы, что у get_application_by_tg_id) и счетчики архива.
+    Кэшируется до изменения заявок или архива пользователя.
+    """
+    tg_id = str(tg_id)
+    with _profile_lock:
+        profile = _profile_cache.get(tg_id)
+        if profile is not None:
+            _profile_cache.move_to_end(tg_id)
+            return profile
+        generation = _profile_generation
+
+    with get_read_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("""
-            SELECT id, tg_id, parent_name, student_name, age, contact, course, 
-                   lesson_date, lesson_link, status, created_at, reminder_sent
-            FROM applications
-            WHERE lesson_date IS NULL AND lesson_link IS NULL
-            ORDER BY created_at DESC
-        """)
+            SELECT app.id, app.tg_id, app.parent_name, app.student_name, app.age, app.contact, app.course,
+                   app.lesson_date, app.lesson_link, app.status, app.created_at,
+                   counters.total, counters.cancelled, counters.finished
+            FROM (
+                SELECT COUNT(*) AS total,
+                       COALESCE(SUM(status IN ('Заявка отменена', 'Урок отменён')), 0) AS cancelled,
+                       COALESCE(SUM(status = 'Завершено'), 0) AS finished
+                FROM archive WHERE tg_id = ?
+            ) AS counters
+            LEFT JOIN (
+                SELECT id, tg_id, parent_name, student_name, age, contact, course,
+                       lesson_date, lesson_link, status, created_at
+                FROM applications
+                WHERE tg_id = ?
+                ORDER BY created_at DESC LIMIT 1
+            ) AS app ON 1
+        """, (tg_id, tg_id))
+        row = cursor.fetchone()
+
+    profile = {
+        "application": row[:11] if row[0] is not None else None,
+        "archive_count": row[11],
+        "cancelled_count": row[12],
+        "finished_count": row[13]
+    }
+    with _profile_lock:
+        if generation == _profile_generation:
+            _profile_cache[tg_id] = profile
+            if len(_profile_cache) > PROFILE_CACHE_SIZE:
+                _profile_cache.popitem(last=False)
+    return profile
+
+# Страница списка: строки в порядке показа, всего строк в выборке (None, если не считали),
+# есть ли соседние страницы и ключи первой и последней строки для перехода к ним
+Page = namedtuple("Page", ["rows", "total", "has_prev", "has_next", "first", "last"])
+
+# Списочный запрос: SELECT ... FROM, условия с параметрами, COUNT(*) по тем же условиям,
+# столбцы ключа, их позиции в строке и направление показа
+ListQuery = namedtuple("ListQuery", ["select_sql", "where", "params", "count_sql", "keys", "key_index", "descending"])
+
+# Строк на странице списков в админ-панели
+PAGE_SIZE = 5
+
+# Строк в одной пачке потоковой выборки
+STREAM_BATCH_SIZE = 500
+
+_APPLICATION_SELECT = """SELECT id, tg_id, parent_name, student_name, age, contact, course,
+                                lesson_date, lesson_link, status, created_at, reminder_sent
+                         FROM applications"""
+_CONTACT_SELECT = """SELECT id, user_tg_id, user_contact, message, admin_reply, status,
+                            created_at, reply_at, banned, ban_reason
+                     FROM contacts"""
+
+# Ключ (created_at, id) уникален и совпадает с порядком показа; id — алиас rowid,
+# поэтому индекс по created_at уже упорядочен по (created_at, id).
+# Заявки без даты идут по idx_applications_lesson_created, открытые обращения —
+# по idx_contacts_status_created
+PENDING_APPLICATIONS = ListQuery(
+    _APPLICATION_SELECT, ["lesson_date IS NULL", "lesson_link IS NULL"], [],
+    "SELECT COUNT(*) FROM applications WHERE lesson_date IS NULL AND lesson_link IS NULL",
+    ("created_at", "id"), (10, 0), True
+)
+ASSIGNED_APPLICATIONS = ListQuery(
+    _APPLICATION_SELECT, ["lesson_date IS NOT NULL", "lesson_link IS NOT NULL"], [],
+    "SELECT COUNT(*) FROM applications WHERE lesson_date IS NOT NULL AND lesson_link IS NOT NULL",
+    ("created_at", "id"), (10, 0), True
+)
+ALL_APPLICATIONS = ListQuery(
+    _APPLICATION_SELECT, [], [], "SELECT COUNT(*) FROM applications",
+    ("created_at", "id"), (10, 0), True
+)
+ALL_ARCHIVE = ListQuery(
+    """SELECT id, tg_id, parent_name, student_name, age, contact, course,
+              lesson_date, lesson_link, status, created_at, archived_at,
+              cancelled_by, comment
+       FROM archive""",
+    [], [], "SELECT COUNT(*) FROM archive",
+    ("archived_at", "id"), (11, 0), True
+)
+OPEN_CONTACTS = ListQuery(
+    _CONTACT_SELECT, ["status = ?"], ["Ожидает ответа"],
+    "SELECT COUNT(*) FROM contacts WHERE status = ?",
+    ("created_at", "id"), (6, 0), False
+)
+ALL_CONTACTS = ListQuery(
+    _CONTACT_SELECT, [], [], "SELECT COUNT(*) FROM contacts",
+    ("created_at", "id"), (6, 0), True
+)
+ALL_REVIEWS = ListQuery(
+    """SELECT r.id, r.rating, r.feedback, r.is_anonymous,
+              COALESCE(a.parent_name, ar.parent_name) as parent_name,
+              COALESCE(a.student_name, ar.student_name) as student_name,
+              COALESCE(a.course, ar.course) as course,
+              r.created_at, r.user_tg_id
+       FROM reviews r
+       LEFT JOIN applications a ON r.application_id = a.id
+       LEFT JOIN archive ar ON r.application_id = ar.id""",
+    [], [], "SELECT COUNT(*) FROM reviews",
+    ("r.created_at", "r.id"), (7, 0), True
+)
+
+def _since(query, key):
+    """
+    Тот же список, но только строки с ключом больше key, по возрастанию ключа.
+    Условие (created_at, id) > (?, ?) идет диапазоном по индексу, поэтому и выборка,
+    и COUNT(*) стоят пропорционально числу новых строк, а не размеру таблицы
+    """
+    if key is None:
+        return query
+    where = list(query.where) + [f"({', '.join(query.keys)}) > ({', '.join('?' for _ in query.keys)})"]
+    params = list(query.params) + list(key)
+    return query._replace(
+        where=where, params=params, descending=False,
+        count_sql=f"SELECT COUNT(*) FROM ({query.select_sql} WHERE {' AND '.join(where)})"
+    )
+
+def _order_by(query, descending):
+    direction = "DESC" if descending else "ASC"
+    return ", ".join(f"{key} {direction}" for key in query.keys)
+
+def _fetch_all(query):
+    """Весь список одним запросом (для небольших таблиц; массовым потребителям — _stream)"""
+    where_sql = f"WHERE {' AND '.join(query.where)}" if query.where else ""
+    with get_read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"{query.select_sql} {where_sql} ORDER BY {_order_by(query, query.descending)}", query.params)
         return cursor.fetchall()
 
+def _fetch_page(cursor, query, after=None, before=None, limit=PAGE_SIZE, with_total=True):
+    """
+    Keyset-пагинация: страница после ключа after или перед ключом before в порядке показа.
+    Ключ — кортеж значений query.keys, условие (created_at, id) < (?, ?) идет диапазоном
+    по индексу. Читается limit + 1 строк — лишняя строка показывает, есть ли следующая
+    страница; OFFSET и выборка всей таблицы не нужны
+    """
+    conditions = list(query.where)
+    page_params = list(query.params)
+    backward = before is not None
+    cursor_key = before if backward else after
+    if cursor_key is not None:
+        # Назад — в обратную сторону от ключа
+        operator = "<" if query.descending != backward else ">"
+        placeholders = ", ".join("?" for _ in query.keys)
+        conditions.append(f"({', '.join(query.keys)}) {operator} ({placeholders})")
+        page_params.extend(cursor_key)
+    where_sql = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    cursor.execute(
+        f"{query.select_sql} {where_sql} ORDER BY {_order_by(query, query.descending != backward)} LIMIT ?",
+        page_params + [limit + 1]
+    )
+    rows = cursor.fetchall()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    total = None
+    if with_total:
+        cursor.execute(query.count_sql, query.params)
+        total = cursor.fetchone()[0]
+    if backward:
+        rows.reverse()
+        has_prev, has_next = more, True
+    else:
+        has_prev, has_next = after is not None, more
+    first = tuple(rows[0][i] for i in query.key_index) if rows else None
+    last = tuple(rows[-1][i] for i in query.key_index) if rows else None
+    return Page(rows, total, has_prev, has_next, first, last)
+
+def _page(query, after=None, before=None, limit=PAGE_SIZE):
+    with get_read_connection() as conn:
+        return _fetch_page(conn.cursor(), query, after, before, limit)
+
+def _stream(query, batch_size=STREAM_BATCH_SIZE):
+    """
+    Генератор строк списка пачками по batch_size. Соединение берется из пула на каждую
+    пачку и возвращается до yield, память не зависит от размера таблицы
+    """
+    after = None
+    while True:
+        with get_read_connection() as conn:
+            page = _fetch_page(conn.cursor(), query, after=after, limit=batch_size, with_total=False)
+        yield from page.rows
+        if not page.has_next:
+            return
+        after = page.last
+
+def get_pending_applications():
+    """Заявки без даты урока, новые первыми"""
+    return _fetch_all(PENDING_APPLICATIONS)
+
+def get_pending_applications_page(after=None, before=None, limit=PAGE_SIZE):
+    """Страница заявок без даты урока, новые первыми"""
+    return _page(PENDING_APPLICATIONS, after, before, limit)
+
+def iter_pending_applications(batch_size=STREAM_BATCH_SIZE):
+    """Поток заявок без даты урока"""
+    return _stream(PENDING_APPLICATIONS, batch_size)
+
 def update_application_lesson(app_id, lesson_date, lesson_link):
     with get_connection() as conn:
         cursor = conn.cursor()
@@ -267,29 +743,29 @@ def update_application_lesson(app_id, lesson_date, lesson_link):
             if parsed_date is None:
                 raise ValueError(f"Неверный формат даты: {lesson_date}")
             lesson_date = parsed_date
+        lesson_ts = lesson_date_to_timestamp(lesson_date)
         
         cursor.execute("""
             UPDATE applications
-            SET lesson_date = ?, lesson_link = ?, status = 'Назначено' 
+            SET lesson_date = ?, lesson_ts = ?, lesson_link = ?, status = 'Назначено' 
             WHERE id = ?
-        """, (lesson_date, lesson_link, app_id))
+        """, (lesson_date, lesson_ts, lesson_link, app_id))
+        cursor.execute("SELECT tg_id FROM applications WHERE id = ?", (app_id,))
+        row = cursor.fetchone()
         conn.commit()
+    if row:
+        invalidate_user_profile(row[0])
+    _notify_lesson_changed(app_id, lesson_ts)
 
 # === КУРСЫ ===
 # === КУРСЫ ===
 
 def get_active_courses():
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, name, description, active FROM courses WHERE active = 1 ORDER BY id DESC")
-        return cursor.fetchall()
+    return list(get_course_catalog().active)
 
 
 def get_all_courses():
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, name, description, active FROM courses ORDER BY id DESC")
-        return cursor.fetchall()
+    return list(get_course_catalog().courses)
 
 def add_course(name, description):
     with get_connection() as conn:
@@ -299,12 +775,14 @@ def add_course(name, description):
             VALUES (?, ?, 1)
         """, (name, description))
         conn.commit()
+    _invalidate_course_catalog()
 
 def delete_course(course_id):
     with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("DELETE FROM courses WHERE id = ?", (course_id,))
         conn.commit()
+    _invalidate_course_catalog()
 
 def update_course(course_id, new_name, new_description):
     with get_connection() as conn:
@@ -314,6 +792,7 @@ def update_course(course_id, new_name, new_description):
             WHERE id = ?
         """, (new_name, new_description, course_id))
         conn.commit()
+    _invalidate_course_catalog()
 
 def toggle_course_active(course_id):
     with get_connection() as conn:
@@ -324,6 +803,7 @@ def toggle_course_active(course_id):
             WHERE id = ?
         """, (course_id,))
         conn.commit()
+    _invalidate_course_catalog()
 
 def clear_courses():
     """Очищает все курсы"""
@@ -331,6 +811,7 @@ def clear_courses():
         cursor = conn.cursor()
         cursor.execute("DELETE FROM courses")
         conn.commit()
+    _invalidate_course_catalog()
 
 
 
@@ -340,11 +821,12 @@ def clear_applications():
         cursor = conn.cursor()
         cursor.execute("DELETE FROM applications")
         conn.commit()
+    invalidate_user_profile()
 
 
 
 def get_application_by_id(app_id):
-    with get_connection() as conn:
+    with get_read_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("""
             SELECT id, tg_id, parent_name, student_name, age, contact, course, 
@@ -353,18 +835,29 @@ def get_application_by_id(app_id):
         """, (app_id,))
         return cursor.fetchone()
 
-
-def get_assigned_applications():
-    with get_connection() as conn:
+def get_application_with_lesson_ts(app_id):
+    """Заявка в формате get_application_by_id и сохраненный lesson_ts последним полем"""
+    with get_read_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("""
             SELECT id, tg_id, parent_name, student_name, age, contact, course, 
-                   lesson_date, lesson_link, status, created_at, reminder_sent
-            FROM applications
-            WHERE lesson_date IS NOT NULL AND lesson_link IS NOT NULL
-            ORDER BY created_at DESC
-        """)
-        return cursor.fetchall()
+                   lesson_date, lesson_link, status, created_at, reminder_sent, lesson_ts
+            FROM applications WHERE id = ?
+        """, (app_id,))
+        return cursor.fetchone()
+
+
+def get_assigned_applications():
+    """Заявки с назначенным уроком, новые первыми"""
+    return _fetch_all(ASSIGNED_APPLICATIONS)
+
+def get_assigned_applications_page(after=None, before=None, limit=PAGE_SIZE):
+    """Страница заявок с назначенным уроком, новые первыми"""
+    return _page(ASSIGNED_APPLICATIONS, after, before, limit)
+
+def iter_assigned_applications(batch_size=STREAM_BATCH_SIZE):
+    """Поток заявок с назначенным уроком"""
+    return _stream(ASSIGNED_APPLICATIONS, batch_size)
 
 def archive_application(app_id: int, cancelled_by="user", comment="", archived_status="Заявка отменена"):
     with get_connection() as conn:
@@ -383,9 +876,9 @@ def archive_application(app_id: int, cancelled_by="user", comment="", archived_s
                 INSERT INTO archive (
                     tg_id, parent_name, student_name, age, contact, course,
                     lesson_date, lesson_link, status, created_at,
-                    cancelled_by, comment
+                    cancelled_by, comment, archived_at
                 )
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now', 'localtime'))
             """, (
                 row[1], row[2], row[3], row[4], row[5], row[6],
                 row[7], row[8], archived_status, row[10],
@@ -403,14 +896,16 @@ def archive_application(app_id: int, cancelled_by="user", comment="", archived_s
         # Удаляем из applications
         cursor.execute("DELETE FROM applications WHERE id = ?", (app_id,))
         conn.commit()
-        return True
+    invalidate_user_profile(row[1])
+    _notify_lesson_changed(app_id, None)
+    return True
 
 
 
 
 
 def get_archive_count_by_tg_id(tg_id):
-    with get_connection() as conn:
+    with get_read_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT COUNT(*) FROM archive WHERE tg_id = ?", (tg_id,))
         return cursor.fetchone()[0]
@@ -421,6 +916,7 @@ def clear_archive():
         cursor = conn.cursor()
         cursor.execute("DELETE FROM archive")
         conn.commit()
+    invalidate_user_profile()
 
 def validate_date_format(date_str):
     """Проверяет, соответствует ли строка даты правильному формату 'DD.MM HH:MM'"""
@@ -474,30 +970,31 @@ def validate_date_format(date_str):
 
 def get_all_applications():
     """Возвращает все заявки из таблицы applications."""
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT id, tg_id, parent_name, student_name, age, contact, course, 
-                   lesson_date, lesson_link, status, created_at, reminder_sent
-            FROM applications ORDER BY created_at DESC
-        """)
-        return cursor.fetchall()
+    return _fetch_all(ALL_APPLICATIONS)
+
+def get_all_applications_page(after=None, before=None, limit=PAGE_SIZE, since=None):
+    """Страница всех заявок, новые первыми; since — только строки новее ключа выгрузки, по возрастанию"""
+    return _page(_since(ALL_APPLICATIONS, since), after, before, limit)
+
+def iter_all_applications(batch_size=STREAM_BATCH_SIZE, since=None):
+    """Поток всех заявок; since — только строки новее ключа выгрузки, по возрастанию"""
+    return _stream(_since(ALL_APPLICATIONS, since), batch_size)
 
 def get_all_archive():
     """Возвращает все записи из архива."""
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT id, tg_id, parent_name, student_name, age, contact, course,
-                   lesson_date, lesson_link, status, created_at, archived_at, 
-                   cancelled_by, comment
-            FROM archive ORDER BY archived_at DESC
-        """)
-        return cursor.fetchall()
+    return _fetch_all(ALL_ARCHIVE)
+
+def get_all_archive_page(after=None, before=None, limit=PAGE_SIZE, since=None):
+    """Страница архива, последние архивированные первыми; since — только строки новее ключа выгрузки, по возрастанию"""
+    return _page(_since(ALL_ARCHIVE, since), after, before, limit)
+
+def iter_all_archive(batch_size=STREAM_BATCH_SIZE, since=None):
+    """Поток записей архива; since — только строки новее ключа выгрузки, по возрастанию"""
+    return _stream(_since(ALL_ARCHIVE, since), batch_size)
 
 def get_cancelled_count_by_tg_id(tg_id):
     """Возвращает количество отменённых заявок и уроков пользователя (статусы 'Заявка отменена', 'Урок отменён')."""
-    with get_connection() as conn:
+    with get_read_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("""
             SELECT COUNT(*) FROM archive 
@@ -507,7 +1004,7 @@ def get_cancelled_count_by_tg_id(tg_id):
 
 def get_finished_count_by_tg_id(tg_id):
     """Возвращает количество завершённых уроков пользователя (статус 'Завершено')."""
-    with get_connection() as conn:
+    with get_read_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("""
             SELECT COUNT(*) FROM archive 
@@ -527,7 +1024,7 @@ def add_contact(user_tg_id, user_contact, message):
         return cursor.lastrowid
 
 def get_last_contact_time(user_tg_id):
-    with get_connection() as conn:
+    with get_read_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("""
             SELECT created_at FROM contacts 
@@ -538,30 +1035,31 @@ def get_last_contact_time(user_tg_id):
         return row[0] if row else None
 
 def get_open_contacts():
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT id, user_tg_id, user_contact, message, admin_reply, status, 
-                   created_at, reply_at, banned, ban_reason
-            FROM contacts 
-            WHERE status = 'Ожидает ответа' 
-            ORDER BY created_at ASC
-        """)
-        return cursor.fetchall()
+    """Обращения, ожидающие ответа, старые первыми"""
+    return _fetch_all(OPEN_CONTACTS)
+
+def get_open_contacts_page(after=None, before=None, limit=PAGE_SIZE):
+    """Страница обращений, ожидающих ответа, старые первыми"""
+    return _page(OPEN_CONTACTS, after, before, limit)
+
+def iter_open_contacts(batch_size=STREAM_BATCH_SIZE):
+    """Поток обращений, ожидающих ответа"""
+    return _stream(OPEN_CONTACTS, batch_size)
 
 def get_all_contacts():
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT id, user_tg_id, user_contact, message, admin_reply, status, 
-                   created_at, reply_at, banned, ban_reason
-            FROM contacts 
-            ORDER BY created_at DESC
-        """)
-        return cursor.fetchall()
+    """Все обращения, новые первыми"""
+    return _fetch_all(ALL_CONTACTS)
+
+def get_all_contacts_page(after=None, before=None, limit=PAGE_SIZE, since=None):
+    """Страница всех обращений, новые первыми; since — только строки новее ключа выгрузки, по возрастанию"""
+    return _page(_since(ALL_CONTACTS, since), after, before, limit)
+
+def iter_all_contacts(batch_size=STREAM_BATCH_SIZE, since=None):
+    """Поток всех обращений; since — только строки новее ключа выгрузки, по возрастанию"""
+    return _stream(_since(ALL_CONTACTS, since), batch_size)
 
 def get_contact_by_id(contact_id):
-    with get_connection() as conn:
+    with get_read_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("""
             SELECT id, user_tg_id, user_contact, message, admin_reply, status, 
@@ -607,20 +1105,17 @@ def ban_user_by_contact(user_tg_id, reason=None):
                 WHERE user_tg_id = ?
             """, (user_tg_id,))
         conn.commit()
+    _notify_user_banned(user_tg_id, reason)
 
-def is_user_banned(user_tg_id):
-    with get_connection() as conn:
+def get_banned_contact_user_ids():
+    """Возвращает множество tg_id пользователей, заблокированных через обращения"""
+    with get_read_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT banned FROM contacts 
-            WHERE user_tg_id = ? 
-            ORDER BY created_at DESC LIMIT 1
-        """, (user_tg_id,))
-        row = cursor.fetchone()
-        return bool(row[0]) if row else False
+        cursor.execute("SELECT DISTINCT user_tg_id FROM contacts WHERE banned = 1")
+        return {int(row[0]) for row in cursor.fetchall() if str(row[0]).lstrip('-').isdigit()}
 
 def get_ban_reason(user_tg_id):
-    with get_connection() as conn:
+    with get_read_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("""
             SELECT ban_reason FROM contacts 
@@ -635,44 +1130,36 @@ def clear_contacts():
         cursor = conn.cursor()
         cursor.execute("DELETE FROM contacts")
         conn.commit()
+    _notify_contacts_cleared()
 
 def get_upcoming_lessons(minutes=30):
     """Возвращает заявки, у которых урок через <=minutes и напоминание не отправлено"""
-    import datetime
-    now = datetime.datetime.now()
-    with get_connection() as conn:
+    now_ts = int(datetime.now().timestamp())
+    with get_read_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("""
             SELECT id, tg_id, parent_name, student_name, age, contact, course, 
                    lesson_date, lesson_link, status, created_at, reminder_sent
             FROM applications
-            WHERE lesson_date IS NOT NULL
+            WHERE reminder_sent = 0
+              AND lesson_ts > ? AND lesson_ts <= ?
               AND lesson_link IS NOT NULL
-              AND reminder_sent = 0
-        """)
-        rows = cursor.fetchall()
-        result = []
-        for row in rows:
-            lesson_date = row[7]  # lesson_date - индекс 7
-            if not lesson_date:
-                continue
-            dt = None
-            try:
-                dt = datetime.datetime.fromisoformat(lesson_date)
-            except Exception as e:
-                try:
-                    dt = datetime.datetime.strptime(lesson_date, "%Y-%m-%d %H:%M:%S")
-                except Exception as e2:
-                    try:
-                        dt = datetime.datetime.strptime(lesson_date, "%Y-%m-%d %H:%M:%S.%f")
-                    except Exception as e3:
-                        continue
-            if not dt:
-                continue
-            delta = (dt - now).total_seconds() / 60
-            if 0 < delta <= minutes:
-                result.append(row)
-        return result
+            ORDER BY lesson_ts
+        """, (now_ts, now_ts + minutes * 60))
+        return cursor.fetchall()
+
+def get_pending_reminders():
+    """Возвращает (id, lesson_ts) будущих уроков, по которым напоминание еще не отправлено"""
+    with get_read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, lesson_ts
+            FROM applications
+            WHERE reminder_sent = 0
+              AND lesson_ts > ?
+              AND lesson_link IS NOT NULL
+        """, (int(datetime.now().timestamp()),))
+        return cursor.fetchall()
 
 def mark_reminder_sent(app_id):
     with get_connection() as conn:
@@ -695,7 +1182,7 @@ def add_review(application_id, user_tg_id, rating, feedback, is_anonymous=False)
 
 def get_reviews_for_publication(limit=10):
     """Возвращает отзывы для публикации (с рейтингом >= 7)"""
-    with get_connection() as conn:
+    with get_read_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("""
             SELECT r.rating, r.feedback, r.is_anonymous, 
@@ -711,7 +1198,7 @@ def get_reviews_for_publication(limit=10):
 
 def get_reviews_for_publication_with_deleted(limit=10):
     """Возвращает отзывы для публикации (с рейтингом >= 7), включая удаленные заявки"""
-    with get_connection() as conn:
+    with get_read_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("""
             SELECT r.rating, r.feedback, r.is_anonymous, 
@@ -730,24 +1217,102 @@ def get_reviews_for_publication_with_deleted(limit=10):
 
 def get_all_reviews():
     """Возвращает все отзывы для админа (даже если заявка удалена)"""
+    return _fetch_all(ALL_REVIEWS)
+
+def get_all_reviews_page(after=None, before=None, limit=PAGE_SIZE, since=None):
+    """Страница всех отзывов для админа, новые первыми; since — только строки новее ключа выгрузки, по возрастанию"""
+    return _page(_since(ALL_REVIEWS, since), after, before, limit)
+
+def iter_all_reviews(batch_size=STREAM_BATCH_SIZE, since=None):
+    """Поток всех отзывов для админа; since — только строки новее ключа выгрузки, по возрастанию"""
+    return _stream(_since(ALL_REVIEWS, since), batch_size)
+
+SECURITY_EVENTS = ListQuery(
+    "SELECT id, ts, event_type, level, user_id, username, details FROM security_events",
+    [], [], "SELECT COUNT(*) FROM security_events",
+    ("ts", "id"), (1, 0), False
+)
+
+def add_security_events(events):
+    """Пишет пачку событий безопасности одной транзакцией: (ts, event_type, level, user_id, username, details)"""
     with get_connection() as conn:
+        conn.executemany(
+            "INSERT INTO security_events (ts, event_type, level, user_id, username, details) VALUES (?, ?, ?, ?, ?, ?)",
+            events
+        )
+        conn.commit()
+
+def _security_events_where(since_ts, exclude_admin_id):
+    where, params = ["ts >= ?"], [int(since_ts)]
+    if exclude_admin_id is not None:
+        # Действия самого админа в отчет не попадают
+        where.append("NOT (event_type = 'ADMIN_ACTION' AND user_id IS ?)")
+        params.append(int(exclude_admin_id))
+    return where, params
+
+def count_security_events(since_ts, event_types=None, exclude_admin_id=None):
+    """Число событий каждого типа начиная с since_ts (epoch): {event_type: count}"""
+    where, params = _security_events_where(since_ts, exclude_admin_id)
+    if event_types:
+        where.append(f"event_type IN ({', '.join('?' for _ in event_types)})")
+        params.extend(event_types)
+    with get_read_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT r.id, r.rating, r.feedback, r.is_anonymous, 
-                   COALESCE(a.parent_name, ar.parent_name) as parent_name,
-                   COALESCE(a.student_name, ar.student_name) as student_name,
-                   COALESCE(a.course, ar.course) as course,
-                   r.created_at, r.user_tg_id
-            FROM reviews r
-            LEFT JOIN applications a ON r.application_id = a.id
-            LEFT JOIN archive ar ON r.application_id = ar.id
-            ORDER BY r.created_at DESC
-        """)
+        cursor.execute(
+            f"SELECT event_type, COUNT(*) FROM security_events WHERE {' AND '.join(where)} GROUP BY event_type",
+            params
+        )
+        return dict(cursor.fetchall())
+
+def count_security_events_by_minute(since_ts):
+    """Число событий по типам и минутам начиная с since_ts: [(event_type, minute, count)], minute = ts // 60"""
+    with get_read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT event_type, ts / 60, COUNT(*) FROM security_events WHERE ts >= ? GROUP BY event_type, ts / 60",
+            (int(since_ts),)
+        )
         return cursor.fetchall()
 
+def iter_security_events(since_ts, exclude_admin_id=None, batch_size=STREAM_BATCH_SIZE):
+    """Поток событий безопасности начиная с since_ts по возрастанию времени"""
+    where, params = _security_events_where(since_ts, exclude_admin_id)
+    return _stream(SECURITY_EVENTS._replace(where=where, params=params), batch_size)
+
+def delete_security_events_before(ts):
+    """Удаляет события старше ts (epoch), возвращает число удаленных"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM security_events WHERE ts < ?", (int(ts),))
+        conn.commit()
+        return cursor.rowcount
+
+def get_export_watermark(dataset):
+    """Водяной знак выгрузки: {'key', 'exported_at', 'rows'} или None, если набор еще не выгружался"""
+    with get_read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT key_value, key_id, exported_at, rows FROM export_watermarks WHERE dataset = ?", (dataset,))
+        row = cursor.fetchone()
+    if not row:
+        return None
+    return {"key": (row[0], row[1]), "exported_at": row[2], "rows": row[3]}
+
+def set_export_watermark(dataset, key, rows):
+    """Запоминает ключ последней выгруженной строки набора"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO export_watermarks (dataset, key_value, key_id, exported_at, rows)
+            VALUES (?, ?, ?, datetime('now', 'localtime'), ?)
+            ON CONFLICT(dataset) DO UPDATE SET
+                key_value = excluded.key_value, key_id = excluded.key_id,
+                exported_at = excluded.exported_at, rows = excluded.rows
+        """, (dataset, key[0], key[1], rows))
+        conn.commit()
+
 def get_review_stats():
     """Возвращает статистику отзывов"""
-    with get_connection() as conn:
+    with get_read_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("""
             SELECT 
@@ -761,7 +1326,7 @@ def get_review_stats():
 
 def has_user_reviewed_application(application_id, user_tg_id):
     """Проверяет, оставил ли пользователь отзыв на заявку"""
-    with get_connection() as conn:
+    with get_read_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("""
             SELECT COUNT(*) FROM reviews 
@@ -785,7 +1350,11 @@ def update_application(app_id, parent_name, student_name, age, contact, course):
             SET parent_name=?, student_name=?, age=?, contact=?, course=? 
             WHERE id=?
         """, (parent_name, student_name, age, contact, course, app_id))
+        cursor.execute("SELECT tg_id FROM applications WHERE id = ?", (app_id,))
+        row = cursor.fetchone()
         conn.commit()
+    if row:
+        invalidate_user_profile(row[0])
 
 def delete_application_by_tg_id(tg_id):
     """Удаляет заявку по tg_id"""
@@ -793,6 +1362,7 @@ def delete_application_by_tg_id(tg_id):
         cursor = conn.cursor()
         cursor.execute("DELETE FROM applications WHERE tg_id = ?", (str(tg_id),))
         conn.commit()
+    invalidate_user_profile(tg_id)
 
 def migrate_database():
     """Безопасная миграция базы данных - добавляет новые индексы и структуры"""
@@ -812,6 +1382,19 @@ def migrate_database():
                 cursor.execute("ALTER TABLE applications ADD COLUMN last_admin_notification DATETIME")
                 print("✅ Добавлена колонка last_admin_notification в таблицу applications")
             
+            # Дата урока в epoch-секундах: выборки по времени идут диапазоном по индексу
+            if 'lesson_ts' not in columns:
+                cursor.execute("ALTER TABLE applications ADD COLUMN lesson_ts INTEGER")
+                print("✅ Добавлена колонка lesson_ts в таблицу applications")
+            
+            # Заполняем lesson_ts для строк, записанных до появления колонки
+            cursor.execute("SELECT id, lesson_date FROM applications WHERE lesson_date IS NOT NULL AND lesson_ts IS NULL")
+            backfill = [(lesson_date_to_timestamp(lesson_date), app_id) for app_id, lesson_date in cursor.fetchall()]
+            backfill = [row for row in backfill if row[0] is not None]
+            if backfill:
+                cursor.executemany("UPDATE applications SET lesson_ts = ? WHERE id = ?", backfill)
+                print(f"✅ Заполнена колонка lesson_ts для {len(backfill)} заявок")
+            
             # Проверяем существование индексов
             cursor.execute("PRAGMA index_list(applications)")
             existing_indexes = [row[1] for row in cursor.fetchall()]
@@ -829,6 +1412,14 @@ def migrate_database():
                 cursor.execute("CREATE INDEX idx_applications_lesson_date ON applications(lesson_date)")
                 print("✅ Добавлен индекс idx_applications_lesson_date")
             
+            if 'idx_applications_reminder' not in existing_indexes:
+                cursor.execute("CREATE INDEX idx_applications_reminder ON applications(reminder_sent, lesson_ts)")
+                print("✅ Добавлен индекс idx_applications_reminder")
+            
+            if 'idx_applications_review' not in existing_indexes:
+                cursor.execute("CREATE INDEX idx_applications_review ON applications(review_request_sent, lesson_ts)")
+                print("✅ Добавлен индекс idx_applications_review")
+            
             if 'idx_applications_created_at' not in existing_indexes:
                 cursor.execute("CREATE INDEX idx_applications_created_at ON applications(created_at)")
                 print("✅ Добавлен индекс idx_applications_created_at")
@@ -837,6 +1428,10 @@ def migrate_database():
                 cursor.execute("CREATE INDEX idx_applications_course ON applications(course)")
                 print("✅ Добавлен индекс idx_applications_course")
             
+            if 'idx_applications_lesson_created' not in existing_indexes:
+                cursor.execute("CREATE INDEX idx_applications_lesson_created ON applications(lesson_date, created_at)")
+                print("✅ Добавлен индекс idx_applications_lesson_created")
+            
             # Проверяем индексы для courses
             cursor.execute("PRAGMA index_list(courses)")
             existing_course_indexes = [row[1] for row in cursor.fetchall()]
@@ -861,6 +1456,10 @@ def migrate_database():
                 cursor.execute("CREATE INDEX idx_contacts_banned ON contacts(banned)")
                 print("✅ Добавлен индекс idx_contacts_banned")
             
+            if 'idx_contacts_status_created' not in existing_contact_indexes:
+                cursor.execute("CREATE INDEX idx_contacts_status_created ON contacts(status, created_at)")
+                print("✅ Добавлен индекс idx_contacts_status_created")
+            
             # Проверяем индексы для reviews
             cursor.execute("PRAGMA index_list(reviews)")
             existing_review_indexes = [row[1] for row in cursor.fetchall()]
@@ -893,6 +1492,12 @@ def migrate_database():
                 cursor.execute("CREATE INDEX idx_archive_cancelled_by ON archive(cancelled_by)")
                 print("✅ Добавлен индекс idx_archive_cancelled_by")
             
+            cursor.execute(EXPORT_WATERMARKS_TABLE)
+            
+            cursor.execute(SECURITY_EVENTS_TABLE)
+            for index_sql in SECURITY_EVENTS_INDEXES:
+                cursor.execute(index_sql)
+            
             conn.commit()
             print("✅ Миграция базы данных завершена успешно")
             return True
@@ -903,7 +1508,7 @@ def migrate_database():
 
 def get_database_stats():
     """Получает статистику базы данных"""
-    with get_connection() as conn:
+    with get_read_connection() as conn:
         cursor = conn.cursor()
         
         # Статистика заявок
@@ -939,17 +1544,16 @@ def get_database_stats():
 
 def get_completed_lessons_without_review_request():
     """Получает завершенные уроки, для которых еще не отправлен запрос на оценку"""
-    with get_connection() as conn:
+    with get_read_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("""
             SELECT id, tg_id, course, lesson_date, lesson_link
             FROM applications 
-            WHERE status = 'Назначено' 
-            AND lesson_date < datetime('now', 'localtime')
-            AND review_request_sent = 0
-            AND lesson_date IS NOT NULL
-            ORDER BY lesson_date DESC
-        """)
+            WHERE review_request_sent = 0
+            AND lesson_ts < ?
+            AND status = 'Назначено' 
+            ORDER BY lesson_ts DESC
+        """, (int(datetime.now().timestamp()),))
         return cursor.fetchall()
 
 def mark_review_request_sent(app_id):
@@ -965,17 +1569,16 @@ def mark_review_request_sent(app_id):
 
 def get_lessons_completed_after_time(hours=0.5):
     """Получает уроки, завершенные более указанного времени назад"""
-    with get_connection() as conn:
+    with get_read_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("""
             SELECT id, tg_id, course, lesson_date, lesson_link
             FROM applications 
-            WHERE status = 'Назначено' 
-            AND lesson_date < datetime('now', '-{} hours', 'localtime')
-            AND review_request_sent = 0
-            AND lesson_date IS NOT NULL
-            ORDER BY lesson_date DESC
-        """.format(hours))
+            WHERE review_request_sent = 0
+            AND lesson_ts < ?
+            AND status = 'Назначено' 
+            ORDER BY lesson_ts DESC
+        """, (int(datetime.now().timestamp() - hours * 3600),))
         return cursor.fetchall()
 
 def reset_review_request_status(app_id):
@@ -991,7 +1594,7 @@ def reset_review_request_status(app_id):
 
 def can_send_admin_notification(app_id):
     """Проверяет, можно ли отправить уведомление админу (не чаще раза в 24 часа)"""
-    with get_connection() as conn:
+    with get_read_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT last_admin_notification FROM applications WHERE id = ?", (app_id,))
         result = cursor.fetchone()
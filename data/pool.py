@@ -0,0 +1,194 @@
+"""
+Пул долгоживущих соединений SQLite
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from urllib.request import pathname2url
+from utils.exceptions import DatabaseConnectionException
+
+
+class PooledConnection:
+    """Аренда соединения из пула на время блока with"""
+
+    def __init__(self, pool):
+        self._pool = pool
+        self._conn = None
+
+    def __enter__(self):
+        self._conn = self._pool._acquire()
+        return self._conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            # Та же семантика, что у sqlite3.Connection: commit или rollback
+            self._conn.__exit__(exc_type, exc, tb)
+        finally:
+            self._pool._release(self._conn)
+            self._conn = None
+        return False
+
+
+class ConnectionPool:
+    """
+    Ограниченный пул соединений SQLite с проверкой здоровья и корректным закрытием.
+    Соединение закрепляется за потоком на время аренды, вложенные аренды
+    в том же потоке получают то же соединение.
+    pragmas применяются к каждому новому соединению; read_only открывает
+    файл в режиме mode=ro, такие соединения не могут блокировать писателя.
+    """
+
+    def __init__(self, db_path: str, max_size: int = 8, timeout: float = 10.0,
+                 health_check_interval: int = 60, pragmas: dict = None, read_only: bool = False):
+        self.db_path = db_path
+        self.max_size = max(1, max_size)
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.pragmas = pragmas or {}
+        self.read_only = read_only
+
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_size)
+        self._local = threading.local()
+        self._idle = []            # Стек свободных соединений: (conn, last_used)
+        self._open = set()         # Все открытые соединения пула
+        self._closed = False
+        self._stats = {
+            "created": 0,
+            "reused": 0,
+            "waits": 0,
+            "health_check_failures": 0
+        }
+
+    def connection(self) -> PooledConnection:
+        """Возвращает аренду соединения (использовать через with)"""
+        return PooledConnection(self)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Открывает новое соединение"""
+        if self.read_only:
+            uri = f"file:{pathname2url(os.path.abspath(self.db_path))}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, timeout=self.timeout, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False)
+        try:
+            for name, value in self.pragmas.items():
+                conn.execute(f"PRAGMA {name} = {value}")
+            if self.read_only:
+                conn.execute("PRAGMA query_only = 1")
+        except sqlite3.Error:
+            conn.close()
+            raise
+        with self._lock:
+            self._open.add(conn)
+            self._stats["created"] += 1
+        return conn
+
+    def _is_healthy(self, conn: sqlite3.Connection) -> bool:
+        """Проверяет, что соединение живо"""
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn: sqlite3.Connection):
+        """Закрывает соединение и убирает его из пула"""
+        with self._lock:
+            self._open.discard(conn)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def _acquire(self) -> sqlite3.Connection:
+        """Выдает соединение текущему потоку"""
+        depth = getattr(self._local, "depth", 0)
+        if depth:
+            # Вложенный вызов в том же потоке — то же соединение
+            self._local.depth = depth + 1
+            return self._local.conn
+
+        if self._closed:
+            raise DatabaseConnectionException("Пул соединений закрыт", self.db_path)
+
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats["waits"] += 1
+            if not self._slots.acquire(timeout=self.timeout):
+                raise DatabaseConnectionException(
+                    f"Нет свободных соединений в пуле за {self.timeout} сек", self.db_path
+                )
+
+        try:
+            conn = None
+            while conn is None:
+                with self._lock:
+                    entry = self._idle.pop() if self._idle else None
+                if entry is None:
+                    conn = self._connect()
+                    break
+                candidate, last_used = entry
+                if time.time() - last_used < self.health_check_interval or self._is_healthy(candidate):
+                    conn = candidate
+                    with self._lock:
+                        self._stats["reused"] += 1
+                else:
+                    with self._lock:
+                        self._stats["health_check_failures"] += 1
+                    self._discard(candidate)
+        except Exception:
+            self._slots.release()
+            raise
+
+        self._local.conn = conn
+        self._local.depth = 1
+        return conn
+
+    def _release(self, conn: sqlite3.Connection):
+        """Возвращает соединение в пул"""
+        self._local.depth -= 1
+        if self._local.depth:
+            return
+        self._local.conn = None
+
+        if conn.in_transaction:
+            # Незавершенная транзакция не должна попасть к следующему потоку
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                self._discard(conn)
+                self._slots.release()
+                return
+
+        with self._lock:
+            keep = not self._closed
+            if keep:
+                self._idle.append((conn, time.time()))
+        if not keep:
+            self._discard(conn)
+        self._slots.release()
+
+    def close(self):
+        """Закрывает пул: свободные соединения сразу, занятые — при возврате"""
+        with self._lock:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+        for conn in idle:
+            self._discard(conn)
+
+    def get_stats(self) -> dict:
+        """Статистика пула"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                "read_only": self.read_only,
+                "max_size": self.max_size,
+                "open": len(self._open),
+                "idle": len(self._idle),
+                "closed": self._closed
+            })
+        return stats
@@ -6,15 +6,16 @@ from .archive import register_archive_handlers
 from .courses import register_courses_handlers
 from .contacts import register_contacts_handlers
 from .reviews import register_reviews_handlers
-from utils.menu import get_admin_menu, create_confirm_menu, get_cancel_button, is_admin
+from utils.menu import get_admin_menu, is_admin
 from .export import register_export_handlers
-from config import ADMIN_ID
+from services.router import get_message_router
 
 def register_all_admin_handlers(bot, logger):
     """Регистрирует все админские обработчики"""
+    router = get_message_router(bot)
     
     # Обработчик для /start только для админа
-    @bot.message_handler(commands=['start'], func=lambda m: str(m.from_user.id) == str(ADMIN_ID))
+    @router.command("start", admin_only=True)
     def handle_start_command(message):
         import time
         start_time = time.time()
@@ -1,12 +1,14 @@
 from telebot import types
-from data.db import get_pending_applications, clear_applications, update_application_lesson, get_application_by_id, format_date_for_display
-from utils.menu import get_admin_menu, is_admin
+from data.db import get_pending_applications_page, clear_applications, update_application_lesson, get_application_by_id, format_date_for_display
+from utils.menu import get_admin_menu, is_admin, create_page_keyboard, parse_page_callback
 from config import ADMIN_ID
 from utils.security_logger import security_logger
 from handlers.admin_actions import register_admin_actions
+from services.router import get_message_router
 
 def register_applications_handlers(bot, logger):
-    @bot.message_handler(commands=["ClearApplications"])
+    router = get_message_router(bot)
+    @router.command("ClearApplications")
     def handle_clear_command(message):
         if not is_admin(message.from_user.id):
             security_logger.log_failed_login(
@@ -48,13 +50,38 @@ def register_applications_handlers(bot, logger):
             bot.send_message(chat_id, "❌ Очистка отменена.")
             logger.info(f"Admin {call.from_user.id} cancelled clear")
 
-    @bot.message_handler(func=lambda m: m.text == "📋 Список заявок" and is_admin(m.from_user.id))
+    def render_pending_page(**cursor):
+        """Текст и клавиатура страницы заявок без даты"""
+        page = get_pending_applications_page(**cursor)
+        if not page.rows:
+            return page, None, None
+        parts = [f"📋 Заявки без назначенной даты: {page.total}"]
+        buttons = []
+        for app in page.rows:
+            app_id, tg_id, parent_name, student_name, age, contact, course, lesson_date, lesson_link, status, created_at, reminder_sent = app
+            formatted_created = format_date_for_display(created_at)
+            status_str = "Назначено" if status == "Назначено" else "Ожидает"
+            parts.append(
+                f"🆔 Заявка #{app_id}\n"
+                f"👤 Родитель: {parent_name}\n"
+                f"🧒 Ученик: {student_name}\n"
+                f"📞 Контакт: {contact or 'не указан'}\n"
+                f"🎂 Возраст: {age}\n"
+                f"📘 Курс: {course}\n"
+                f"Статус: {status_str}\n"
+                f"🕒 Создано: {formatted_created}"
+            )
+            buttons.append(types.InlineKeyboardButton(f"🕒 Назначить #{app_id}", callback_data=f"assign:{app_id}"))
+        markup = create_page_keyboard("pending", page, buttons)
+        return page, "\n\n".join(parts), markup
+
+    @router.text("📋 Список заявок", admin_only=True)
     def handle_pending_applications(message):
         import time
         start_time = time.time()
         
-        applications = get_pending_applications()
-        if not applications:
+        page, text, markup = render_pending_page()
+        if not page.rows:
             bot.send_message(message.chat.id, "✅ Нет заявок без назначенной даты")
             
             # Логирование админских действий
@@ -67,37 +94,39 @@ def register_applications_handlers(bot, logger):
             # Бизнес-метрики
             logger.info(f"📊 Admin activity: admin {message.from_user.id} viewed applications (0 pending)")
             return
-            
-        for app in applications:
-            app_id, tg_id, parent_name, student_name, age, contact, course, lesson_date, lesson_link, status, created_at, reminder_sent = app
-            formatted_created = format_date_for_display(created_at)
-            status_str = "Назначено" if status == "Назначено" else "Ожидает"
-            text = (
-                f"🆔 Заявка #{app_id}\n"
-                f"👤 Родитель: {parent_name}\n"
-                f"🧒 Ученик: {student_name}\n"
-                f"📞 Контакт: {contact or 'не указан'}\n"
-                f"🎂 Возраст: {age}\n"
-                f"📘 Курс: {course}\n"
-                f"Статус: {status_str}\n"
-                f"🕒 Создано: {formatted_created}"
-            )
-            markup = types.InlineKeyboardMarkup()
-            markup.add(types.InlineKeyboardButton("🕒 Назначить", callback_data=f"assign:{app_id}"))
-            bot.send_message(message.chat.id, text, reply_markup=markup)
+        
+        # Одно сообщение на страницу, листание — редактированием этого же сообщения
+        bot.send_message(message.chat.id, text, reply_markup=markup)
         
         # Логирование админских действий
-        logger.info(f"🔧 Admin {message.from_user.id} viewed {len(applications)} pending applications")
+        logger.info(f"🔧 Admin {message.from_user.id} viewed {page.total} pending applications")
         
         # Логирование производительности
         response_time = time.time() - start_time
-        logger.info(f"⏱️ Admin handler response time: {response_time:.3f}s (view {len(applications)} applications)")
+        logger.info(f"⏱️ Admin handler response time: {response_time:.3f}s (view {len(page.rows)} of {page.total} applications)")
         
         # Бизнес-метрики
-        logger.info(f"📊 Admin activity: admin {message.from_user.id} viewed applications ({len(applications)} pending)")
+        logger.info(f"📊 Admin activity: admin {message.from_user.id} viewed applications ({page.total} pending)")
         
         # Системные события
-        logger.info(f"📊 Applications status: {len(applications)} pending applications in system")
+        logger.info(f"📊 Applications status: {page.total} pending applications in system")
+
+    @bot.callback_query_handler(func=lambda c: c.data.startswith("page:pending:"))
+    def handle_pending_applications_page(call):
+        if not is_admin(call.from_user.id):
+            bot.answer_callback_query(call.id, "Нет прав")
+            return
+        try:
+            page, text, markup = render_pending_page(**parse_page_callback(call.data))
+            if not page.rows:
+                # Страница опустела (заявки назначены или удалены) — возвращаемся к началу
+                page, text, markup = render_pending_page()
+            if not page.rows:
+                text, markup = "✅ Нет заявок без назначенной даты", None
+            bot.edit_message_text(text, call.message.chat.id, call.message.message_id, reply_markup=markup)
+            bot.answer_callback_query(call.id)
+        except Exception as e:
+            logger.error(f"Error in handle_pending_applications_page: {e}")
 
     # Регистрируем все хендлеры из admin_actions.py (назначение, завершение, отмена, перенос и т.д.)
     register_admin_actions(bot, logger) 
\ No newline at end of file
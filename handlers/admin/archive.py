@@ -3,9 +3,11 @@ from data.db import get_all_archive, clear_archive, format_date_for_display
 from config import ADMIN_ID
 from utils.security_logger import security_logger
 from utils.menu import is_admin
+from services.router import get_message_router
 
 def register_archive_handlers(bot, logger):
-    @bot.message_handler(commands=["ClearArchive"])
+    router = get_message_router(bot)
+    @router.command("ClearArchive")
     def handle_clear_archive_command(message):
         if not is_admin(message.from_user.id):
             security_logger.log_failed_login(
@@ -1,84 +1,132 @@
 from telebot import types
-from data.db import get_open_contacts, clear_contacts, update_contact_reply, ban_user_by_contact, is_user_banned, get_contact_by_id
+from data.db import get_open_contacts_page, clear_contacts, update_contact_reply, ban_user_by_contact, get_contact_by_id
+from utils.ban_index import ban_index
 from config import ADMIN_ID
 from utils.security_logger import security_logger
-from utils.menu import get_admin_menu, is_admin
+from utils.menu import get_admin_menu, is_admin, create_page_keyboard, parse_page_callback
 from state.users import user_data
 import re
+from services.router import get_message_router
+
+# Текст обращения — до MAX_MESSAGE_LENGTH символов, на страницу помещается три
+CONTACTS_PAGE_SIZE = 3
 
 def register_contacts_handlers(bot, logger):
-    @bot.message_handler(func=lambda m: m.text == "📨 Обращения пользователей" and is_admin(m.from_user.id))
+    router = get_message_router(bot)
+    def render_contacts_page(**cursor):
+        """Текст и клавиатура страницы обращений, ожидающих ответа"""
+        page = get_open_contacts_page(limit=CONTACTS_PAGE_SIZE, **cursor)
+        if not page.rows:
+            return page, None, None
+        parts = [f"📨 Обращения, ожидающие ответа: {page.total}"]
+        buttons = []
+        for contact in page.rows:
+            contact_id, tg_id, user_contact, contact_text, admin_reply, status, contact_time, reply_at, banned, ban_reason = contact
+            
+            # Формируем визуально разделённое сообщение
+            match = re.search(r'\[Вложение: (\w+), file_id: ([\w-]+)\]', contact_text)
+            if match:
+                file_type, file_id = match.group(1), match.group(2)
+                # Убираем строку вложения из текста
+                text_only = contact_text.replace(match.group(0), '').strip()
+                msg = (
+                    f"📨 Обращение #{contact_id}\n"
+                    f"👤 Пользователь: {tg_id}\n"
+                    f"📞 Контакт: {user_contact or 'не указан'}\n"
+                    f"📅 Время: {contact_time}\n"
+                    f"\n——— Вложение ———\n[{file_type}, file_id: {file_id}]\n"
+                )
+                if text_only:
+                    msg += f"\n——— Текст обращения ———\n{text_only}\n"
+                msg += f"\n📊 Статус: {status}"
+            else:
+                msg = (
+                    f"📨 Обращение #{contact_id}\n"
+                    f"👤 Пользователь: {tg_id}\n"
+                    f"📞 Контакт: {user_contact or 'не указан'}\n"
+                    f"📅 Время: {contact_time}\n"
+                    f"\n——— Текст обращения ———\n{contact_text.strip()}\n"
+                    f"\n📊 Статус: {status}"
+                )
+            parts.append(msg)
+            
+            buttons.append(types.InlineKeyboardButton(f"💬 Ответить на #{contact_id}", callback_data=f"reply_to_contact:{contact_id}"))
+            # Вложение отправляется по кнопке, а не вместе со страницей
+            if match:
+                buttons.append(types.InlineKeyboardButton(f"📎 Вложение #{contact_id}", callback_data=f"contact_attachment:{contact_id}"))
+            # Добавляем кнопку блокировки, если пользователь не заблокирован
+            if not ban_index.is_contact_banned(tg_id):
+                buttons.append(types.InlineKeyboardButton(f"🚫 Заблокировать {tg_id}", callback_data=f"ban_user:{tg_id}:{contact_id}"))
+            else:
+                buttons.append(types.InlineKeyboardButton(f"✅ {tg_id} заблокирован", callback_data="user_already_banned"))
+        markup = create_page_keyboard("contacts", page, buttons)
+        return page, "\n\n".join(parts), markup
+
+    @router.text("📨 Обращения пользователей", admin_only=True)
     def handle_contacts_menu(message):
         try:
-            contacts = get_open_contacts()
-            if not contacts:
+            page, text, markup = render_contacts_page()
+            if not page.rows:
                 bot.send_message(message.chat.id, "📭 Нет обращений, ожидающих ответа.", reply_markup=get_admin_menu())
                 return
             
-            # Отправляем каждое обращение отдельным сообщением с кнопками
-            for contact in contacts:
-                contact_id, tg_id, user_contact, contact_text, admin_reply, status, contact_time, reply_at, banned, ban_reason = contact
-                
-                # Формируем визуально разделённое сообщение
-                match = re.search(r'\[Вложение: (\w+), file_id: ([\w-]+)\]', contact_text)
-                if match:
-                    file_type, file_id = match.group(1), match.group(2)
-                    # Убираем строку вложения из текста
-                    text_only = contact_text.replace(match.group(0), '').strip()
-                    msg = (
-                        f"📨 Обращение #{contact_id}\n"
-                        f"👤 Пользователь: {tg_id}\n"
-                        f"📞 Контакт: {user_contact or 'не указан'}\n"
-                        f"📅 Время: {contact_time}\n"
-                        f"\n——— Вложение ———\n[{file_type}, file_id: {file_id}]\n"
-                    )
-                    if text_only:
-                        msg += f"\n——— Текст обращения ———\n{text_only}\n"
-                    msg += f"\n📊 Статус: {status}"
-                else:
-                    msg = (
-                        f"📨 Обращение #{contact_id}\n"
-                        f"👤 Пользователь: {tg_id}\n"
-                        f"📞 Контакт: {user_contact or 'не указан'}\n"
-                        f"📅 Время: {contact_time}\n"
-                        f"\n——— Текст обращения ———\n{contact_text.strip()}\n"
-                        f"\n📊 Статус: {status}"
-                    )
-                
-                # Создаем кнопки только для ожидающих ответа обращений
-                markup = types.InlineKeyboardMarkup()
-                markup.add(types.InlineKeyboardButton("💬 Ответить", callback_data=f"reply_to_contact:{contact_id}"))
-                
-                # Добавляем кнопку блокировки, если пользователь не заблокирован
-                if not is_user_banned(tg_id):
-                    markup.add(types.InlineKeyboardButton("🚫 Заблокировать пользователя", callback_data=f"ban_user:{tg_id}:{contact_id}"))
-                else:
-                    markup.add(types.InlineKeyboardButton("✅ Пользователь заблокирован", callback_data="user_already_banned"))
-                
-                bot.send_message(message.chat.id, msg, reply_markup=markup)
-                # Если в тексте обращения есть вложение — отправить его админу
-                if match:
-                    try:
-                        if file_type == 'photo':
-                            bot.send_photo(message.chat.id, file_id)
-                        elif file_type == 'document':
-                            bot.send_document(message.chat.id, file_id)
-                        elif file_type == 'audio':
-                            bot.send_audio(message.chat.id, file_id)
-                        elif file_type == 'voice':
-                            bot.send_voice(message.chat.id, file_id)
-                        elif file_type == 'video_note':
-                            bot.send_video_note(message.chat.id, file_id)
-                        elif file_type == 'sticker':
-                            bot.send_sticker(message.chat.id, file_id)
-                    except Exception as e:
-                        bot.send_message(message.chat.id, f"⚠️ Не удалось отправить вложение: {e}")
+            # Одно сообщение на страницу, листание — редактированием этого же сообщения
+            bot.send_message(message.chat.id, text, reply_markup=markup)
             
-            logger.info(f"Admin {message.from_user.id} viewed open contacts")
+            logger.info(f"Admin {message.from_user.id} viewed open contacts ({page.total})")
         except Exception as e:
             logger.error(f"Error in handle_contacts_menu: {e}")
 
-    @bot.message_handler(commands=["ClearContacts"])
+    @bot.callback_query_handler(func=lambda c: c.data.startswith("page:contacts:"))
+    def handle_contacts_page(call):
+        if not is_admin(call.from_user.id):
+            bot.answer_callback_query(call.id, "Нет прав")
+            return
+        try:
+            page, text, markup = render_contacts_page(**parse_page_callback(call.data))
+            if not page.rows:
+                # Страница опустела (на обращения ответили) — возвращаемся к началу
+                page, text, markup = render_contacts_page()
+            if not page.rows:
+                text, markup = "📭 Нет обращений, ожидающих ответа.", None
+            bot.edit_message_text(text, call.message.chat.id, call.message.message_id, reply_markup=markup)
+            bot.answer_callback_query(call.id)
+        except Exception as e:
+            logger.error(f"Error in handle_contacts_page: {e}")
+
+    @bot.callback_query_handler(func=lambda c: c.data.startswith("contact_attachment:"))
+    def handle_contact_attachment(call):
+        if not is_admin(call.from_user.id):
+            bot.answer_callback_query(call.id, "Нет прав")
+            return
+        try:
+            contact = get_contact_by_id(int(call.data.split(":")[1]))
+            match = re.search(r'\[Вложение: (\w+), file_id: ([\w-]+)\]', contact[3]) if contact else None
+            if not match:
+                bot.answer_callback_query(call.id, "Вложение не найдено")
+                return
+            bot.answer_callback_query(call.id)
+            file_type, file_id = match.group(1), match.group(2)
+            chat_id = call.message.chat.id
+            try:
+                if file_type == 'photo':
+                    bot.send_photo(chat_id, file_id)
+                elif file_type == 'document':
+                    bot.send_document(chat_id, file_id)
+                elif file_type == 'audio':
+                    bot.send_audio(chat_id, file_id)
+                elif file_type == 'voice':
+                    bot.send_voice(chat_id, file_id)
+                elif file_type == 'video_note':
+                    bot.send_video_note(chat_id, file_id)
+                elif file_type == 'sticker':
+                    bot.send_sticker(chat_id, file_id)
+            except Exception as e:
+                bot.send_message(chat_id, f"⚠️ Не удалось отправить вложение: {e}")
+        except Exception as e:
+            logger.error(f"Error in handle_contact_attachment: {e}")
+
+    @router.command("ClearContacts")
     def handle_clear_contacts(message):
         if not is_admin(message.from_user.id):
             security_logger.log_failed_login(
@@ -1,11 +1,11 @@
 from telebot import types
 from data.db import get_all_courses, add_course, delete_course, update_course, toggle_course_active
-from config import ADMIN_ID
-from utils.menu import get_admin_menu, get_cancel_button, handle_cancel_action, get_course_editor_menu, is_admin
-from utils.security_logger import security_logger
+from utils.menu import get_admin_menu, get_cancel_button, handle_cancel_action, get_course_editor_menu
+from services.router import get_message_router
 
 def register_courses_handlers(bot, logger):
-    @bot.message_handler(func=lambda m: m.text == "📚 Редактировать курсы" and is_admin(m.from_user.id))
+    router = get_message_router(bot)
+    @router.text("📚 Редактировать курсы", admin_only=True)
     def handle_course_menu(message):
         import time
         start_time = time.time()
@@ -26,7 +26,7 @@ def register_courses_handlers(bot, logger):
         except Exception as e:
             logger.error(f"Error in handle_course_menu: {e}")
 
-    @bot.message_handler(func=lambda m: m.text == "➕ Добавить курс" and is_admin(m.from_user.id))
+    @router.text("➕ Добавить курс", admin_only=True)
     def handle_add_course(message):
         try:
             bot.send_message(message.chat.id, "Введите название нового курса:", reply_markup=get_cancel_button())
@@ -81,7 +81,7 @@ def register_courses_handlers(bot, logger):
         except Exception as e:
             logger.error(f"Error in save_new_course: {e}")
 
-    @bot.message_handler(func=lambda m: m.text == "🗑 Удалить курс" and is_admin(m.from_user.id))
+    @router.text("🗑 Удалить курс", admin_only=True)
     def handle_delete_course(message):
         try:
             courses = get_all_courses()
@@ -99,7 +99,7 @@ def register_courses_handlers(bot, logger):
         except Exception as e:
             logger.error(f"Error in handle_delete_course: {e}")
 
-    @bot.message_handler(func=lambda m: m.text == "❄ Заморозить курс" and is_admin(m.from_user.id))
+    @router.text("❄ Заморозить курс", admin_only=True)
     def handle_toggle_course(message):
         try:
             courses = get_all_courses()
@@ -117,7 +117,7 @@ def register_courses_handlers(bot, logger):
         except Exception as e:
             logger.error(f"Error in handle_toggle_course: {e}")
 
-    @bot.message_handler(func=lambda m: m.text == "📝 Отредактировать курс" and is_admin(m.from_user.id))
+    @router.text("📝 Отредактировать курс", admin_only=True)
     def handle_edit_course(message):
         try:
             courses = get_all_courses()
@@ -198,7 +198,7 @@ def register_courses_handlers(bot, logger):
         except Exception as e:
             logger.error(f"Error in apply_edit: {e}")
 
-    @bot.message_handler(func=lambda m: m.text == "🔙 Назад" and is_admin(m.from_user.id))
+    @router.text("🔙 Назад", admin_only=True)
     def handle_back_to_admin_panel(message):
         try:
             bot.send_message(message.chat.id, "🔙 Возврат в админ-панель", reply_markup=get_admin_menu())
@@ -206,7 +206,7 @@ def register_courses_handlers(bot, logger):
         except Exception as e:
             logger.error(f"Error in handle_back_to_admin_panel: {e}")
 
-    @bot.message_handler(func=lambda m: m.text == "👁 Просмотреть все курсы" and is_admin(m.from_user.id))
+    @router.text("👁 Просмотреть все курсы", admin_only=True)
     def handle_view_all_courses(message):
         try:
             courses = get_all_courses()
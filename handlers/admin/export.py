@@ -1,13 +1,12 @@
 from telebot import types
-from data.db import get_all_applications, get_all_archive, get_all_contacts, get_all_reviews
-from config import ADMIN_ID
-import openpyxl
-import os
-from datetime import datetime
+from services.export import EXPORT_DATASETS, EXPORT_FORMATS, ExportJob, ExportWorker, get_export_worker
+from data.db import get_export_watermark
 from utils.menu import is_admin
+from services.router import get_message_router
 
 def register_export_handlers(bot, logger):
-    @bot.message_handler(func=lambda m: m.text == "⬇️ Выгрузить данные" and is_admin(m.from_user.id))
+    router = get_message_router(bot)
+    @router.text("⬇️ Выгрузить данные", admin_only=True)
     def handle_export_data(message):
         markup = types.InlineKeyboardMarkup()
         markup.add(types.InlineKeyboardButton("Заявки", callback_data="export_applications"))
@@ -18,39 +17,52 @@ def register_export_handlers(bot, logger):
 
     @bot.callback_query_handler(func=lambda c: c.data in ["export_applications", "export_archive", "export_contacts", "export_reviews"])
     def handle_export_choice(call):
+        if not is_admin(call.from_user.id):
+            bot.answer_callback_query(call.id, "Нет прав")
+            return
+        dataset = call.data[len("export_"):]
+        watermark = get_export_watermark(dataset)
+        text = f"Формат выгрузки «{EXPORT_DATASETS[dataset].title}»:"
+        markup = types.InlineKeyboardMarkup()
+        for fmt, label in EXPORT_FORMATS.items():
+            buttons = [types.InlineKeyboardButton(label, callback_data=f"export_format:{dataset}:{fmt}")]
+            if watermark:
+                # Только строки после прошлой выгрузки: диапазон по индексу created_at/archived_at
+                buttons.append(types.InlineKeyboardButton(f"🆕 {label}", callback_data=f"export_format:{dataset}:{fmt}:changes"))
+            markup.row(*buttons)
+        if watermark:
+            text += (f"\n\nПрошлая выгрузка: {watermark['exported_at']} ({watermark['rows']} строк)."
+                     f"\n🆕 — только новое с тех пор")
+        bot.edit_message_text(text, call.message.chat.id, call.message.message_id, reply_markup=markup)
+        bot.answer_callback_query(call.id)
+
+    @bot.callback_query_handler(func=lambda c: c.data.startswith("export_format:"))
+    def handle_export_format(call):
         if not is_admin(call.from_user.id):
             bot.answer_callback_query(call.id, "Нет прав")
             return
         try:
-            now = datetime.now().strftime("%Y%m%d_%H%M%S")
-            if call.data == "export_applications":
-                data = get_all_applications()
-                filename = f"applications_{now}.xlsx"
-                headers = ["ID", "TG ID", "Родитель", "Ученик", "Возраст", "Контакт", "Курс", "Дата", "Ссылка", "Статус", "Создано", "Напоминание"]
-            elif call.data == "export_archive":
-                data = get_all_archive()
-                filename = f"archive_{now}.xlsx"
-                headers = ["ID", "TG ID", "Родитель", "Ученик", "Возраст", "Контакт", "Курс", "Дата", "Ссылка", "Статус", "Создано", "Напоминание"]
-            elif call.data == "export_contacts":
-                data = get_all_contacts()
-                filename = f"contacts_{now}.xlsx"
-                headers = ["ID", "TG ID", "Имя", "Контакт", "Вопрос", "Статус", "Создано"]
-            elif call.data == "export_reviews":
-                data = get_all_reviews()
-                filename = f"reviews_{now}.xlsx"
-                headers = ["ID", "TG ID", "Курс", "Оценка", "Комментарий", "Дата", "Статус"]
-            else:
+            _, dataset, fmt, *mode = call.data.split(":")
+            changes = mode == ["changes"]
+            if dataset not in EXPORT_DATASETS or fmt not in EXPORT_FORMATS or (mode and not changes):
                 bot.answer_callback_query(call.id, "Неизвестный тип выгрузки")
                 return
-            wb = openpyxl.Workbook()
-            ws = wb.active
-            ws.append(headers)
-            for row in data:
-                ws.append(list(row))
-            wb.save(filename)
-            with open(filename, "rb") as f:
-                caption = f"📊 {filename}\n\n⚠️ <b>Внимание:</b> Файл будет автоматически удален через 24 часа\n💾 Сохраните его, если он вам нужен надолго"
-                bot.send_document(call.message.chat.id, f, caption=caption, parse_mode="HTML")
-            os.remove(filename)
+            # Сообщение с выбором формата превращается в индикатор хода выгрузки
+            title = EXPORT_DATASETS[dataset].title
+            job = ExportJob(call.message.chat.id, dataset, fmt, call.message.message_id, changes)
+            bot.edit_message_text(f"⏳ Выгрузка «{title}» в очереди…", call.message.chat.id, call.message.message_id)
+            worker = get_export_worker()
+            if worker is None:
+                # Воркер не запущен — выгружаем в текущем потоке
+                bot.answer_callback_query(call.id)
+                ExportWorker(bot).run(job)
+            elif worker.submit(job):
+                bot.answer_callback_query(call.id, "Выгрузка поставлена в очередь")
+            else:
+                bot.answer_callback_query(call.id, "Эта выгрузка уже выполняется или очередь занята")
+                bot.edit_message_text(f"⚠️ Выгрузка «{title}» уже выполняется или очередь занята, попробуйте позже.",
+                                      call.message.chat.id, call.message.message_id)
+                return
+            logger.info(f"Admin {call.from_user.id} requested export {dataset}.{fmt}{' (changes)' if changes else ''}")
         except Exception as e:
-            bot.send_message(call.message.chat.id, f"❌ Ошибка при экспорте: {str(e)}") 
\ No newline at end of file
+            bot.send_message(call.message.chat.id, f"❌ Ошибка при экспорте: {str(e)}")
@@ -1,11 +1,16 @@
 from telebot import types
-from data.db import get_all_reviews, clear_reviews, get_review_stats
-from config import ADMIN_ID
+from data.db import get_all_reviews_page, clear_reviews, get_review_stats
 from utils.security_logger import security_logger
-from utils.menu import is_admin
+from utils.menu import is_admin, create_page_keyboard, parse_page_callback
+from services.router import get_message_router
+
+# Отзывов на одной странице списка; текст каждого обрезается до 100 символов,
+# поэтому десять отзывов помещаются в одно сообщение
+REVIEWS_PAGE_SIZE = 10
 
 def register_reviews_handlers(bot, logger):
-    @bot.message_handler(func=lambda m: m.text == "📊 Статистика отзывов" and str(m.from_user.id) == str(ADMIN_ID))
+    router = get_message_router(bot)
+    @router.text("📊 Статистика отзывов", admin_only=True)
     def handle_admin_reviews(message):
         stats = get_review_stats()
         if isinstance(stats, dict):
@@ -25,7 +30,7 @@ def register_reviews_handlers(bot, logger):
         )
         bot.send_message(message.chat.id, msg, parse_mode="HTML")
 
-    @bot.message_handler(commands=["ClearReviews"])
+    @router.command("ClearReviews")
     def handle_clear_reviews_command(message):
         if not is_admin(message.from_user.id):
             security_logger.log_failed_login(
@@ -66,25 +71,48 @@ def register_reviews_handlers(bot, logger):
             bot.send_message(call.message.chat.id, "❌ Очистка отзывов отменена.")
             logger.info(f"Admin {call.from_user.id} cancelled reviews clear")
 
-    @bot.message_handler(func=lambda m: m.text == "⭐ Отзывы" and str(m.from_user.id) == str(ADMIN_ID))
-    def handle_admin_all_reviews(message):
-        reviews = get_all_reviews()
-        if not reviews:
-            bot.send_message(message.chat.id, "Пока нет отзывов.", parse_mode="HTML")
-            return
-        msg = "<b>Все отзывы:</b>\n\n"
-        for i, review in enumerate(reviews, 1):
-            _, rating, feedback, is_anonymous, parent_name, student_name, course, created_at, user_tg_id = review
+    def render_reviews_page(**cursor):
+        """Текст и клавиатура страницы всех отзывов"""
+        page = get_all_reviews_page(limit=REVIEWS_PAGE_SIZE, **cursor)
+        if not page.rows:
+            return page, None, None
+        msg = f"<b>Все отзывы ({page.total}):</b>\n\n"
+        for review in page.rows:
+            review_id, rating, feedback, is_anonymous, parent_name, student_name, course, created_at, user_tg_id = review
             author = f"{parent_name} ({student_name})" if parent_name and student_name else "[Заявка удалена]"
             course_display = course or "[Курс не указан]"
             anonymity = "Анонимно" if is_anonymous else "Публично"
             msg += (
-                f"{i}. ⭐ {rating}/10 | {anonymity}\n"
+                f"#{review_id}. ⭐ {rating}/10 | {anonymity}\n"
                 f"Курс: {course_display}\n"
                 f"Автор: {author}\n"
                 f"Текст: {feedback[:100]}{'...' if len(feedback) > 100 else ''}\n"
                 f"Дата: {created_at}\n\n"
             )
-        bot.send_message(message.chat.id, msg, parse_mode="HTML")
+        markup = create_page_keyboard("reviews", page)
+        return page, msg, markup
 
- 
\ No newline at end of file
+    @router.text("⭐ Отзывы", admin_only=True)
+    def handle_admin_all_reviews(message):
+        page, msg, markup = render_reviews_page()
+        if not page.rows:
+            bot.send_message(message.chat.id, "Пока нет отзывов.", parse_mode="HTML")
+            return
+        bot.send_message(message.chat.id, msg, parse_mode="HTML", reply_markup=markup)
+
+    @bot.callback_query_handler(func=lambda c: c.data.startswith("page:reviews:"))
+    def handle_admin_reviews_page(call):
+        if not is_admin(call.from_user.id):
+            bot.answer_callback_query(call.id, "Нет прав")
+            return
+        try:
+            page, msg, markup = render_reviews_page(**parse_page_callback(call.data))
+            if not page.rows:
+                # Страница опустела — возвращаемся к началу списка
+                page, msg, markup = render_reviews_page()
+            if not page.rows:
+                msg, markup = "Пока нет отзывов.", None
+            bot.edit_message_text(msg, call.message.chat.id, call.message.message_id, parse_mode="HTML", reply_markup=markup)
+            bot.answer_callback_query(call.id)
+        except Exception as e:
+            logger.error(f"Error in handle_admin_reviews_page: {e}")
@@ -4,9 +4,11 @@ from config import ADMIN_ID
 import os
 from datetime import datetime
 from utils.menu import is_admin
+from services.router import get_message_router
 
 def register_security_handlers(bot, logger):
-    @bot.message_handler(commands=["security_report"])
+    router = get_message_router(bot)
+    @router.command("security_report")
     def handle_security_report(message):
         if not is_admin(message.from_user.id):
             security_logger.log_failed_login(
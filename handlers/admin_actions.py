@@ -1,6 +1,7 @@
 from telebot import types
 from data.db import (
     get_assigned_applications,
+    get_assigned_applications_page,
     get_pending_applications,
     update_application_lesson,
     get_application_by_id,
@@ -12,6 +13,7 @@ from state.state_manager import state_manager
 from config import ADMIN_ID
 import utils.menu as menu
 from utils.menu import is_admin
+from services.router import get_message_router
 
 # Глобальная переменная для функции отправки отзывов
 send_review_request_func = None
@@ -26,8 +28,9 @@ def set_review_request_function(func):
     send_review_request_func = func
 
 def register_admin_actions(bot, logger):
+    router = get_message_router(bot)
 
-    @bot.message_handler(func=lambda m: m.text == "📝 Управление уроками" and is_admin(m.from_user.id))
+    @router.text("📝 Управление уроками", admin_only=True)
     def handle_lesson_management(message):
         try:
             markup = menu.get_lesson_management_menu()
@@ -36,7 +39,7 @@ def register_admin_actions(bot, logger):
         except Exception as e:
             logger.error(f"Error in handle_lesson_management: {e}")
 
-    @bot.message_handler(func=lambda m: m.text == "🔙 Назад в админ-меню" and is_admin(m.from_user.id))
+    @router.text("🔙 Назад в админ-меню", admin_only=True)
     def handle_back_to_main_menu(message):
         try:
             markup = menu.get_admin_menu()
@@ -45,39 +48,63 @@ def register_admin_actions(bot, logger):
         except Exception as e:
             logger.error(f"Error in handle_back_to_main_menu: {e}")
 
-    @bot.message_handler(func=lambda m: m.text == "📅 Посмотреть запланированные уроки" and is_admin(m.from_user.id))
+    def render_scheduled_page(**cursor):
+        """Текст и клавиатура страницы запланированных уроков"""
+        page = get_assigned_applications_page(**cursor)
+        if not page.rows:
+            return page, None, None
+        parts = [f"📅 Запланированные уроки ({page.total}):"]
+        for app in page.rows:
+            app_id, tg_id, parent_name, student_name, age, contact, course, date, link, status, created_at, reminder_sent = app
+            formatted_date = format_date_for_display(date)
+            formatted_created = format_date_for_display(created_at)
+            parts.append(
+                f"🆔 Заявка #{app_id}\n"
+                f"👤 Родитель: {parent_name}\n"
+                f"🧒 Ученик: {student_name} ({age} лет)\n"
+                f"📞 Контакт: {contact or 'не указан'}\n"
+                f"📘 Курс: {course}\n"
+                f"📅 Дата урока: {formatted_date}\n"
+                f"🔗 Ссылка: {link or 'не указана'}\n"
+                f"📝 Создано: {formatted_created}\n"
+                f"🔔 Напоминание: {'✅ Отправлено' if reminder_sent else '❌ Не отправлено'}"
+            )
+        markup = menu.create_page_keyboard("scheduled", page)
+        return page, "\n\n".join(parts), markup
+
+    @router.text("📅 Посмотреть запланированные уроки", admin_only=True)
     def handle_view_scheduled_lessons(message):
         try:
-            apps = get_assigned_applications()
-            if not apps:
+            page, text, markup = render_scheduled_page()
+            if not page.rows:
                 bot.send_message(message.chat.id, "✅ Нет запланированных уроков")
                 return
 
-            bot.send_message(message.chat.id, f"📅 Запланированные уроки ({len(apps)}):")
+            # Одно сообщение на страницу, листание — редактированием этого же сообщения
+            bot.send_message(message.chat.id, text, reply_markup=markup)
             
-            for app in apps:
-                app_id, tg_id, parent_name, student_name, age, contact, course, date, link, status, created_at, reminder_sent = app
-                formatted_date = format_date_for_display(date)
-                formatted_created = format_date_for_display(created_at)
-                
-                text = (
-                    f"🆔 Заявка #{app_id}\n"
-                    f"👤 Родитель: {parent_name}\n"
-                    f"🧒 Ученик: {student_name} ({age} лет)\n"
-                    f"📞 Контакт: {contact or 'не указан'}\n"
-                    f"📘 Курс: {course}\n"
-                    f"📅 Дата урока: {formatted_date}\n"
-                    f"🔗 Ссылка: {link or 'не указана'}\n"
-                    f"📝 Создано: {formatted_created}\n"
-                    f"🔔 Напоминание: {'✅ Отправлено' if reminder_sent else '❌ Не отправлено'}"
-                )
-                bot.send_message(message.chat.id, text)
-            
-            logger.info(f"Admin {message.from_user.id} viewed {len(apps)} scheduled lessons")
+            logger.info(f"Admin {message.from_user.id} viewed {page.total} scheduled lessons")
         except Exception as e:
             logger.error(f"Error in handle_view_scheduled_lessons: {e}")
 
-    @bot.message_handler(func=lambda m: m.text == "✅ Завершить заявку" and is_admin(m.from_user.id))
+    @bot.callback_query_handler(func=lambda c: c.data.startswith("page:scheduled:"))
+    def handle_scheduled_lessons_page(call):
+        if not is_admin(call.from_user.id):
+            bot.answer_callback_query(call.id, "Нет прав")
+            return
+        try:
+            page, text, markup = render_scheduled_page(**menu.parse_page_callback(call.data))
+            if not page.rows:
+                # Страница опустела — возвращаемся к началу списка
+                page, text, markup = render_scheduled_page()
+            if not page.rows:
+                text, markup = "✅ Нет запланированных уроков", None
+            bot.edit_message_text(text, call.message.chat.id, call.message.message_id, reply_markup=markup)
+            bot.answer_callback_query(call.id)
+        except Exception as e:
+            logger.error(f"Error in handle_scheduled_lessons_page: {e}")
+
+    @router.text("✅ Завершить заявку", admin_only=True)
     def handle_lesson_finish_menu(message):
         try:
             apps = get_assigned_applications()
@@ -103,7 +130,7 @@ def register_admin_actions(bot, logger):
         except Exception as e:
             logger.error(f"Error in handle_lesson_finish_menu: {e}")
 
-    @bot.message_handler(func=lambda m: m.text == "❌ Отменить заявку" and is_admin(m.from_user.id))
+    @router.text("❌ Отменить заявку", admin_only=True)
     def handle_lesson_cancel_menu(message):
         try:
             apps = get_pending_applications()
@@ -126,7 +153,7 @@ def register_admin_actions(bot, logger):
         except Exception as e:
             logger.error(f"Error in handle_lesson_cancel_menu: {e}")
 
-    @bot.message_handler(func=lambda m: m.text == "🚫 Отменить урок" and is_admin(m.from_user.id))
+    @router.text("🚫 Отменить урок", admin_only=True)
     def handle_lesson_cancel_lesson_menu(message):
         try:
             apps = get_assigned_applications()
@@ -152,7 +179,7 @@ def register_admin_actions(bot, logger):
         except Exception as e:
             logger.error(f"Error in handle_lesson_cancel_lesson_menu: {e}")
 
-    @bot.message_handler(func=lambda m: m.text == "🕓 Перенести урок" and is_admin(m.from_user.id))
+    @router.text("🕓 Перенести урок", admin_only=True)
     def handle_lesson_reschedule_menu(message):
         try:
             apps = get_assigned_applications()
@@ -2,7 +2,7 @@
 from telebot import types
 import utils.menu as menu
 from data.db import (
-    get_application_by_tg_id, format_date_for_display, get_active_courses, get_cancelled_count_by_tg_id, get_finished_count_by_tg_id, get_all_archive, archive_application, get_last_contact_time, add_contact, update_application, delete_application_by_tg_id, get_reviews_for_publication_with_deleted, can_send_admin_notification, mark_admin_notification_sent
+    get_application_by_tg_id, format_date_for_display, get_active_courses, get_course_catalog, get_cancelled_count_by_tg_id, get_finished_count_by_tg_id, get_all_archive, archive_application, get_last_contact_time, add_contact, update_application, delete_application_by_tg_id, get_reviews_for_publication_with_deleted, can_send_admin_notification, mark_admin_notification_sent
 )
 from utils.logger import log_user_action, log_error, setup_logger
 from state.users import get_user_data, set_user_data, update_user_data, clear_user_data
@@ -10,6 +10,7 @@ from config import ADMIN_ID
 from utils.security import check_user_security, validate_user_input, security_manager
 from utils.decorators import error_handler, ensure_text_message, ensure_stage
 from utils.menu import get_appropriate_menu, is_admin
+from services.router import get_message_router
 
 def register_handlers(bot):
     """Регистрация обработчиков команд"""
@@ -17,8 +18,9 @@ def register_handlers(bot):
     register(bot, logger)
 
 def register(bot, logger):  
+    router = get_message_router(bot)
 
-    @bot.message_handler(commands=["help"])
+    @router.command("help")
     @error_handler()
     def handle_help(message):
         import time
@@ -70,7 +72,7 @@ def register(bot, logger):
         response_time = time.time() - start_time
         logger.info(f"⏱️ Handler response time: {response_time:.3f}s (help command)")
 
-    @bot.message_handler(func=lambda m: m.text == "📅 Мое занятие")
+    @router.text("📅 Мое занятие")
     @error_handler()
     def handle_my_lesson(message):
         import time
@@ -250,15 +252,10 @@ def register(bot, logger):
         }
         if field == "course":
             # Показываем список курсов для выбора
-            courses = get_active_courses()
-            if not courses:
+            if not get_course_catalog().active:
                 bot.send_message(chat_id, "⚠️ Курсы временно недоступны.", reply_markup=menu.get_appropriate_menu(call.from_user.id))
                 return
-            markup = types.ReplyKeyboardMarkup(resize_keyboard=True, one_time_keyboard=True)
-            for c in courses:
-                markup.add(c[1])
-            markup.add("🔙 Отмена")
-            bot.send_message(chat_id, "Выберите новый курс:", reply_markup=markup)
+            bot.send_message(chat_id, "Выберите новый курс:", reply_markup=menu.get_courses_keyboard())
             bot.register_next_step_handler(call.message, process_edit_course_field)
             log_user_action(logger, call.from_user.id, f"edit_field_{field}_choose")
             return
@@ -415,14 +412,8 @@ def register(bot, logger):
             clear_user_data(chat_id)
             return
         selected = message.text.strip()
-        courses = get_active_courses()
-        course_names = [c[1] for c in courses]
-        if selected not in course_names:
-            markup = types.ReplyKeyboardMarkup(resize_keyboard=True, one_time_keyboard=True)
-            for c in courses:
-                markup.add(c[1])
-            markup.add("🔙 Отмена")
-            bot.send_message(chat_id, "Пожалуйста, выберите курс из списка:", reply_markup=markup)
+        if selected not in get_course_catalog().id_by_name:
+            bot.send_message(chat_id, "Пожалуйста, выберите курс из списка:", reply_markup=menu.get_courses_keyboard())
             bot.register_next_step_handler(message, process_edit_course_field)
             return
         update_user_data(chat_id, course=selected)
@@ -660,8 +651,7 @@ def register(bot, logger):
     def show_course_info(call):
         try:
             course_id = int(call.data.split(":")[1])
-            courses = get_active_courses()
-            course = next((c for c in courses if c[0] == course_id), None)
+            course = get_course_catalog().by_id.get(course_id)
 
             if course:
                 name = course[1]
@@ -743,7 +733,7 @@ def register(bot, logger):
         clear_user_data(chat_id)  # Очищаем состояние
         bot.send_message(chat_id, "Отмена отмены урока.", reply_markup=menu.get_appropriate_menu(call.from_user.id))
 
-    @bot.message_handler(func=lambda m: m.text == "🆘 Обратиться к админу")
+    @router.text("🆘 Обратиться к админу")
     def handle_contact_admin(message):
         from data.db import get_last_contact_time, add_contact
         import datetime
@@ -863,7 +853,7 @@ def register(bot, logger):
                 bot.send_message(ADMIN_ID, f"Обращение #{contact_id} от {contact}")
         clear_user_data(chat_id)
 
-    @bot.message_handler(func=lambda m: m.text == "ℹ️ О преподавателе")
+    @router.text("ℹ️ О преподавателе")
     def handle_about_teacher(message):
         text = (
             "👨‍🏫 <b>О преподавателе</b>\n\n"
@@ -875,7 +865,7 @@ def register(bot, logger):
         )
         bot.send_message(message.chat.id, text, parse_mode="HTML", reply_markup=menu.get_appropriate_menu(message.from_user.id))
 
-    @bot.message_handler(func=lambda m: m.text == "💰 Цены и форматы")
+    @router.text("💰 Цены и форматы")
     def handle_prices_formats(message):
         text = (
             "💰 <b>Формат и стоимость занятий</b>\n\n"
@@ -886,7 +876,7 @@ def register(bot, logger):
         )
         bot.send_message(message.chat.id, text, parse_mode="HTML", reply_markup=menu.get_appropriate_menu(message.from_user.id))
 
-    @bot.message_handler(func=lambda m: m.text == "📚 Доступные курсы")
+    @router.text("📚 Доступные курсы")
     def handle_available_courses(message):
         courses = get_active_courses()
         if not courses:
@@ -897,7 +887,7 @@ def register(bot, logger):
             text += f"<b>{c[1]}</b>\n{c[2]}\n\n"
         bot.send_message(message.chat.id, text, parse_mode="HTML", reply_markup=menu.get_appropriate_menu(message.from_user.id))
 
-    @bot.message_handler(func=lambda m: m.text == "⭐ Отзывы")
+    @router.text("⭐ Отзывы")
     @error_handler()
     def handle_show_reviews_user(message):
         try:
@@ -933,7 +923,7 @@ def register(bot, logger):
         except Exception as e:
             bot.send_message(message.chat.id, "⚠️ Произошла ошибка. Попробуйте позже.")
 
-    @bot.message_handler(commands=["start"])
+    @router.command("start")
     @error_handler()
     def handle_start(message):
         import time
@@ -6,20 +6,18 @@ from state.users import (
     get_registration_stage, update_registration_stage, 
     get_registration_start_time, cleanup_expired_registrations, clear_user_data
 )
-from utils.menu import get_main_menu, get_admin_menu, get_cancel_button, handle_cancel_action, get_appropriate_menu, is_admin
+from utils.menu import get_main_menu, get_admin_menu, get_cancel_button, handle_cancel_action, get_appropriate_menu, is_admin, get_courses_keyboard
 from data.db import (
     add_application,
-    get_application_by_tg_id,
-    get_active_courses,
-    get_archive_count_by_tg_id,
-    format_date_for_display,
-    get_cancelled_count_by_tg_id,
-    get_finished_count_by_tg_id
+    get_course_catalog,
+    get_user_profile,
+    format_date_for_display
 )
 from utils.logger import log_user_action, log_error, setup_logger
 from utils.security import check_user_security, validate_user_input, security_manager
 from utils.decorators import error_handler, ensure_text_message, ensure_stage
 from config import ADMIN_ID
+from services.router import get_message_router
 
 
 def handle_existing_registration(bot, chat_id):
@@ -28,7 +26,8 @@ def handle_existing_registration(bot, chat_id):
 
 
 def register(bot, logger):
-    @bot.message_handler(func=lambda m: m.text == "📋 Записаться")
+    router = get_message_router(bot)
+    @router.text("📋 Записаться")
     @error_handler()
     def handle_signup(message):
         chat_id = message.chat.id
@@ -38,8 +37,10 @@ def register(bot, logger):
         if not security_ok:
             bot.send_message(chat_id, f"🚫 {error_msg}")
             return
+        # Заявка и счетчики архива одним запросом (кэшируется до изменения заявок пользователя)
+        profile = get_user_profile(chat_id)
         # ИСПРАВЛЕНО: Проверка на существующие активные заявки
-        existing_app = get_application_by_tg_id(str(chat_id))
+        existing_app = profile["application"]
         if existing_app:
             status = existing_app[9]  # status
             if status == "Ожидает":
@@ -51,19 +52,19 @@ def register(bot, logger):
                 bot.send_message(chat_id, f"✅ У вас уже назначен урок:\n📅 {formatted_date}\n📘 {course}\n🔗 {link}", reply_markup=get_appropriate_menu(chat_id))
                 return
         # 1. Проверка отмен
-        if get_cancelled_count_by_tg_id(str(chat_id)) >= 2:
+        if profile["cancelled_count"] >= 2:
             bot.send_message(chat_id, "🚫 У вас 2 или более отменённых заявок или уроков. Запись невозможна. Свяжитесь с администратором.")
             return
         # 2. Проверка завершённых уроков
-        if get_finished_count_by_tg_id(str(chat_id)) >= 1:
+        if profile["finished_count"] >= 1:
             bot.send_message(chat_id, "✅ Вы уже проходили пробный урок. Для дальнейших занятий свяжитесь с администратором.")
             return
         # 3. Архивный лимит
-        if get_archive_count_by_tg_id(str(chat_id)) >= 2:
+        if profile["archive_count"] >= 2:
             bot.send_message(chat_id, "🚫 Вы уже записывались несколько раз. Пожалуйста, свяжитесь с администратором.")
             return
         # 4. Наличие курсов
-        if not get_active_courses():
+        if not get_course_catalog().active:
             bot.send_message(chat_id, "⚠️ Сейчас запись недоступна. Курсы временно неактивны.")
             return
         # 5. ИСПРАВЛЕНО: Проверка незавершенной регистрации
@@ -208,16 +209,11 @@ def register(bot, logger):
         update_user_data(chat_id, age=message.text.strip())
         update_registration_stage(chat_id, "course")
 
-        courses = get_active_courses()
-        if not courses:
+        if not get_course_catalog().active:
             bot.send_message(chat_id, "⚠️ Курсы временно недоступны.")
             return
 
-        markup = types.ReplyKeyboardMarkup(resize_keyboard=True, one_time_keyboard=True)
-        for course in courses:
-            markup.add(course[1])
-        markup.add("🔙 Отмена")
-        msg = bot.send_message(chat_id, "Выберите курс:", reply_markup=markup)
+        msg = bot.send_message(chat_id, "Выберите курс:", reply_markup=get_courses_keyboard())
         bot.register_next_step_handler(msg, process_course)
 
     @ensure_text_message
@@ -234,9 +230,7 @@ def register(bot, logger):
             handle_cancel_action(bot, message, "регистрация", logger)
             return
         selected = message.text.strip()
-        courses = get_active_courses()
-        course_names = [c[1] for c in courses]
-        if selected not in course_names:
+        if selected not in get_course_catalog().id_by_name:
             msg = bot.send_message(chat_id, "Пожалуйста, выберите курс из списка.", reply_markup=get_appropriate_menu(chat_id))
             bot.register_next_step_handler(msg, process_course)
             return
@@ -452,18 +446,14 @@ def register(bot, logger):
                 bot.register_next_step_handler(msg, process_age)
                 
             elif current_stage == "course":
-                courses = get_active_courses()
-                if not courses:
+                if not get_course_catalog().active:
                     bot.edit_message_text(
                         "⚠️ Курсы временно недоступны.",
                         chat_id, call.message.message_id
                     )
                     return
                 
-                markup = types.ReplyKeyboardMarkup(resize_keyboard=True, one_time_keyboard=True)
-                for course in courses:
-                    markup.add(course[1])
-                markup.add("🔙 Отмена")
+                markup = get_courses_keyboard()
                 
                 bot.edit_message_text(
                     "🔄 Продолжаем регистрацию.\n\nВыберите курс:",
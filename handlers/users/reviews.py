@@ -8,12 +8,14 @@ from data.db import (
 from utils.menu import get_main_menu, get_appropriate_menu
 from utils.logger import log_error, log_user_action
 from utils.decorators import error_handler, ensure_text_message, ensure_stage
+from services.router import get_message_router
 
 # Словарь для хранения состояния пользователей при оставлении отзывов
 review_states = {}
 
 def register(bot, logger):
     """Регистрация обработчиков отзывов"""
+    router = get_message_router(bot)
     
     def send_review_request(bot, user_tg_id, application_id, course_name):
         """Отправляет запрос на отзыв через 30 секунд после завершения урока"""
@@ -251,7 +253,7 @@ def register(bot, logger):
         except Exception as e:
             log_error(logger, e, f"Handling skip/cancel review for user {call.from_user.id}")
     
-    @bot.message_handler(func=lambda m: m.text == "⭐ Отзывы")
+    @router.text("⭐ Отзывы")
     @error_handler()
     def handle_show_reviews(message):
         print(f"handle_show_reviews called for user {message.from_user.id}")  # Для диагностики
@@ -0,0 +1,225 @@
+"""
+Параллельная обработка апдейтов с сохранением порядка внутри чата
+"""
+
+import threading
+import time
+from collections import deque
+from queue import Queue
+from telebot import TeleBot
+from utils.logger import setup_logger
+
+try:
+    from config import DISPATCHER_WORKERS, DISPATCHER_QUEUE_LIMIT, DISPATCHER_CHAT_QUEUE_LIMIT
+except (ImportError, ValueError):
+    DISPATCHER_WORKERS = 8
+    DISPATCHER_QUEUE_LIMIT = 1000
+    DISPATCHER_CHAT_QUEUE_LIMIT = 50
+
+logger = setup_logger('dispatcher')
+
+
+def get_update_chat_id(update):
+    """Возвращает id чата апдейта (или пользователя, если чата нет)"""
+    message = (update.message or update.edited_message or
+               update.channel_post or update.edited_channel_post)
+    if message:
+        return message.chat.id
+    if update.callback_query:
+        if update.callback_query.message:
+            return update.callback_query.message.chat.id
+        return update.callback_query.from_user.id
+    for item in (update.inline_query, update.chosen_inline_result, update.shipping_query,
+                 update.pre_checkout_query, update.poll_answer):
+        if item is not None:
+            user = getattr(item, "from_user", None) or getattr(item, "user", None)
+            return user.id if user else None
+    for item in (update.my_chat_member, update.chat_member, update.chat_join_request):
+        if item is not None:
+            return item.chat.id
+    return None
+
+
+class UpdateDispatcher:
+    """
+    Ограниченный пул воркеров для обработки апдейтов.
+    Апдейты одного чата выполняются строго по очереди (register_next_step_handler
+    видит сообщения в порядке поступления), разные чаты обрабатываются параллельно.
+    """
+
+    def __init__(self, bot: TeleBot, workers: int = DISPATCHER_WORKERS,
+                 queue_limit: int = DISPATCHER_QUEUE_LIMIT, chat_queue_limit: int = DISPATCHER_CHAT_QUEUE_LIMIT):
+        self.bot = bot
+        self.workers = max(1, workers)
+        self.queue_limit = max(1, queue_limit)
+        self.chat_queue_limit = max(1, chat_queue_limit)
+
+        # Исходный обработчик TeleBot: выполняет хендлеры в текущем потоке (threaded=False)
+        self._process_updates = TeleBot.process_new_updates.__get__(bot)
+
+        self._lock = threading.Lock()
+        self._not_full = threading.Condition(self._lock)
+        self._chats = {}           # chat_id -> deque[(update, enqueued_at)]
+        self._ready = Queue()      # чаты, у которых есть работа и которые никто не обрабатывает
+        self._pending = 0
+        self._threads = []
+        self.is_running = False
+
+        self._wait_samples = deque(maxlen=1000)
+        self._stats = {
+            "submitted": 0,
+            "processed": 0,
+            "errors": 0,
+            "dropped": 0,
+            "backpressure_waits": 0,
+            "max_pending": 0,
+            "wait_total": 0.0,
+            "wait_max": 0.0
+        }
+
+    def start(self):
+        """Запускает воркеры и перехватывает обработку апдейтов бота"""
+        if self.is_running:
+            logger.warning("Update dispatcher is already running")
+            return
+        self.is_running = True
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"dispatcher-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        # Polling вызывает self.process_new_updates — подменяем на постановку в очередь
+        self.bot.process_new_updates = self.submit_updates
+        logger.info(f"Update dispatcher started: {self.workers} workers, queue limit {self.queue_limit}, "
+                    f"per-chat limit {self.chat_queue_limit}")
+
+    def stop(self, timeout: float = 5):
+        """Останавливает воркеры, не дожидаясь разбора всей очереди"""
+        if not self.is_running:
+            return
+        self.is_running = False
+        self.bot.__dict__.pop("process_new_updates", None)
+        with self._lock:
+            self._not_full.notify_all()
+        for _ in self._threads:
+            self._ready.put(None)
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads.clear()
+        logger.info(f"Update dispatcher stopped, {self._pending} updates left unprocessed")
+
+    def submit_updates(self, updates):
+        """Ставит апдейты в очереди их чатов"""
+        for update in updates:
+            # Смещение для getUpdates сдвигаем сразу, иначе polling получит апдейт повторно
+            if update.update_id > self.bot.last_update_id:
+                self.bot.last_update_id = update.update_id
+            self.submit(update)
+
+    def submit(self, update) -> bool:
+        """Ставит апдейт в очередь. Возвращает False, если апдейт отброшен"""
+        if not self.is_running:
+            self._process_updates([update])
+            return True
+
+        chat_id = get_update_chat_id(update)
+        if chat_id is None:
+            chat_id = ("update", update.update_id)
+
+        with self._lock:
+            # Общий лимит: притормаживаем получение апдейтов, пока воркеры не разгрузятся
+            if self._pending >= self.queue_limit:
+                self._stats["backpressure_waits"] += 1
+                while self._pending >= self.queue_limit and self.is_running:
+                    self._not_full.wait(timeout=1)
+
+            chat_queue = self._chats.get(chat_id)
+            if chat_queue is not None and len(chat_queue) >= self.chat_queue_limit:
+                # Один чат не должен занять всю очередь (флуд)
+                self._stats["dropped"] += 1
+                logger.warning(f"Dropped update {update.update_id} for chat {chat_id}: "
+                               f"chat queue limit {self.chat_queue_limit} reached")
+                return False
+
+            schedule = chat_queue is None
+            if schedule:
+                chat_queue = self._chats[chat_id] = deque()
+            chat_queue.append((update, time.monotonic()))
+            self._pending += 1
+            self._stats["submitted"] += 1
+            self._stats["max_pending"] = max(self._stats["max_pending"], self._pending)
+
+        if schedule:
+            self._ready.put(chat_id)
+        return True
+
+    def _worker_loop(self):
+        """Цикл воркера: берет чат, обрабатывает один его апдейт и возвращает чат в очередь"""
+        while True:
+            chat_id = self._ready.get()
+            if chat_id is None:
+                break
+
+            with self._lock:
+                update, enqueued_at = self._chats[chat_id].popleft()
+
+            wait = time.monotonic() - enqueued_at
+            try:
+                self._process_updates([update])
+            except Exception as e:
+                with self._lock:
+                    self._stats["errors"] += 1
+                logger.error(f"Error processing update {update.update_id} for chat {chat_id}: {e}")
+
+            with self._lock:
+                self._pending -= 1
+                self._stats["processed"] += 1
+                self._stats["wait_total"] += wait
+                self._stats["wait_max"] = max(self._stats["wait_max"], wait)
+                self._wait_samples.append(wait)
+                self._not_full.notify()
+                # Следующий апдейт чата — в конец общей очереди, чтобы другие чаты не голодали
+                reschedule = bool(self._chats[chat_id])
+                if not reschedule:
+                    del self._chats[chat_id]
+            if reschedule:
+                self._ready.put(chat_id)
+
+    def get_stats(self) -> dict:
+        """Статистика диспетчера, время ожидания в очереди — в миллисекундах"""
+        with self._lock:
+            stats = dict(self._stats)
+            samples = sorted(self._wait_samples)
+            stats.update({
+                "workers": self.workers,
+                "pending": self._pending,
+                "active_chats": len(self._chats)
+            })
+        processed = stats.pop("processed")
+        wait_total = stats.pop("wait_total")
+        stats["processed"] = processed
+        stats["wait_avg_ms"] = round(wait_total / processed * 1000, 2) if processed else 0.0
+        stats["wait_max_ms"] = round(stats.pop("wait_max") * 1000, 2)
+        stats["wait_p95_ms"] = round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 2) if samples else 0.0
+        return stats
+
+
+# Глобальный экземпляр диспетчера
+update_dispatcher = None
+
+def init_update_dispatcher(bot):
+    """Инициализирует и запускает диспетчер апдейтов"""
+    global update_dispatcher
+    update_dispatcher = UpdateDispatcher(bot)
+    update_dispatcher.start()
+    return update_dispatcher
+
+def get_update_dispatcher():
+    """Возвращает глобальный экземпляр диспетчера"""
+    return update_dispatcher
+
+def stop_update_dispatcher():
+    """Останавливает диспетчер апдейтов"""
+    global update_dispatcher
+    if update_dispatcher:
+        update_dispatcher.stop()
+        update_dispatcher = None
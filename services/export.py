@@ -0,0 +1,307 @@
+"""
+Потоковая выгрузка таблиц в XLSX и CSV (gzip) в фоновом потоке
+"""
+
+import csv
+import gzip
+import io
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+from queue import Queue, Full, Empty
+import openpyxl
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from telebot import TeleBot
+from data.db import (
+    iter_all_applications, iter_all_archive, iter_all_contacts, iter_all_reviews,
+    get_all_applications_page, get_all_archive_page, get_all_contacts_page, get_all_reviews_page,
+    ALL_APPLICATIONS, ALL_ARCHIVE, ALL_CONTACTS, ALL_REVIEWS,
+    get_export_watermark, set_export_watermark
+)
+from utils.logger import setup_logger
+
+logger = setup_logger('export')
+
+# Набор данных: название, заголовки столбцов, поток строк, страница (для COUNT(*)),
+# позиции столбцов ключа (created_at/archived_at, id) в строке — для водяного знака
+ExportDataset = namedtuple("ExportDataset", ["title", "headers", "stream", "page", "key_index"])
+
+EXPORT_DATASETS = {
+    "applications": ExportDataset(
+        "Заявки",
+        ["ID", "TG ID", "Родитель", "Ученик", "Возраст", "Контакт", "Курс", "Дата урока", "Ссылка",
+         "Статус", "Создано", "Напоминание"],
+        iter_all_applications, get_all_applications_page, ALL_APPLICATIONS.key_index
+    ),
+    "archive": ExportDataset(
+        "Архив",
+        ["ID", "TG ID", "Родитель", "Ученик", "Возраст", "Контакт", "Курс", "Дата урока", "Ссылка",
+         "Статус", "Создано", "Архивировано", "Кем отменено", "Комментарий"],
+        iter_all_archive, get_all_archive_page, ALL_ARCHIVE.key_index
+    ),
+    "contacts": ExportDataset(
+        "Обращения",
+        ["ID", "TG ID", "Контакт", "Вопрос", "Ответ", "Статус", "Создано", "Ответ отправлен",
+         "Заблокирован", "Причина блокировки"],
+        iter_all_contacts, get_all_contacts_page, ALL_CONTACTS.key_index
+    ),
+    "reviews": ExportDataset(
+        "Отзывы",
+        ["ID", "Оценка", "Комментарий", "Анонимно", "Родитель", "Ученик", "Курс", "Дата", "TG ID"],
+        iter_all_reviews, get_all_reviews_page, ALL_REVIEWS.key_index
+    ),
+}
+
+EXPORT_FORMATS = {"xlsx": "Excel (XLSX)", "csv": "CSV (gzip)"}
+
+# Файл до этого размера собирается в памяти, больше — во временном файле
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+# Не чаще одного редактирования сообщения о ходе выгрузки за столько секунд
+PROGRESS_INTERVAL = 3.0
+
+# Выгрузок в очереди (включая выполняемую)
+EXPORT_QUEUE_LIMIT = 4
+
+
+def _clean_cell(value):
+    # openpyxl отказывается сохранять управляющие символы в строках
+    if isinstance(value, str):
+        return ILLEGAL_CHARACTERS_RE.sub("", value)
+    return value
+
+def write_xlsx(rows, headers, fileobj, title="Sheet", progress=None):
+    """
+    Пишет строки в write_only книгу: openpyxl сбрасывает строки листа во временный
+    XML-файл, в памяти остается только текущая строка. Возвращает число строк
+    """
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(title)
+    ws.append(headers)
+    count = 0
+    for row in rows:
+        ws.append([_clean_cell(value) for value in row])
+        count += 1
+        if progress:
+            progress(count)
+    wb.save(fileobj)
+    return count
+
+def write_csv_gzip(rows, headers, fileobj, progress=None):
+    """Пишет строки в CSV, сжатый gzip; BOM нужен Excel для UTF-8. Возвращает число строк"""
+    count = 0
+    with gzip.GzipFile(fileobj=fileobj, mode="wb") as gz, \
+            io.TextIOWrapper(gz, encoding="utf-8-sig", newline="") as text:
+        writer = csv.writer(text)
+        writer.writerow(headers)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+            if progress:
+                progress(count)
+    return count
+
+
+def _track_last_key(rows, key_index, last_key):
+    """Пропускает строки дальше, запоминая в last_key[0] наибольший ключ"""
+    for row in rows:
+        key = tuple(row[i] for i in key_index)
+        if None not in key and (last_key[0] is None or key > last_key[0]):
+            last_key[0] = key
+        yield row
+
+
+class ExportJob:
+    """
+    Заказанная выгрузка: куда отправить файл и какое сообщение обновлять.
+    changes — только строки, появившиеся после прошлой выгрузки набора
+    """
+
+    def __init__(self, chat_id, dataset: str, fmt: str, message_id=None, changes: bool = False):
+        self.chat_id = chat_id
+        self.dataset = dataset
+        self.fmt = fmt
+        self.message_id = message_id
+        self.changes = changes
+
+    @property
+    def key(self):
+        return (self.chat_id, self.dataset, self.fmt, self.changes)
+
+
+class ExportWorker:
+    """
+    Один фоновый поток выполняет выгрузки по очереди: строки читаются из БД пачками
+    (iter_* в data/db.py), пишутся в XLSX/CSV прямо в буфер (SpooledTemporaryFile)
+    и отправляются документом. Ход выгрузки показывается редактированием сообщения.
+    Поток обработки апдейтов в это время свободен.
+    """
+
+    def __init__(self, bot: TeleBot, queue_limit: int = EXPORT_QUEUE_LIMIT):
+        self.bot = bot
+        self._queue = Queue(maxsize=max(1, queue_limit))
+        self._lock = threading.Lock()
+        self._queued = set()       # ключи заказанных и выполняемых выгрузок
+        self._thread = None
+        self.is_running = False
+        self._stats = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0, "cancelled": 0,
+                       "rows": 0, "bytes": 0}
+
+    def start(self):
+        if self.is_running:
+            return
+        self.is_running = True
+        self._thread = threading.Thread(target=self._run, name="export-worker", daemon=True)
+        self._thread.start()
+        logger.info("✅ Export worker started")
+
+    def stop(self, timeout: float = 5.0):
+        """Останавливает поток; выгрузки, не дождавшиеся очереди, отменяются с сообщением админу"""
+        with self._lock:
+            self.is_running = False
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        while True:
+            try:
+                self._cancel(self._queue.get_nowait())
+            except Empty:
+                break
+        logger.info("✅ Export worker stopped")
+
+    def submit(self, job: ExportJob) -> bool:
+        """Ставит выгрузку в очередь. False — такая же уже заказана или очередь полна"""
+        with self._lock:
+            if not self.is_running or job.key in self._queued:
+                self._stats["rejected"] += 1
+                return False
+            try:
+                self._queue.put_nowait(job)
+            except Full:
+                self._stats["rejected"] += 1
+                return False
+            self._queued.add(job.key)
+            self._stats["submitted"] += 1
+        return True
+
+    def _run(self):
+        while self.is_running:
+            try:
+                job = self._queue.get(timeout=1)
+            except Empty:
+                continue
+            if not self.is_running:
+                # Остановка пришла, пока поток ждал задание
+                self._cancel(job)
+                break
+            try:
+                self.run(job)
+            finally:
+                with self._lock:
+                    self._queued.discard(job.key)
+
+    def _cancel(self, job: ExportJob):
+        """Снимает выгрузку из очереди, заменяя «в очереди…» сообщением об отмене"""
+        with self._lock:
+            self._queued.discard(job.key)
+            self._stats["cancelled"] += 1
+        self._edit(job, f"🚫 Выгрузка «{EXPORT_DATASETS[job.dataset].title}» отменена: бот остановлен")
+
+    def run(self, job: ExportJob):
+        """
+        Выполняет выгрузку в текущем потоке. После отправки файла ключ последней строки
+        сохраняется как водяной знак набора; выгрузка изменений читает только строки
+        после него
+        """
+        dataset = EXPORT_DATASETS[job.dataset]
+        started = time.monotonic()
+        try:
+            since = None
+            if job.changes:
+                watermark = get_export_watermark(job.dataset)
+                since = watermark["key"] if watermark else None
+            total = dataset.page(limit=1, since=since).total
+            if job.changes and total == 0:
+                self._edit(job, f"✅ Новых строк в «{dataset.title}» с прошлой выгрузки нет")
+                with self._lock:
+                    self._stats["completed"] += 1
+                return
+            last_report = [started]
+            last_key = [since]
+
+            def progress(count):
+                now = time.monotonic()
+                if now - last_report[0] >= PROGRESS_INTERVAL:
+                    last_report[0] = now
+                    self._edit(job, f"⏳ Выгрузка «{dataset.title}»: {count} из {total} строк…")
+
+            self._edit(job, f"⏳ Выгрузка «{dataset.title}»: 0 из {total} строк…")
+            suffix = "_changes" if since else ""
+            filename = f"{job.dataset}{suffix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            rows = _track_last_key(dataset.stream(since=since), dataset.key_index, last_key)
+            with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as buffer:
+                if job.fmt == "csv":
+                    filename += ".csv.gz"
+                    count = write_csv_gzip(rows, dataset.headers, buffer, progress)
+                else:
+                    filename += ".xlsx"
+                    count = write_xlsx(rows, dataset.headers, buffer, dataset.title, progress)
+                size = buffer.tell()
+                buffer.seek(0)
+                self.bot.send_document(job.chat_id, buffer, visible_file_name=filename,
+                                       caption=f"📊 {filename}\n{count} строк")
+            if last_key[0] is not None and last_key[0] != since:
+                set_export_watermark(job.dataset, last_key[0], count)
+            elapsed = time.monotonic() - started
+            self._edit(job, f"✅ Выгрузка «{dataset.title}» готова: {count} строк, {size // 1024} КБ")
+            with self._lock:
+                self._stats["completed"] += 1
+                self._stats["rows"] += count
+                self._stats["bytes"] += size
+            logger.info(f"✅ Export {job.dataset}.{job.fmt} to {job.chat_id}: {count} rows, {size} bytes, {elapsed:.2f}s")
+        except Exception as e:
+            with self._lock:
+                self._stats["failed"] += 1
+            logger.error(f"❌ Export {job.dataset}.{job.fmt} to {job.chat_id} failed: {e}")
+            self._edit(job, f"❌ Ошибка при экспорте: {e}")
+
+    def _edit(self, job: ExportJob, text: str):
+        try:
+            if job.message_id:
+                self.bot.edit_message_text(text, job.chat_id, job.message_id)
+            else:
+                job.message_id = self.bot.send_message(job.chat_id, text).message_id
+        except Exception as e:
+            # Ход выгрузки не критичен: ошибка редактирования не прерывает выгрузку
+            logger.warning(f"⚠️ Export progress update failed: {e}")
+
+    def get_stats(self) -> dict:
+        """Счетчики выгрузок"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["queued"] = len(self._queued)
+        return stats
+
+
+# Глобальный экземпляр воркера выгрузок
+export_worker = None
+
+def init_export_worker(bot):
+    """Создает и запускает воркер выгрузок"""
+    global export_worker
+    export_worker = ExportWorker(bot)
+    export_worker.start()
+    return export_worker
+
+def get_export_worker():
+    """Возвращает глобальный воркер выгрузок"""
+    return export_worker
+
+def stop_export_worker():
+    """Останавливает воркер выгрузок"""
+    global export_worker
+    if export_worker:
+        export_worker.stop()
+        export_worker = None
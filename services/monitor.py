@@ -1,3 +1,4 @@
+import heapq
 import threading
 import time
 from datetime import datetime, timedelta
@@ -7,11 +8,15 @@ from data.db import (
     mark_review_request_sent,
     has_user_reviewed_application,
     get_application_by_id,
-    get_upcoming_lessons,
+    get_application_with_lesson_ts,
+    get_pending_reminders,
     mark_reminder_sent,
-    format_date_for_display
+    format_date_for_display,
+    add_lesson_listener,
+    remove_lesson_listener
 )
 from utils.logger import setup_logger
+from services.outbound import bulk_sending
 
 logger = setup_logger('review_monitor')
 
@@ -64,25 +69,31 @@ class ReviewRequestMonitor:
                 
             logger.info(f"Found {len(completed_lessons)} lessons eligible for review requests")
             
-            for lesson in completed_lessons:
-                app_id, tg_id, course, lesson_date, lesson_link = lesson
-                
-                try:
-                    self._send_review_request(app_id, tg_id, course)
-                    # Отмечаем, что запрос отправлен
-                    try:
-                        mark_review_request_sent(app_id)
-                    except Exception as e:
-                        logger.error(f"Failed to mark review request sent for application {app_id}: {e}")
-                    logger.info(f"Review request sent for application {app_id}")
-                    
-                except Exception as e:
-                    logger.error(f"Failed to send review request for application {app_id}: {e}")
-                    continue
+            # Массовая рассылка уступает очередь интерактивным ответам
+            with bulk_sending():
+                self._send_review_requests(completed_lessons)
                     
         except Exception as e:
             logger.error(f"Error checking review requests: {e}")
             
+    def _send_review_requests(self, completed_lessons):
+        """Отправляет запросы на оценку по списку уроков"""
+        for lesson in completed_lessons:
+            app_id, tg_id, course, lesson_date, lesson_link = lesson
+            
+            try:
+                self._send_review_request(app_id, tg_id, course)
+                # Отмечаем, что запрос отправлен
+                try:
+                    mark_review_request_sent(app_id)
+                except Exception as e:
+                    logger.error(f"Failed to mark review request sent for application {app_id}: {e}")
+                logger.info(f"Review request sent for application {app_id}")
+                
+            except Exception as e:
+                logger.error(f"Failed to send review request for application {app_id}: {e}")
+                continue
+            
     def _send_review_request(self, app_id, tg_id, course):
         """Отправляет запрос на оценку пользователю"""
         try:
@@ -186,65 +197,142 @@ def stop_review_monitor():
         review_monitor = None
 
 class LessonReminderMonitor:
-    """Монитор для отправки напоминаний о предстоящих уроках за 30 минут"""
+    """
+    Планировщик напоминаний о предстоящих уроках за 30 минут.
+    Сроки напоминаний хранятся в min-heap: загружаются из БД один раз при старте
+    и обновляются при назначении, переносе и архивировании урока. Поток спит
+    ровно до ближайшего срока, без периодического опроса БД.
+    """
     def __init__(self, bot):
         self.bot = bot
         self.is_running = False
         self.monitor_thread = None
-        self.check_interval = 120  # Проверять каждые 2 минуты
         self.reminder_minutes = 30
+        self._cond = threading.Condition()
+        self._heap = []        # (время напоминания, app_id, время урока) — epoch-секунды
+        self._lessons = {}     # app_id -> актуальное время урока (lesson_ts)
 
     def start(self):
         if self.is_running:
             logger.warning("Lesson reminder monitor is already running")
             return
         self.is_running = True
+        add_lesson_listener(self.on_lesson_changed)
+        for app_id, lesson_ts in get_pending_reminders():
+            self._schedule(app_id, lesson_ts)
         self.monitor_thread = threading.Thread(target=self._monitor_loop, daemon=True)
         self.monitor_thread.start()
-        logger.info("Lesson reminder monitor started")
+        logger.info(f"Lesson reminder monitor started, {len(self._lessons)} reminders scheduled")
 
     def stop(self):
         self.is_running = False
+        remove_lesson_listener(self.on_lesson_changed)
+        with self._cond:
+            self._cond.notify_all()
         if self.monitor_thread:
             self.monitor_thread.join(timeout=5)
         logger.info("Lesson reminder monitor stopped")
 
+    def _schedule(self, app_id, lesson_ts):
+        """Добавляет (или переносит) напоминание; старая запись в куче становится неактуальной"""
+        with self._cond:
+            if lesson_ts is None:
+                self._lessons.pop(app_id, None)
+                return
+            self._lessons[app_id] = lesson_ts
+            due = lesson_ts - self.reminder_minutes * 60
+            heapq.heappush(self._heap, (due, app_id, lesson_ts))
+            self._cond.notify()
+
+    def on_lesson_changed(self, app_id, lesson_ts):
+        """Вызывается из data.db при назначении, переносе или архивировании урока"""
+        self._schedule(app_id, lesson_ts)
+
+    def _pop_due(self):
+        """Ждет ближайшего срока и возвращает актуальные напоминания (или [] при остановке)"""
+        with self._cond:
+            while self.is_running:
+                # Пропускаем записи, замененные переносом или архивированием
+                while self._heap and self._lessons.get(self._heap[0][1]) != self._heap[0][2]:
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                timeout = self._heap[0][0] - time.time()
+                if timeout > 0:
+                    self._cond.wait(timeout)
+                    continue
+                due = []
+                now = time.time()
+                while self._heap and self._heap[0][0] <= now:
+                    _, app_id, lesson_ts = heapq.heappop(self._heap)
+                    if self._lessons.get(app_id) == lesson_ts:
+                        del self._lessons[app_id]
+                        due.append((app_id, lesson_ts))
+                return due
+            return []
+
     def _monitor_loop(self):
         while self.is_running:
             try:
-                self._check_and_send_reminders()
-                time.sleep(self.check_interval)
+                due = self._pop_due()
+                if due:
+                    self._check_and_send_reminders(due)
             except Exception as e:
                 logger.error(f"Error in lesson reminder monitor loop: {e}")
                 time.sleep(60)
 
-    def _check_and_send_reminders(self):
+    def _check_and_send_reminders(self, due):
         try:
-            lessons = get_upcoming_lessons(self.reminder_minutes)
+            now = time.time()
+            lessons = []
+            for app_id, lesson_ts in due:
+                if lesson_ts <= now:
+                    # Урок уже начался — напоминание не актуально
+                    continue
+                # Сверяем с БД: заявку могли удалить или напоминание уже отправлено
+                lesson = get_application_with_lesson_ts(app_id)
+                if lesson and not lesson[11] and lesson[12] == lesson_ts:
+                    lessons.append(lesson[:12])
             if not lessons:
                 return
             logger.info(f"Found {len(lessons)} lessons for reminders")
-            for lesson in lessons:
-                app_id, tg_id, parent_name, student_name, age, contact, course, lesson_date, lesson_link, status, created_at, reminder_sent = lesson
-                try:
-                    formatted_date = format_date_for_display(lesson_date)
-                    msg = (
-                        f"⏰ Напоминание! Ваш урок начнётся через 30 минут или меньше.\n"
-                        f"📅 Дата: {formatted_date}\n"
-                        f"📘 Курс: {course}\n"
-                        f"🔗 Ссылка: {lesson_link}"
-                    )
-                    self.bot.send_message(tg_id, msg)
-                    try:
-                        mark_reminder_sent(app_id)
-                    except Exception as e:
-                        logger.error(f"Failed to mark reminder sent for application {app_id}: {e}")
-                    logger.info(f"[REMINDER] Sent to user {tg_id} for lesson {app_id}")
-                except Exception as e:
-                    logger.error(f"[REMINDER] Failed to send to {tg_id}: {e}")
+            with bulk_sending():
+                self._send_reminders(lessons)
         except Exception as e:
             logger.error(f"Error checking reminders: {e}")
 
+    def get_stats(self):
+        """Состояние планировщика"""
+        with self._cond:
+            next_due = min((entry[0] for entry in self._heap if self._lessons.get(entry[1]) == entry[2]), default=None)
+            return {
+                'scheduled_reminders': len(self._lessons),
+                'heap_size': len(self._heap),
+                'next_reminder_at': datetime.fromtimestamp(next_due).strftime("%Y-%m-%d %H:%M:%S") if next_due else None
+            }
+
+    def _send_reminders(self, lessons):
+        """Отправляет напоминания по списку уроков"""
+        for lesson in lessons:
+            app_id, tg_id, parent_name, student_name, age, contact, course, lesson_date, lesson_link, status, created_at, reminder_sent = lesson
+            try:
+                formatted_date = format_date_for_display(lesson_date)
+                msg = (
+                    f"⏰ Напоминание! Ваш урок начнётся через 30 минут или меньше.\n"
+                    f"📅 Дата: {formatted_date}\n"
+                    f"📘 Курс: {course}\n"
+                    f"🔗 Ссылка: {lesson_link}"
+                )
+                self.bot.send_message(tg_id, msg)
+                try:
+                    mark_reminder_sent(app_id)
+                except Exception as e:
+                    logger.error(f"Failed to mark reminder sent for application {app_id}: {e}")
+                logger.info(f"[REMINDER] Sent to user {tg_id} for lesson {app_id}")
+            except Exception as e:
+                logger.error(f"[REMINDER] Failed to send to {tg_id}: {e}")
+
 # Глобальный экземпляр монитора напоминаний
 lesson_reminder_monitor = None
 
@@ -0,0 +1,282 @@
+"""
+Очередь исходящих запросов к Telegram с учетом лимитов API
+"""
+
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from telebot import TeleBot
+from telebot.apihelper import ApiTelegramException
+from utils.logger import setup_logger
+
+try:
+    from config import (ADMIN_ID, OUTBOUND_GLOBAL_RATE, OUTBOUND_CHAT_RATE,
+                        OUTBOUND_CHAT_BURST, OUTBOUND_MAX_RETRIES)
+except (ImportError, ValueError):
+    ADMIN_ID = None
+    OUTBOUND_GLOBAL_RATE = 30
+    OUTBOUND_CHAT_RATE = 1
+    OUTBOUND_CHAT_BURST = 5
+    OUTBOUND_MAX_RETRIES = 3
+
+logger = setup_logger('outbound')
+
+# Приоритеты: меньше — раньше
+PRIORITY_ADMIN = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BULK = 2
+
+# Методы TeleBot, которые проходят через очередь (индекс позиционного аргумента chat_id).
+# Не входят: answer_callback_query (ответ на нажатие, а не сообщение в чат, и Telegram
+# ждет его не дольше нескольких секунд) и send_chat_action (в боте не используется)
+THROTTLED_METHODS = {
+    "send_message": 0,
+    "send_document": 0,
+    "send_photo": 0,
+    "send_video": 0,
+    "send_video_note": 0,
+    "send_audio": 0,
+    "send_voice": 0,
+    "send_animation": 0,
+    "send_sticker": 0,
+    "send_media_group": 0,
+    "send_location": 0,
+    "send_contact": 0,
+    "forward_message": 0,
+    "copy_message": 0,
+    "edit_message_text": 1,
+    "edit_message_caption": 1,
+    "edit_message_reply_markup": 0
+}
+
+# Корзина чата без активности дольше этого времени удаляется
+CHAT_BUCKET_IDLE_SECONDS = 300
+
+
+class TokenBucket:
+    """Корзина токенов: rate токенов в секунду, не больше capacity"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Сколько секунд ждать до появления токена (0 — токен есть)"""
+        self._refill(now)
+        pause = max(0.0, self.paused_until - now)
+        if self.tokens >= 1:
+            return pause
+        return max(pause, (1 - self.tokens) / self.rate)
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def pause(self, seconds: float, now: float):
+        """Запрещает выдачу токенов на seconds секунд (ответ 429)"""
+        self.paused_until = max(self.paused_until, now + seconds)
+        self.tokens = 0
+        # Пополнение начинается с конца паузы, иначе после нее сразу доступен весь всплеск
+        self.updated = max(self.updated, self.paused_until)
+
+    def is_idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity and now - self.updated > CHAT_BUCKET_IDLE_SECONDS
+
+
+class OutboundQueue:
+    """
+    Центральная очередь исходящих сообщений.
+    Вызывающий поток ждет своей очереди (глобальная корзина + корзина чата),
+    сам выполняет запрос и получает результат как раньше. Среди ожидающих
+    первыми обслуживаются сообщения админу, последними — массовые рассылки.
+    """
+
+    def __init__(self, global_rate: float = OUTBOUND_GLOBAL_RATE, chat_rate: float = OUTBOUND_CHAT_RATE,
+                 chat_burst: int = OUTBOUND_CHAT_BURST, max_retries: int = OUTBOUND_MAX_RETRIES):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.admin_id = int(ADMIN_ID) if ADMIN_ID else None
+
+        self._cond = threading.Condition()
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats = {}           # chat_id -> TokenBucket
+        self._waiters = []         # [priority, seq, chat_id]
+        self._seq = 0
+        self._local = threading.local()
+        self._last_eviction = time.monotonic()
+        self._stats = {
+            "sent": 0,
+            "throttle_waits": 0,
+            "wait_total": 0.0,
+            "retries": 0,
+            "rate_limited": 0,
+            "failed": 0,
+            "max_queue_depth": 0
+        }
+
+    @contextmanager
+    def priority(self, priority: int):
+        """Задает приоритет отправок текущего потока (например, PRIORITY_BULK для мониторов)"""
+        previous = getattr(self._local, "priority", None)
+        self._local.priority = priority
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+
+    def _resolve_priority(self, chat_id) -> int:
+        if self.admin_id is not None and chat_id == self.admin_id:
+            return PRIORITY_ADMIN
+        priority = getattr(self._local, "priority", None)
+        return PRIORITY_NORMAL if priority is None else priority
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = self._chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    def _evict_idle_chats(self, now: float):
+        """Ленивое удаление корзин неактивных чатов"""
+        if now - self._last_eviction < CHAT_BUCKET_IDLE_SECONDS:
+            return
+        self._last_eviction = now
+        waiting = {entry[2] for entry in self._waiters}
+        for chat_id in [c for c, b in self._chats.items() if c not in waiting and b.is_idle(now)]:
+            del self._chats[chat_id]
+
+    def _turn_delay(self, entry, now: float):
+        """None — очередь entry подошла, иначе сколько секунд подождать"""
+        global_delay = self._global.delay(now)
+        chat_delays = []
+        for waiter in sorted(self._waiters):
+            chat_delay = self._chat_bucket(waiter[2]).delay(now) if waiter[2] is not None else 0.0
+            if chat_delay == 0:
+                if waiter is not entry:
+                    # Первым идет более приоритетный ожидающий, он разбудит остальных
+                    return max(global_delay, 0.05)
+                return global_delay or None
+            chat_delays.append(chat_delay)
+        return max(global_delay, min(chat_delays))
+
+    def acquire(self, chat_id, priority: int = None):
+        """Ждет разрешения на отправку в чат"""
+        if priority is None:
+            priority = self._resolve_priority(chat_id)
+        started = time.monotonic()
+        with self._cond:
+            self._seq += 1
+            entry = [priority, self._seq, chat_id]
+            self._waiters.append(entry)
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], len(self._waiters))
+            try:
+                while True:
+                    now = time.monotonic()
+                    delay = self._turn_delay(entry, now)
+                    if delay is None:
+                        break
+                    self._cond.wait(delay)
+                self._global.take(now)
+                if chat_id is not None:
+                    self._chat_bucket(chat_id).take(now)
+                self._evict_idle_chats(now)
+            finally:
+                self._waiters.remove(entry)
+                self._cond.notify_all()
+
+            waited = time.monotonic() - started
+            if waited > 0.001:
+                self._stats["throttle_waits"] += 1
+                self._stats["wait_total"] += waited
+
+    def backoff(self, chat_id, retry_after: float):
+        """Приостанавливает отправку после ответа 429"""
+        now = time.monotonic()
+        with self._cond:
+            self._stats["rate_limited"] += 1
+            # Telegram не уточняет, какой лимит превышен, поэтому ждут все
+            self._global.pause(retry_after, now)
+            if chat_id is not None:
+                self._chat_bucket(chat_id).pause(retry_after, now)
+            self._cond.notify_all()
+
+    def call(self, chat_id, func, *args, **kwargs):
+        """Выполняет запрос к API с учетом лимитов и повтором после 429"""
+        attempt = 0
+        while True:
+            self.acquire(chat_id)
+            try:
+                result = func(*args, **kwargs)
+                with self._cond:
+                    self._stats["sent"] += 1
+                return result
+            except ApiTelegramException as e:
+                if e.error_code != 429:
+                    raise
+                retry_after = (e.result_json.get("parameters") or {}).get("retry_after", 1)
+                self.backoff(chat_id, retry_after)
+                if attempt >= self.max_retries:
+                    with self._cond:
+                        self._stats["failed"] += 1
+                    logger.error(f"Giving up on {func.__name__} to chat {chat_id} after {attempt} retries (429)")
+                    raise
+                attempt += 1
+                with self._cond:
+                    self._stats["retries"] += 1
+                logger.warning(f"429 for {func.__name__} to chat {chat_id}, retry {attempt} in {retry_after}s")
+
+    def wrap_bot(self, bot: TeleBot):
+        """Пропускает все исходящие методы бота через очередь"""
+        for name, chat_index in THROTTLED_METHODS.items():
+            original = getattr(TeleBot, name, None)
+            if original is None:
+                continue
+            setattr(bot, name, self._throttled(original.__get__(bot), chat_index))
+
+    def _throttled(self, method, chat_index: int):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            chat_id = kwargs.get("chat_id")
+            if chat_id is None and len(args) > chat_index:
+                chat_id = args[chat_index]
+            # ADMIN_ID хранится строкой, из апдейтов приходит int — приводим к одному ключу
+            try:
+                chat_id = int(chat_id)
+            except (TypeError, ValueError):
+                pass
+            return self.call(chat_id, method, *args, **kwargs)
+        return wrapper
+
+    def get_stats(self) -> dict:
+        """Счетчики очереди"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats["queue_depth"] = len(self._waiters)
+            stats["chat_buckets"] = len(self._chats)
+        wait_total = stats.pop("wait_total")
+        stats["wait_avg_ms"] = round(wait_total / stats["throttle_waits"] * 1000, 2) if stats["throttle_waits"] else 0.0
+        return stats
+
+
+# Глобальная очередь исходящих сообщений
+outbound_queue = OutboundQueue()
+
+def init_outbound_queue(bot):
+    """Подключает очередь ко всем исходящим методам бота"""
+    outbound_queue.wrap_bot(bot)
+    return outbound_queue
+
+def bulk_sending():
+    """Контекст массовой рассылки: такие сообщения уступают интерактивным"""
+    return outbound_queue.priority(PRIORITY_BULK)
@@ -0,0 +1,200 @@
+"""
+Маршрутизация точных текстов меню и команд через словарь
+"""
+
+import threading
+import time
+from collections import deque
+from telebot import TeleBot, util
+from utils.logger import setup_logger
+from utils.menu import is_admin
+
+logger = setup_logger('router')
+
+
+class Route:
+    """Обработчик точного текста или команды"""
+
+    __slots__ = ("key", "handler", "admin_only", "hits")
+
+    def __init__(self, key: str, handler, admin_only: bool):
+        self.key = key
+        self.handler = handler
+        self.admin_only = admin_only
+        self.hits = 0
+
+    @property
+    def name(self) -> str:
+        return f"{self.handler.__module__}.{self.handler.__name__}"
+
+    def accepts(self, message) -> bool:
+        return not self.admin_only or is_admin(message.from_user.id)
+
+
+class MessageRouter:
+    """
+    Вместо цепочки lambda m: m.text == "..." — два словаря: текст кнопки и команда.
+    В TeleBot регистрируется один хендлер, стоящий первым: он находит маршрут за O(1),
+    а сообщения без маршрута проходят дальше к обычным хендлерам с предикатами
+    (next step, этапы регистрации, fallback). На одном ключе маршруты проверяются
+    в порядке регистрации, как раньше проверялись хендлеры TeleBot.
+    """
+
+    def __init__(self, bot: TeleBot):
+        self.bot = bot
+        self._texts = {}           # текст -> [Route]
+        self._commands = {}        # команда без "/" -> [Route]
+        self._lock = threading.Lock()
+        self._resolve_samples = deque(maxlen=1000)
+        self._stats = {
+            "routed": 0,
+            "fallthrough": 0,
+            "errors": 0,
+            "resolve_total": 0.0,
+            "resolve_max": 0.0,
+            "handle_total": 0.0,
+            "handle_max": 0.0
+        }
+        bot.message_handler(func=self._match)(self._handle)
+
+    def text(self, text: str, admin_only: bool = False):
+        """Декоратор: хендлер для точного текста сообщения"""
+        return self._register(self._texts, text, admin_only)
+
+    def command(self, *commands: str, admin_only: bool = False):
+        """Декоратор: хендлер для команд (/start, /start@bot, /start args)"""
+        def decorator(handler):
+            for name in commands:
+                self._register(self._commands, name, admin_only)(handler)
+            return handler
+        return decorator
+
+    def _register(self, table: dict, key: str, admin_only: bool):
+        def decorator(handler):
+            table.setdefault(key, []).append(Route(key, handler, admin_only))
+            return handler
+        return decorator
+
+    def resolve(self, message):
+        """Возвращает маршрут для сообщения или None"""
+        text = message.text
+        if not text:
+            return None
+        if text.startswith("/"):
+            routes = self._commands.get(util.extract_command(text))
+        else:
+            routes = self._texts.get(text)
+        if routes:
+            for route in routes:
+                if route.accepts(message):
+                    return route
+        return None
+
+    def _match(self, message) -> bool:
+        start = time.perf_counter()
+        route = self.resolve(message)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._stats["routed" if route else "fallthrough"] += 1
+            self._stats["resolve_total"] += elapsed
+            self._stats["resolve_max"] = max(self._stats["resolve_max"], elapsed)
+            self._resolve_samples.append(elapsed)
+        if route is None:
+            return False
+        # Хендлер TeleBot вызывается сразу после фильтра с тем же объектом сообщения
+        message._route = route
+        return True
+
+    def _handle(self, message):
+        route = message._route
+        start = time.perf_counter()
+        try:
+            route.handler(message)
+        except Exception:
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                route.hits += 1
+                self._stats["handle_total"] += elapsed
+                self._stats["handle_max"] = max(self._stats["handle_max"], elapsed)
+            logger.info(f"⏱️ {route.name}: {elapsed * 1000:.1f} ms", extra={
+                "handler": route.handler.__name__,
+                "user_id": message.from_user.id if message.from_user else None,
+                "latency_ms": round(elapsed * 1000, 2)
+            })
+
+    def report(self) -> dict:
+        """
+        Отчет о маршрутах при запуске: дубликаты (второй маршрут никогда не вызовется),
+        перекрытия по роли (админский маршрут раньше общего) и хендлеры TeleBot без
+        фильтров, после которых более поздние хендлеры недостижимы
+        """
+        shadowed, role_overlaps = [], []
+        for kind, table in (("command", self._commands), ("text", self._texts)):
+            for key, routes in table.items():
+                label = f"/{key}" if kind == "command" else key
+                for i, route in enumerate(routes):
+                    earlier = routes[:i]
+                    # Общий маршрут перехватывает все, админский — только админские сообщения
+                    blocker = next((r for r in earlier if not r.admin_only or route.admin_only), None)
+                    if blocker:
+                        shadowed.append(f"{label}: {route.name} перекрыт {blocker.name}")
+                    elif earlier:
+                        role_overlaps.append(f"{label}: {earlier[0].name} (админ) раньше {route.name}")
+
+        unreachable = []
+        catch_all = None
+        for handler in self.bot.message_handlers:
+            filters = handler["filters"]
+            name = f"{handler['function'].__module__}.{handler['function'].__name__}"
+            if catch_all and set(filters.get("content_types", ())) <= catch_all[1]:
+                unreachable.append(f"{name} после {catch_all[0]}")
+            elif catch_all is None and set(filters) == {"content_types"}:
+                catch_all = (name, set(filters["content_types"]))
+
+        routes_count = sum(len(routes) for routes in self._texts.values()) + \
+            sum(len(routes) for routes in self._commands.values())
+        logger.info(f"✅ Router: {len(self._texts)} texts, {len(self._commands)} commands, {routes_count} routes, "
+                    f"{len(self.bot.message_handlers) - 1} predicate handlers")
+        for item in shadowed:
+            logger.warning(f"⚠️ Shadowed route {item}")
+        for item in role_overlaps:
+            logger.info(f"🔀 Role overlap {item}")
+        for item in unreachable:
+            logger.warning(f"⚠️ Unreachable handler {item}")
+        return {"shadowed": shadowed, "role_overlaps": role_overlaps, "unreachable": unreachable}
+
+    def get_stats(self) -> dict:
+        """Статистика маршрутизации: поиск маршрута — в микросекундах, хендлеры — в миллисекундах"""
+        with self._lock:
+            stats = dict(self._stats)
+            samples = sorted(self._resolve_samples)
+        lookups = stats["routed"] + stats["fallthrough"]
+        routed = stats["routed"]
+        resolve_total = stats.pop("resolve_total")
+        handle_total = stats.pop("handle_total")
+        stats["resolve_avg_us"] = round(resolve_total / lookups * 1e6, 2) if lookups else 0.0
+        stats["resolve_max_us"] = round(stats.pop("resolve_max") * 1e6, 2)
+        stats["resolve_p95_us"] = round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1e6, 2) if samples else 0.0
+        stats["handle_avg_ms"] = round(handle_total / routed * 1000, 2) if routed else 0.0
+        stats["handle_max_ms"] = round(stats.pop("handle_max") * 1000, 2)
+        return stats
+
+
+# Глобальный маршрутизатор
+message_router = None
+
+def init_message_router(bot):
+    """Создает маршрутизатор; вызывать до регистрации остальных хендлеров"""
+    global message_router
+    message_router = MessageRouter(bot)
+    return message_router
+
+def get_message_router(bot=None):
+    """Возвращает глобальный маршрутизатор (создает его для bot, если еще не создан)"""
+    if message_router is None and bot is not None:
+        return init_message_router(bot)
+    return message_router
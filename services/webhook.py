@@ -0,0 +1,193 @@
+"""
+Прием апдейтов через webhook: встроенный HTTP-сервер без внешних зависимостей
+"""
+
+import hmac
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from telebot import TeleBot, types
+from utils.logger import setup_logger
+
+try:
+    from config import WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_URL, WEBHOOK_SECRET_TOKEN, WEBHOOK_MAX_BODY
+except (ImportError, ValueError):
+    WEBHOOK_HOST = "0.0.0.0"
+    WEBHOOK_PORT = 8443
+    WEBHOOK_PATH = "/webhook"
+    WEBHOOK_URL = ""
+    WEBHOOK_SECRET_TOKEN = ""
+    WEBHOOK_MAX_BODY = 1048576
+
+logger = setup_logger('webhook')
+
+
+def decode_updates(payload: bytes) -> list:
+    """
+    Разбирает тело запроса в список апдейтов за один проход json.loads.
+    Принимает как одиночный апдейт (формат Telegram), так и массив апдейтов.
+    """
+    data = json.loads(payload)
+    if isinstance(data, dict):
+        data = [data]
+    # de_json получает уже разобранный dict и не парсит JSON повторно
+    return [types.Update.de_json(item) for item in data if isinstance(item, dict)]
+
+
+class _WebhookRequestHandler(BaseHTTPRequestHandler):
+    """Обработчик POST-запросов Telegram"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        server = self.server.webhook
+        # Ранние ответы не читают тело запроса: закрываем соединение, иначе на keep-alive
+        # непрочитанное тело будет разобрано как следующий запрос
+        if self.path != server.path:
+            self._reply(404, close=True)
+            return
+
+        if server.secret_token:
+            token = self.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+            if not hmac.compare_digest(token, server.secret_token):
+                server._count("rejected")
+                self._reply(403, close=True)
+                return
+
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length <= 0 or length > server.max_body:
+            server._count("rejected")
+            self._reply(413 if length > 0 else 400, close=True)
+            return
+
+        try:
+            updates = decode_updates(self.rfile.read(length))
+        except (ValueError, TypeError, KeyError) as e:
+            server._count("decode_errors")
+            logger.warning(f"Failed to decode webhook payload: {e}")
+            self._reply(400)
+            return
+
+        # Отвечаем сразу после постановки в очередь: хендлеры выполняются в диспетчере
+        server.feed(updates)
+        self._reply(200)
+
+    def do_GET(self):
+        self._reply(404)
+
+    def _reply(self, code: int, close: bool = False):
+        self.send_response(code)
+        self.send_header("Content-Length", "0")
+        if close:
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        # Access-лог http.server в stderr не нужен
+        pass
+
+
+class _WebhookHTTPServer(ThreadingHTTPServer):
+    """HTTP-сервер с очередью соединений под параллельную доставку Telegram (до 100 соединений)"""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class WebhookServer:
+    """Встроенный HTTP-сервер, передающий апдейты в общий реестр хендлеров бота"""
+
+    def __init__(self, bot: TeleBot, host: str = WEBHOOK_HOST, port: int = WEBHOOK_PORT,
+                 path: str = WEBHOOK_PATH, secret_token: str = WEBHOOK_SECRET_TOKEN,
+                 max_body: int = WEBHOOK_MAX_BODY):
+        self.bot = bot
+        self.host = host
+        self.port = port
+        self.path = path
+        self.secret_token = secret_token
+        self.max_body = max_body
+        self.httpd = None
+        self.server_thread = None
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "updates": 0,
+            "rejected": 0,
+            "decode_errors": 0
+        }
+
+    def _count(self, key: str, value: int = 1):
+        with self._lock:
+            self._stats[key] += value
+
+    def feed(self, updates: list):
+        """Передает апдейты боту (при запущенном диспетчере — в его очереди)"""
+        self._count("requests")
+        self._count("updates", len(updates))
+        if updates:
+            self.bot.process_new_updates(updates)
+
+    def _create_server(self):
+        self.httpd = _WebhookHTTPServer((self.host, self.port), _WebhookRequestHandler)
+        self.httpd.webhook = self
+        # При port=0 ОС выбирает свободный порт
+        self.port = self.httpd.server_address[1]
+
+    def register_webhook(self, url: str = WEBHOOK_URL):
+        """Регистрирует адрес webhook в Telegram"""
+        if not url:
+            raise ValueError("WEBHOOK_URL не задан")
+        full_url = url.rstrip("/") + self.path
+        self.bot.remove_webhook()
+        self.bot.set_webhook(url=full_url, secret_token=self.secret_token or None)
+        logger.info(f"Webhook registered: {full_url}")
+
+    def start(self):
+        """Запускает сервер в фоновом потоке"""
+        self._create_server()
+        self.server_thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.server_thread.start()
+        logger.info(f"Webhook server started on {self.host}:{self.port}{self.path}")
+
+    def serve_forever(self):
+        """Запускает сервер в текущем потоке (блокирующий вызов)"""
+        self._create_server()
+        logger.info(f"Webhook server listening on {self.host}:{self.port}{self.path}")
+        self.httpd.serve_forever()
+
+    def stop(self):
+        """Останавливает сервер"""
+        if self.httpd:
+            if self.server_thread:
+                self.httpd.shutdown()
+                self.server_thread.join(timeout=5)
+            self.httpd.server_close()
+            self.httpd = None
+        logger.info("Webhook server stopped")
+
+    def get_stats(self) -> dict:
+        """Статистика приема апдейтов"""
+        with self._lock:
+            return dict(self._stats)
+
+
+# Глобальный экземпляр webhook-сервера
+webhook_server = None
+
+def init_webhook_server(bot):
+    """Создает webhook-сервер и регистрирует адрес в Telegram"""
+    global webhook_server
+    webhook_server = WebhookServer(bot)
+    webhook_server.register_webhook()
+    return webhook_server
+
+def stop_webhook_server():
+    """Останавливает webhook-сервер"""
+    global webhook_server
+    if webhook_server:
+        webhook_server.stop()
+        webhook_server = None
@@ -0,0 +1,508 @@
+"""
+Бэкенды хранения для StateManager
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+from data.pool import ConnectionPool
+from state.journal import StateJournal
+
+# Пространства имен-словарей (ключ — строковый id)
+KEYED_NAMESPACES = ("user_data", "chat_contact_map", "pending", "rate_limit_data", "suspicious_activities")
+# Пространства имен-множеств (в JSON хранятся списками)
+SET_NAMESPACES = ("writing_ids", "banned_users")
+
+_MISSING = object()
+
+
+class StateBackend:
+    """
+    Интерфейс хранилища состояний.
+    Ключи словарей — строки, элементы множеств — int. ttl задается в секундах,
+    None — без срока хранения.
+    """
+
+    name = "base"
+
+    def load(self):
+        """Загружает сохраненное состояние"""
+
+    def get(self, namespace: str, key: str, default=None):
+        raise NotImplementedError
+
+    def set(self, namespace: str, key: str, value, ttl: Optional[float] = None):
+        raise NotImplementedError
+
+    def update(self, namespace: str, key: str, func, default=None, ttl: Optional[float] = None):
+        """Атомарно заменяет значение на func(текущее или default) и возвращает его"""
+        raise NotImplementedError
+
+    def delete(self, namespace: str, key: str) -> bool:
+        raise NotImplementedError
+
+    def items(self, namespace: str) -> List[Tuple[str, Any]]:
+        raise NotImplementedError
+
+    def count(self, namespace: str) -> int:
+        raise NotImplementedError
+
+    def add_member(self, namespace: str, member: int):
+        raise NotImplementedError
+
+    def discard_member(self, namespace: str, member: int) -> bool:
+        raise NotImplementedError
+
+    def has_member(self, namespace: str, member: int) -> bool:
+        raise NotImplementedError
+
+    def members(self, namespace: str) -> Set[int]:
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    @property
+    def pending_changes(self) -> int:
+        """Изменений с последнего flush"""
+        return 0
+
+    def needs_flush(self, overdue: bool) -> bool:
+        """Нужен ли flush, если с прошлого прошло auto_save_interval (overdue)"""
+        return overdue and self.pending_changes > 0
+
+    def flush(self):
+        """Периодическое обслуживание: компакция, удаление просроченных записей"""
+
+    def close(self):
+        """Закрывает хранилище"""
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+
+class _Shard:
+    """Часть состояния со своей блокировкой"""
+
+    __slots__ = ("lock", "state")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.state = {namespace: {} for namespace in KEYED_NAMESPACES}
+        self.state.update({namespace: set() for namespace in SET_NAMESPACES})
+
+
+class MemoryBackend(StateBackend):
+    """
+    Все состояние в памяти, персистентность через снапшот state.json и журнал изменений.
+    Состояние разбито на shards частей по ключу (id пользователя/чата/заявки),
+    у каждой своя блокировка: обработчики разных пользователей не ждут друг друга.
+    ttl не поддерживается: записи живут до явного удаления.
+    """
+
+    name = "memory"
+
+    def __init__(self, storage_file: str = "state/state.json", shards: int = 16):
+        self.storage_file = storage_file
+        self._journal = StateJournal(storage_file)
+        self._compact_lock = threading.Lock()  # Компакции строго по очереди, иначе старый снапшот перезапишет новый
+        self._shards = [_Shard() for _ in range(max(1, shards))]
+        self.loaded_records = 0
+
+    def _shard(self, key) -> _Shard:
+        # Ключи словарей — строки с id, элементы множеств — int; оба хэшируются стабильно в пределах процесса
+        return self._shards[hash(key) % len(self._shards)]
+
+    def _locked_all(self):
+        """Блокировки всех частей в фиксированном порядке (для clear)"""
+        return _AllLocks(self._shards)
+
+    def load(self):
+        loaded_state, records = self._journal.load()
+        with self._locked_all():
+            for namespace, value in loaded_state.items():
+                if namespace in KEYED_NAMESPACES:
+                    for key, item in value.items():
+                        self._shard(key).state[namespace][key] = item
+                elif namespace in SET_NAMESPACES:
+                    for member in value:
+                        self._shard(member).state[namespace].add(member)
+            for record in records:
+                self._apply(record)
+        self.loaded_records = len(records)
+
+    def _apply(self, record: list):
+        """Применяет запись журнала к состоянию"""
+        op = record[0]
+        if op == "set":
+            self._shard(record[2]).state[record[1]][record[2]] = record[3]
+        elif op == "del":
+            self._shard(record[2]).state[record[1]].pop(record[2], None)
+        elif op == "add":
+            self._shard(record[2]).state[record[1]].add(record[2])
+        elif op == "discard":
+            self._shard(record[2]).state[record[1]].discard(record[2])
+        elif op == "clear":
+            for shard in self._shards:
+                shard.state = _Shard().state
+
+    def _record(self, *record):
+        """Ставит изменение в журнал (под блокировкой части, чтобы порядок по ключу совпадал)"""
+        self._journal.enqueue(list(record))
+
+    def get(self, namespace, key, default=None):
+        shard = self._shard(key)
+        with shard.lock:
+            return shard.state[namespace].get(key, default)
+
+    def set(self, namespace, key, value, ttl=None):
+        shard = self._shard(key)
+        with shard.lock:
+            shard.state[namespace][key] = value
+            self._record("set", namespace, key, value)
+        # Запись в файл — вне блокировки части
+        self._journal.drain()
+
+    def update(self, namespace, key, func, default=None, ttl=None):
+        shard = self._shard(key)
+        with shard.lock:
+            value = func(shard.state[namespace].get(key, default))
+            shard.state[namespace][key] = value
+            self._record("set", namespace, key, value)
+        self._journal.drain()
+        return value
+
+    def delete(self, namespace, key):
+        shard = self._shard(key)
+        with shard.lock:
+            if shard.state[namespace].pop(key, _MISSING) is _MISSING:
+                return False
+            self._record("del", namespace, key)
+        self._journal.drain()
+        return True
+
+    def items(self, namespace):
+        result = []
+        for shard in self._shards:
+            with shard.lock:
+                result.extend(shard.state[namespace].items())
+        return result
+
+    def count(self, namespace):
+        total = 0
+        for shard in self._shards:
+            with shard.lock:
+                total += len(shard.state[namespace])
+        return total
+
+    def add_member(self, namespace, member):
+        shard = self._shard(member)
+        with shard.lock:
+            shard.state[namespace].add(member)
+            self._record("add", namespace, member)
+        self._journal.drain()
+
+    def discard_member(self, namespace, member):
+        shard = self._shard(member)
+        with shard.lock:
+            if member not in shard.state[namespace]:
+                return False
+            shard.state[namespace].discard(member)
+            self._record("discard", namespace, member)
+        self._journal.drain()
+        return True
+
+    def has_member(self, namespace, member):
+        shard = self._shard(member)
+        with shard.lock:
+            return member in shard.state[namespace]
+
+    def members(self, namespace):
+        result = set()
+        for shard in self._shards:
+            with shard.lock:
+                result |= shard.state[namespace]
+        return result
+
+    def clear(self):
+        with self._locked_all():
+            for shard in self._shards:
+                shard.state = _Shard().state
+            self._record("clear")
+        self._journal.drain()
+
+    @property
+    def pending_changes(self):
+        return self._journal.records
+
+    def flush(self):
+        """
+        Компакция без общей остановки: журнал переключается на новый сегмент,
+        затем части копируются по одной под своей блокировкой. Копия может
+        включать часть изменений нового сегмента, но записи журнала задают
+        итоговое значение ключа, поэтому их повторное применение при загрузке
+        дает то же состояние, что и последовательный снапшот.
+        """
+        with self._compact_lock:
+            # Новые изменения пойдут в следующий сегмент; снапшот включает все до него
+            seq = self._journal.rotate()
+            save_data = {namespace: {} for namespace in KEYED_NAMESPACES}
+            save_data.update({namespace: [] for namespace in SET_NAMESPACES})
+            for shard in self._shards:
+                with shard.lock:
+                    for namespace, value in shard.state.items():
+                        # Неглубокая копия: значения заменяются целиком, а не изменяются на месте
+                        if namespace in SET_NAMESPACES:
+                            save_data[namespace].extend(value)
+                        else:
+                            save_data[namespace].update(value)
+
+            # Сериализация и запись — без блокировок состояния
+            self._journal.write_snapshot(save_data, seq)
+
+    def close(self):
+        self._journal.close()
+
+    def get_stats(self):
+        return {"backend": self.name, "shards": len(self._shards), "journal_records": self._journal.records}
+
+
+class _AllLocks:
+    """Контекст, захватывающий блокировки всех частей"""
+
+    def __init__(self, shards):
+        self._shards = shards
+
+    def __enter__(self):
+        for shard in self._shards:
+            shard.lock.acquire()
+
+    def __exit__(self, exc_type, exc, tb):
+        for shard in reversed(self._shards):
+            shard.lock.release()
+        return False
+
+
+class SQLiteBackend(StateBackend):
+    """
+    Состояние в SQLite: по таблице на пространство имен (state_<namespace>).
+    Запись идет сразу в базу (write-through), чтения обслуживает LRU-кэш
+    ограниченного размера, включая отрицательные ответы. Множества небольшие
+    и целиком держатся в памяти. Записи с ttl удаляются при flush.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, db_path: str = "state/state.db", cache_size: int = 10000,
+                 import_file: Optional[str] = None):
+        self.db_path = db_path
+        self.cache_size = max(1, cache_size)
+        self.import_file = import_file
+        self._lock = threading.Lock()
+        self._pool = None
+        self._cache = OrderedDict()    # (namespace, key) -> (value, expires_at)
+        self._members = {namespace: set() for namespace in SET_NAMESPACES}
+        self._changes = 0
+        self._stats = {"cache_hits": 0, "cache_misses": 0, "expired_purged": 0}
+
+    def load(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        is_new = not os.path.exists(self.db_path)
+        self._pool = ConnectionPool(self.db_path, max_size=1,
+                                    pragmas={"journal_mode": "WAL", "synchronous": "NORMAL"})
+        with self._pool.connection() as conn:
+            for namespace in KEYED_NAMESPACES:
+                conn.execute(f'''
+                    CREATE TABLE IF NOT EXISTS state_{namespace} (
+                        key TEXT PRIMARY KEY,
+                        value TEXT NOT NULL,
+                        expires_at REAL
+                    )
+                ''')
+                conn.execute(f'''
+                    CREATE INDEX IF NOT EXISTS idx_state_{namespace}_expires
+                    ON state_{namespace}(expires_at) WHERE expires_at IS NOT NULL
+                ''')
+            for namespace in SET_NAMESPACES:
+                conn.execute(f"CREATE TABLE IF NOT EXISTS state_{namespace} (member INTEGER PRIMARY KEY)")
+
+        if is_new and self.import_file and os.path.exists(self.import_file):
+            self._import_json_state()
+
+        with self._pool.connection() as conn:
+            for namespace in SET_NAMESPACES:
+                rows = conn.execute(f"SELECT member FROM state_{namespace}").fetchall()
+                self._members[namespace] = {row[0] for row in rows}
+
+    def _import_json_state(self):
+        """Переносит состояние из state.json (и его журнала) при первом запуске"""
+        source = MemoryBackend(self.import_file)
+        source.load()
+        source.close()
+        with self._pool.connection() as conn:
+            for namespace in KEYED_NAMESPACES:
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO state_{namespace} (key, value, expires_at) VALUES (?, ?, NULL)",
+                    [(key, json.dumps(value, ensure_ascii=False)) for key, value in source.items(namespace)]
+                )
+            for namespace in SET_NAMESPACES:
+                conn.executemany(f"INSERT OR IGNORE INTO state_{namespace} (member) VALUES (?)",
+                                 [(member,) for member in source.members(namespace)])
+
+    def _cache_put(self, namespace, key, value, expires_at):
+        cache_key = (namespace, key)
+        self._cache[cache_key] = (value, expires_at)
+        self._cache.move_to_end(cache_key)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _get_locked(self, namespace, key, default, now):
+        entry = self._cache.get((namespace, key))
+        if entry is not None:
+            self._stats["cache_hits"] += 1
+            self._cache.move_to_end((namespace, key))
+        else:
+            self._stats["cache_misses"] += 1
+            with self._pool.connection() as conn:
+                row = conn.execute(f"SELECT value, expires_at FROM state_{namespace} WHERE key = ?",
+                                   (key,)).fetchone()
+            entry = (json.loads(row[0]), row[1]) if row else (_MISSING, None)
+            self._cache_put(namespace, key, *entry)
+        value, expires_at = entry
+        if value is _MISSING or (expires_at is not None and expires_at <= now):
+            return default
+        return value
+
+    def _set_locked(self, namespace, key, value, ttl):
+        expires_at = time.time() + ttl if ttl else None
+        with self._pool.connection() as conn:
+            conn.execute(f"INSERT OR REPLACE INTO state_{namespace} (key, value, expires_at) VALUES (?, ?, ?)",
+                         (key, json.dumps(value, ensure_ascii=False), expires_at))
+        self._cache_put(namespace, key, value, expires_at)
+        self._changes += 1
+
+    def get(self, namespace, key, default=None):
+        with self._lock:
+            return self._get_locked(namespace, key, default, time.time())
+
+    def set(self, namespace, key, value, ttl=None):
+        with self._lock:
+            self._set_locked(namespace, key, value, ttl)
+
+    def update(self, namespace, key, func, default=None, ttl=None):
+        with self._lock:
+            value = func(self._get_locked(namespace, key, default, time.time()))
+            self._set_locked(namespace, key, value, ttl)
+            return value
+
+    def delete(self, namespace, key):
+        with self._lock:
+            with self._pool.connection() as conn:
+                deleted = conn.execute(f"DELETE FROM state_{namespace} WHERE key = ?", (key,)).rowcount
+            self._cache_put(namespace, key, _MISSING, None)
+            self._changes += 1
+            return deleted > 0
+
+    def items(self, namespace):
+        with self._lock:
+            with self._pool.connection() as conn:
+                rows = conn.execute(
+                    f"SELECT key, value FROM state_{namespace} WHERE expires_at IS NULL OR expires_at > ?",
+                    (time.time(),)
+                ).fetchall()
+        return [(key, json.loads(value)) for key, value in rows]
+
+    def count(self, namespace):
+        if namespace in SET_NAMESPACES:
+            with self._lock:
+                return len(self._members[namespace])
+        with self._lock:
+            with self._pool.connection() as conn:
+                return conn.execute(
+                    f"SELECT COUNT(*) FROM state_{namespace} WHERE expires_at IS NULL OR expires_at > ?",
+                    (time.time(),)
+                ).fetchone()[0]
+
+    def add_member(self, namespace, member):
+        with self._lock:
+            with self._pool.connection() as conn:
+                conn.execute(f"INSERT OR IGNORE INTO state_{namespace} (member) VALUES (?)", (member,))
+            self._members[namespace].add(member)
+            self._changes += 1
+
+    def discard_member(self, namespace, member):
+        with self._lock:
+            if member not in self._members[namespace]:
+                return False
+            with self._pool.connection() as conn:
+                conn.execute(f"DELETE FROM state_{namespace} WHERE member = ?", (member,))
+            self._members[namespace].discard(member)
+            self._changes += 1
+            return True
+
+    def has_member(self, namespace, member):
+        with self._lock:
+            return member in self._members[namespace]
+
+    def members(self, namespace):
+        with self._lock:
+            return self._members[namespace].copy()
+
+    def clear(self):
+        with self._lock:
+            with self._pool.connection() as conn:
+                for namespace in KEYED_NAMESPACES + SET_NAMESPACES:
+                    conn.execute(f"DELETE FROM state_{namespace}")
+            self._cache.clear()
+            self._members = {namespace: set() for namespace in SET_NAMESPACES}
+            self._changes += 1
+
+    @property
+    def pending_changes(self):
+        return self._changes
+
+    def needs_flush(self, overdue):
+        # Записи истекают и без новых изменений
+        return overdue
+
+    def flush(self):
+        """Удаляет просроченные записи из базы и кэша"""
+        now = time.time()
+        with self._lock:
+            purged = 0
+            with self._pool.connection() as conn:
+                for namespace in KEYED_NAMESPACES:
+                    purged += conn.execute(
+                        f"DELETE FROM state_{namespace} WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)
+                    ).rowcount
+            for cache_key in [k for k, (_, expires_at) in self._cache.items()
+                              if expires_at is not None and expires_at <= now]:
+                del self._cache[cache_key]
+            self._stats["expired_purged"] += purged
+            self._changes = 0
+
+    def close(self):
+        if self._pool:
+            self._pool.close()
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({"backend": self.name, "cache_entries": len(self._cache)})
+        return stats
+
+
+def create_state_backend(kind: str, storage_file: str, db_path: str, cache_size: int,
+                         shards: int = 16) -> StateBackend:
+    """Создает бэкенд по имени из конфигурации (memory | sqlite)"""
+    if kind == "sqlite":
+        # При переходе с memory состояние переносится из state.json
+        return SQLiteBackend(db_path, cache_size=cache_size, import_file=storage_file)
+    if kind != "memory":
+        raise ValueError(f"Неизвестный бэкенд состояний: {kind}")
+    return MemoryBackend(storage_file, shards=shards)
@@ -0,0 +1,141 @@
+"""
+Журнал изменений состояния: снапшот + append-only сегменты
+"""
+
+import glob
+import json
+import os
+import threading
+from typing import Any, Dict, List, Tuple
+
+
+class StateJournal:
+    """
+    Персистентность StateManager без полной перезаписи файла на каждое сохранение.
+    Каждое изменение дописывается одной строкой в текущий сегмент журнала
+    (state.json.journal.<N>). Компакция закрывает сегмент, пишет снапшот
+    с отметкой _journal_seq и удаляет вошедшие в него сегменты.
+    При загрузке к снапшоту применяются сегменты с номером больше отметки.
+
+    Запись разделена на enqueue (под блокировкой вызывающего, без ввода-вывода)
+    и drain (групповая запись накопленных строк одним write/flush).
+    """
+
+    def __init__(self, snapshot_file: str):
+        self.snapshot_file = snapshot_file
+        self.journal_prefix = f"{snapshot_file}.journal."
+        self._lock = threading.Lock()        # Буфер строк
+        self._io_lock = threading.Lock()     # Файл сегмента
+        self._buffer = []
+        self._file = None
+        self._seq = 0
+        self.records = 0           # Записей с последней компакции
+
+    def _segments(self) -> List[Tuple[int, str]]:
+        """Существующие сегменты журнала по возрастанию номера"""
+        segments = []
+        for path in glob.glob(f"{glob.escape(self.journal_prefix)}*"):
+            suffix = path[len(self.journal_prefix):]
+            if suffix.isdigit():
+                segments.append((int(suffix), path))
+        return sorted(segments)
+
+    def _open_segment(self):
+        self._file = open(f"{self.journal_prefix}{self._seq}", 'a', encoding='utf-8')
+
+    def load(self) -> Tuple[Dict[str, Any], List[list]]:
+        """Возвращает снапшот и записи журнала, которые нужно к нему применить"""
+        directory = os.path.dirname(self.snapshot_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        snapshot = {}
+        if os.path.exists(self.snapshot_file):
+            with open(self.snapshot_file, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        snapshot_seq = snapshot.pop("_journal_seq", 0)
+
+        records = []
+        segments = self._segments()
+        for seq, path in segments:
+            if seq <= snapshot_seq:
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        # Недописанная строка при аварийной остановке — дальше данных нет
+                        break
+
+        last_seq = segments[-1][0] if segments else 0
+        with self._io_lock:
+            self._seq = max(snapshot_seq, last_seq) + 1
+            self.records = len(records)
+            self._open_segment()
+        return snapshot, records
+
+    def enqueue(self, record: list):
+        """Ставит запись в буфер. Порядок записей совпадает с порядком вызовов"""
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+        with self._lock:
+            self._buffer.append(line)
+
+    def drain(self):
+        """
+        Записывает буфер в текущий сегмент. После возврата все ранее
+        поставленные записи сброшены в файл: либо этим вызовом, либо
+        предыдущим, который держал _io_lock
+        """
+        with self._io_lock:
+            self._write_buffer()
+
+    def _write_buffer(self):
+        with self._lock:
+            lines, self._buffer = self._buffer, []
+        if lines and self._file is not None:
+            self._file.write('\n'.join(lines) + '\n')
+            self._file.flush()
+            self.records += len(lines)
+
+    def append(self, record: list):
+        """Дописывает запись в текущий сегмент"""
+        self.enqueue(record)
+        self.drain()
+
+    def rotate(self) -> int:
+        """Закрывает текущий сегмент и открывает следующий. Возвращает номер закрытого"""
+        with self._io_lock:
+            # Все, что поставлено до переключения, остается в закрываемом сегменте
+            self._write_buffer()
+            closed_seq = self._seq
+            if self._file is not None:
+                self._file.close()
+            self._seq += 1
+            self.records = 0
+            self._open_segment()
+            return closed_seq
+
+    def write_snapshot(self, state: Dict[str, Any], seq: int):
+        """Пишет снапшот, включающий все сегменты до seq, и удаляет их"""
+        data = dict(state)
+        data["_journal_seq"] = seq
+        temp_file = f"{self.snapshot_file}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(temp_file, self.snapshot_file)
+
+        for segment_seq, path in self._segments():
+            if segment_seq <= seq:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def close(self):
+        """Закрывает текущий сегмент"""
+        with self._io_lock:
+            self._write_buffer()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -58,7 +58,7 @@ def cleanup_expired_registrations(timeout_minutes: int = 30):
     timeout_seconds = timeout_minutes * 60
     
     # Получаем всех пользователей с активными регистрациями
-    all_user_data = state_manager._state["user_data"]
+    all_user_data = state_manager.get_all_user_data()
     expired_users = []
     
     for user_id_str, data in all_user_data.items():
@@ -110,7 +110,7 @@ def is_writing_id(app_id: int) -> bool:
 
 def get_writing_ids():
     """Получает все ID заявок в обработке"""
-    return state_manager._state["writing_ids"].copy()
+    return state_manager.get_writing_ids()
 
 # Функции для работы с chat_contact_map
 def get_chat_contact(chat_id: int):
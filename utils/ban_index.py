@@ -0,0 +1,115 @@
+"""
+Единый индекс блокировок пользователей в памяти
+"""
+
+import threading
+from data.db import add_ban_listener, add_contacts_cleared_listener, get_banned_contact_user_ids
+from state.state_manager import state_manager
+from utils.logger import setup_logger
+
+logger = setup_logger('ban_index')
+
+
+class BanIndex:
+    """
+    Два вида блокировок в одном месте:
+    - полный бан (SecurityManager.ban_user / unban_user, хранится в StateManager) — бот недоступен;
+    - бан обращений (ban_user_by_contact, флаг contacts.banned) — нельзя писать админу.
+    Индекс загружается один раз и обновляется теми же вызовами, что пишут в хранилища,
+    так что каждая проверка — поиск в множестве без запросов к БД.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._banned = set()
+        self._contact_banned = set()
+        self.loaded = False
+
+    def load(self):
+        """Загружает блокировки из StateManager и таблицы contacts"""
+        banned = {int(user_id) for user_id in state_manager.get_banned_users()}
+        contact_banned = get_banned_contact_user_ids()
+        with self._lock:
+            # Новые множества целиком: проверки в других потоках читают их без блокировки
+            self._banned = banned
+            self._contact_banned = contact_banned
+            self.loaded = True
+        logger.info(f"✅ Ban index loaded: {len(banned)} banned, {len(contact_banned)} banned from contacts")
+
+    def _ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+
+    def ban(self, user_id: int):
+        """Полный бан: сохраняет в StateManager и добавляет в индекс"""
+        self._ensure_loaded()
+        state_manager.add_banned_user(user_id)
+        with self._lock:
+            self._banned = self._banned | {int(user_id)}
+
+    def unban(self, user_id: int):
+        """Снятие полного бана: удаляет из StateManager и из индекса"""
+        self._ensure_loaded()
+        state_manager.remove_banned_user(user_id)
+        with self._lock:
+            self._banned = self._banned - {int(user_id)}
+
+    def on_contact_ban(self, user_tg_id, reason=None):
+        """Подписчик ban_user_by_contact"""
+        self._ensure_loaded()
+        with self._lock:
+            self._contact_banned = self._contact_banned | {int(user_tg_id)}
+
+    def on_contacts_cleared(self):
+        """Подписчик clear_contacts: флаги contacts.banned удалены вместе со строками"""
+        with self._lock:
+            self._contact_banned = set()
+
+    def is_banned(self, user_id) -> bool:
+        """Полностью ли заблокирован пользователь"""
+        self._ensure_loaded()
+        return int(user_id) in self._banned
+
+    def is_contact_banned(self, user_id) -> bool:
+        """Запрещено ли пользователю писать админу"""
+        self._ensure_loaded()
+        user_id = int(user_id)
+        return user_id in self._banned or user_id in self._contact_banned
+
+    def verify(self, repair: bool = True) -> dict:
+        """
+        Проверка инварианта: индекс совпадает с хранилищами.
+        Возвращает расхождения; при repair перезагружает индекс
+        """
+        expected_banned = {int(user_id) for user_id in state_manager.get_banned_users()}
+        expected_contact = get_banned_contact_user_ids()
+        with self._lock:
+            drift = {
+                "missing_banned": sorted(expected_banned - self._banned),
+                "extra_banned": sorted(self._banned - expected_banned),
+                "missing_contact_banned": sorted(expected_contact - self._contact_banned),
+                "extra_contact_banned": sorted(self._contact_banned - expected_contact)
+            }
+        if any(drift.values()):
+            logger.warning(f"⚠️ Ban index drift detected: {drift}")
+            if repair:
+                self.load()
+        return drift
+
+    def get_stats(self) -> dict:
+        """Размеры индекса"""
+        return {
+            "banned": len(self._banned),
+            "contact_banned": len(self._contact_banned)
+        }
+
+
+# Глобальный индекс блокировок
+ban_index = BanIndex()
+
+def init_ban_index():
+    """Загружает индекс и подписывает его на блокировки через обращения и их очистку"""
+    add_ban_listener(ban_index.on_contact_ban)
+    add_contacts_cleared_listener(ban_index.on_contacts_cleared)
+    ban_index.load()
+    return ban_index
@@ -1,6 +1,8 @@
 from utils.logger import setup_logger
 from functools import wraps
 
+# Логгер берется один раз: в пути обработки исключения нет настройки логгера и ввода-вывода
+logger = setup_logger('error_handler')
 
 def error_handler(send_user_message=True):
     """
@@ -13,7 +15,6 @@ def error_handler(send_user_message=True):
             try:
                 return func(*args, **kwargs)
             except Exception as e:
-                logger = setup_logger('error_handler')
                 # Пытаемся найти bot и message среди аргументов
                 bot = None
                 message = None
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Фильтрация и агрегация JSON-логов (LOG_MODE=json) без grep
+Использование:
+    python utils/log_query.py --since yesterday --until today --handler handle_my_lesson --stats latency_ms
+    python utils/log_query.py security.log --since 24h --count-by event_type
+    python utils/log_query.py --since "2026-10-17 10:00" --until "2026-10-17 11:00" --user-id 123 --text
+"""
+
+import argparse
+import contextlib
+import glob
+import json
+import math
+import os
+import re
+import sys
+from datetime import datetime, timedelta
+
+# Добавляем корневую директорию в путь
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Опциональный импорт config для случаев, когда dotenv/config.env недоступны.
+# Сообщения проверки настроек уходят в stderr, чтобы вывод можно было передать дальше (jq, sort)
+try:
+    with contextlib.redirect_stdout(sys.stderr):
+        from config import LOG_FILE
+except (ImportError, ValueError):
+    LOG_FILE = "bot.log"
+
+# Строки пишет один поток в порядке очереди, а время ставит поток-источник,
+# поэтому соседние записи могут идти не строго по ts — ищем с запасом
+SEEK_SLACK = 5.0
+
+PERCENTILES = (50, 95, 99)
+
+
+def parse_time(value: str, now: datetime = None) -> float:
+    """
+    Время для --since/--until в epoch: now, today, yesterday, 30m / 2h / 7d назад
+    (или --since=-2h), YYYY-MM-DD, YYYY-MM-DD HH:MM[:SS]
+    """
+    now = now or datetime.now()
+    value = value.strip()
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if value == "now":
+        return now.timestamp()
+    if value == "today":
+        return midnight.timestamp()
+    if value == "yesterday":
+        return (midnight - timedelta(days=1)).timestamp()
+    match = re.fullmatch(r"-?(\d+)([smhd])", value)
+    if match:
+        seconds = int(match.group(1)) * {"s": 1, "m": 60, "h": 3600, "d": 86400}[match.group(2)]
+        return now.timestamp() - seconds
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value, fmt).timestamp()
+        except ValueError:
+            continue
+    raise argparse.ArgumentTypeError(f"Неверное время: {value}")
+
+
+def _line_ts(line: bytes):
+    # JsonLineFormatter пишет ts первым полем: читаем его без разбора всей строки
+    if line.startswith(b'{"ts": '):
+        try:
+            return float(line[7:line.find(b",", 7)])
+        except ValueError:
+            pass
+    try:
+        return float(json.loads(line)["ts"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def _next_record(f, offset: int, size: int):
+    """ts и смещение первой JSON-строки, начинающейся не раньше offset; (None, size) — до конца файла"""
+    if offset > 0:
+        # Дочитываем строку, в которую попало смещение (если offset — начало строки, это только '\n')
+        f.seek(offset - 1)
+        f.readline()
+    else:
+        f.seek(0)
+    while True:
+        position = f.tell()
+        line = f.readline()
+        if not line:
+            return None, size
+        ts = _line_ts(line)
+        if ts is not None:
+            return ts, position
+
+
+def seek_time(f, start: float) -> int:
+    """
+    Бинарный поиск по байтовым смещениям: смещение первой строки с ts >= start.
+    O(log размера файла) чтений строк вместо чтения файла с начала
+    """
+    f.seek(0, os.SEEK_END)
+    size = f.tell()
+    low, high = 0, size
+    while low < high:
+        middle = (low + high) // 2
+        ts, _ = _next_record(f, middle, size)
+        if ts is None or ts >= start:
+            high = middle
+        else:
+            low = middle + 1
+    return _next_record(f, low, size)[1]
+
+
+def default_files(log_file: str = LOG_FILE) -> list:
+    """Архивы лога (<файл>.<дата_время>) и текущий файл по порядку записи"""
+    archives = [path for path in glob.glob(f"{glob.escape(log_file)}.*") if os.path.isfile(path)]
+    archives.sort(key=os.path.getmtime)
+    return archives + ([log_file] if os.path.exists(log_file) else [])
+
+
+def iter_records(paths, since: float = None, until: float = None, prefilter: tuple = ()):
+    """
+    Поток записей из файлов в диапазоне [since, until). Начало диапазона ищется
+    бинарным поиском, чтение файла прекращается после until (с запасом SEEK_SLACK).
+    prefilter — подстроки (bytes), без которых строку не нужно разбирать
+    """
+    for path in paths:
+        with open(path, "rb") as f:
+            f.seek(seek_time(f, since - SEEK_SLACK) if since is not None else 0)
+            for line in f:
+                if prefilter and not all(token in line for token in prefilter):
+                    # Конец диапазона проверяем и по отброшенным строкам
+                    if until is not None:
+                        ts = _line_ts(line)
+                        if ts is not None and ts >= until + SEEK_SLACK:
+                            break
+                    continue
+                try:
+                    record = json.loads(line)
+                    ts = float(record["ts"])
+                except (ValueError, KeyError, TypeError):
+                    continue
+                if until is not None and ts >= until:
+                    if ts >= until + SEEK_SLACK:
+                        break
+                    continue
+                if since is not None and ts < since:
+                    continue
+                yield record
+
+
+def percentile(values: list, p: float):
+    """Перцентиль по отсортированному списку (nearest rank)"""
+    if not values:
+        return None
+    return values[max(0, min(len(values) - 1, math.ceil(p / 100 * len(values)) - 1))]
+
+
+def summarize(values: list) -> dict:
+    values.sort()
+    if not values:
+        return {"count": 0}
+    summary = {"count": len(values), "min": values[0], "avg": round(sum(values) / len(values), 2)}
+    for p in PERCENTILES:
+        summary[f"p{p}"] = percentile(values, p)
+    summary["max"] = values[-1]
+    return summary
+
+
+def _matches(record: dict, args) -> bool:
+    if args.handler and record.get("handler") != args.handler:
+        return False
+    if args.event_type and record.get("event_type") != args.event_type:
+        return False
+    if args.user_id is not None and str(record.get("user_id")) != str(args.user_id):
+        return False
+    if args.logger and record.get("logger") != args.logger:
+        return False
+    if args.level and record.get("level") != args.level.upper():
+        return False
+    if args.contains and args.contains not in record.get("msg", ""):
+        return False
+    return True
+
+
+def _prefilter(args) -> tuple:
+    # json.dumps пишет "ключ": "значение" — строку без этих подстрок можно не разбирать
+    tokens = []
+    for field, value in (("handler", args.handler), ("event_type", args.event_type)):
+        if value:
+            tokens.append(json.dumps({field: value}, ensure_ascii=False)[1:-1].encode("utf-8"))
+    return tuple(tokens)
+
+
+def run(args, out=sys.stdout) -> int:
+    paths = args.files or default_files()
+    if not paths:
+        print(f"❌ Нет файлов логов ({LOG_FILE})", file=sys.stderr)
+        return 1
+    records = (record for record in iter_records(paths, args.since, args.until, _prefilter(args))
+               if _matches(record, args))
+
+    if args.stats:
+        groups = {}
+        for record in records:
+            value = record.get(args.stats)
+            if isinstance(value, (int, float)):
+                key = record.get(args.count_by) if args.count_by else None
+                groups.setdefault(key, []).append(value)
+        if args.count_by:
+            rows = sorted(groups.items(), key=lambda item: len(item[1]), reverse=True)
+            for key, values in rows[:args.limit or None]:
+                print(f"{key}\t{json.dumps(summarize(values), ensure_ascii=False)}", file=out)
+        else:
+            print(json.dumps(summarize(groups.get(None, [])), ensure_ascii=False), file=out)
+        return 0
+
+    if args.count_by:
+        counts = {}
+        for record in records:
+            key = record.get(args.count_by)
+            counts[key] = counts.get(key, 0) + 1
+        for key, count in sorted(counts.items(), key=lambda item: item[1], reverse=True)[:args.limit or None]:
+            print(f"{count}\t{key}", file=out)
+        return 0
+
+    shown = 0
+    for record in records:
+        if args.text:
+            print(f"{record.get('time')} - {record.get('logger')} - {record.get('level')} - {record.get('msg')}", file=out)
+        else:
+            print(json.dumps(record, ensure_ascii=False), file=out)
+        shown += 1
+        if args.limit and shown >= args.limit:
+            break
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Запросы к JSON-логам бота (LOG_MODE=json)")
+    parser.add_argument("files", nargs="*", help=f"Файлы логов (по умолчанию {LOG_FILE} и его архивы)")
+    parser.add_argument("--since", type=parse_time, help="Начало: now, today, yesterday, 2h (назад), YYYY-MM-DD[ HH:MM[:SS]]")
+    parser.add_argument("--until", type=parse_time, help="Конец (не включая), в том же формате")
+    parser.add_argument("--handler", help="Имя хендлера, например handle_my_lesson")
+    parser.add_argument("--event-type", help="Тип события, например RATE_LIMIT_EXCEEDED")
+    parser.add_argument("--user-id", help="Telegram ID пользователя")
+    parser.add_argument("--logger", help="Имя логгера (bot, router, security, ...)")
+    parser.add_argument("--level", help="Уровень (INFO, WARNING, ERROR, ...)")
+    parser.add_argument("--contains", help="Подстрока в тексте сообщения")
+    parser.add_argument("--count-by", help="Посчитать записи по полю (handler, event_type, user_id, ...)")
+    parser.add_argument("--stats", help="Статистика числового поля: count, avg, p50, p95, p99, max (например latency_ms)")
+    parser.add_argument("--limit", type=int, default=0, help="Не больше N строк вывода")
+    parser.add_argument("--text", action="store_true", help="Выводить записи текстом, а не JSON")
+    return parser
+
+
+def main():
+    """Главная функция"""
+    args = build_parser().parse_args()
+    try:
+        sys.exit(run(args))
+    except BrokenPipeError:
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,93 +1,297 @@
+import atexit
+import copy
+import json
 import logging
 import os
+import queue
+import threading
 from datetime import datetime
+import time
+from logging.handlers import BaseRotatingHandler, QueueHandler, QueueListener
 
 # Опциональный импорт config для случаев, когда dotenv недоступен
 try:
-    from config import LOG_LEVEL, LOG_FILE
-except ImportError:
+    from config import LOG_LEVEL, LOG_FILE, LOG_QUEUE_SIZE, LOG_MAX_BYTES, LOG_ROTATE_INTERVAL, LOG_MODE
+except (ImportError, ValueError):
     LOG_LEVEL = "INFO"
     LOG_FILE = "bot.log"
+    LOG_QUEUE_SIZE = 10000
+    LOG_MAX_BYTES = 1024 * 1024
+    LOG_ROTATE_INTERVAL = 0
+    LOG_MODE = "text"
 
-def rotate_log_file(log_file_path, max_size_mb=1):
-    """Ротация лог-файла при достижении максимального размера"""
-    try:
-        if not os.path.exists(log_file_path):
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Поля структурированных записей: logger.info(..., extra={"user_id": ..., "latency_ms": ...})
+STRUCTURED_FIELDS = ("user_id", "handler", "latency_ms", "event_type")
+
+class JsonLineFormatter(logging.Formatter):
+    """
+    Запись лога одной JSON-строкой (LOG_MODE=json): ts — epoch-секунды, по нему
+    utils/log_query.py ищет диапазон времени; поля STRUCTURED_FIELDS — из extra
+    """
+    
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "time": self.formatTime(record, '%Y-%m-%d %H:%M:%S'),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        for field in STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RotatingLogFileHandler(BaseRotatingHandler):
+    """
+    Файл лога с ротацией во время работы: по размеру (max_bytes) и/или по времени
+    (interval секунд, 0 — только по размеру). Архив получает имя <файл>.<дата_время>,
+    старые архивы удаляет auto_cleanup. Пишет в файл только поток LogListener
+    """
+    
+    def __init__(self, filename, max_bytes: int = LOG_MAX_BYTES, interval: int = LOG_ROTATE_INTERVAL):
+        super().__init__(filename, 'a', encoding='utf-8', delay=True)
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.rollover_at = time.time() + interval if interval > 0 else None
+        self.rotations = 0
+    
+    def shouldRollover(self, record):
+        if self.rollover_at is not None and record.created >= self.rollover_at:
+            return True
+        if self.max_bytes > 0:
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.seek(0, 2)
+            return self.stream.tell() >= self.max_bytes
+        return False
+    
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        if self.interval > 0:
+            self.rollover_at = time.time() + self.interval
+        if not os.path.exists(self.baseFilename) or os.path.getsize(self.baseFilename) == 0:
             return
-        
-        # Проверяем размер файла в МБ
-        file_size_mb = os.path.getsize(log_file_path) / (1024 * 1024)
-        
-        if file_size_mb >= max_size_mb:
-            # Создаем имя для архива с датой
-            timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
-            archive_name = f"{log_file_path}.{timestamp}"
-            
-            # Переименовываем текущий файл
-            os.rename(log_file_path, archive_name)
-            
-            # Создаем новый пустой файл
-            with open(log_file_path, 'w', encoding='utf-8') as f:
-                pass
-            
-            print(f"📁 Лог-файл ротирован: {log_file_path} → {archive_name} ({file_size_mb:.2f} МБ)")
-            
-    except Exception as e:
-        print(f"❌ Ошибка ротации лог-файла: {e}")
-
-def setup_logger(name='bot'):
-    """Настройка логгера для бота"""
-    
-    # Ротируем лог-файл если он слишком большой
-    rotate_log_file(LOG_FILE, max_size_mb=1)
+        archive_name = f"{self.baseFilename}.{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}"
+        if os.path.exists(archive_name):
+            archive_name += f".{self.rotations}"
+        os.rename(self.baseFilename, archive_name)
+        self.rotations += 1
+        print(f"📁 Лог-файл ротирован: {self.baseFilename} → {archive_name}")
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Кладет записи в ограниченную очередь без ожидания: при полной очереди запись
+    отбрасывается и учитывается в счетчике dropped. После остановки слушателя
+    записи пишутся в обработчики напрямую, чтобы не терять логи завершения
+    """
+    
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self._lock = threading.Lock()
+        self.enqueued = 0
+        self.dropped = 0
+        self.direct_handlers = None
+    
+    def prepare(self, record):
+        # Сообщение собирается сразу (аргументы могут измениться), а трассировку
+        # исключения форматирует поток слушателя: чтение исходников для traceback —
+        # тоже ввод-вывод
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+    
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return
+        with self._lock:
+            self.enqueued += 1
+    
+    def emit(self, record):
+        handlers = self.direct_handlers
+        if handlers is None:
+            super().emit(record)
+            return
+        for handler in handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
+class LogListener(QueueListener):
+    """Единственный поток, который пишет записи из очереди в файл и консоль"""
+    
+    def __init__(self, log_queue, queue_handler, *handlers):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.queue_handler = queue_handler
+        self._reported_drops = 0
+    
+    def handle(self, record):
+        dropped = self.queue_handler.dropped
+        if dropped != self._reported_drops:
+            # Сообщаем о потерянных записях из потока слушателя, не через очередь
+            super().handle(logging.makeLogRecord({
+                "name": "logger", "levelno": logging.WARNING, "levelname": "WARNING",
+                "msg": f"⚠️ Log queue full, dropped {dropped - self._reported_drops} records (total {dropped})"
+            }))
+            self._reported_drops = dropped
+        super().handle(record)
     
+    def enqueue_sentinel(self):
+        # Стандартный put_nowait теряет сигнал остановки при полной очереди
+        self.queue.put(self._sentinel, timeout=5)
+    
+    def stop(self, timeout: float = 10.0):
+        """Дописывает очередь и останавливает поток; зависший вывод не задерживает выход дольше timeout"""
+        if self._thread:
+            self.enqueue_sentinel()
+            self._thread.join(timeout)
+            self._thread = None
+
+
+# Общая очередь, обработчики и поток записи логов (создаются при первом setup_logger)
+_log_queue = None
+_queue_handler = None
+_log_listener = None
+_log_setup_lock = threading.Lock()
+
+# Реестр логгеров процесса: имя -> логгер, настроенный при первом setup_logger
+_loggers = {}
+_dedicated_names = set()   # логгеры со своим файлом (security) не пишут в LOG_FILE
+_registry_lock = threading.Lock()
+
+def _create_log_handlers(log_file, fmt, console_level, record_filter):
+    """Обработчики файла и консоли, в которые пишет слушатель"""
     # Создаем директорию для логов если её нет
-    log_dir = os.path.dirname(LOG_FILE)
+    log_dir = os.path.dirname(log_file)
     if log_dir and not os.path.exists(log_dir):
         os.makedirs(log_dir)
     
-    # Настраиваем логгер
-    logger = logging.getLogger(name)
-    logger.setLevel(getattr(logging, LOG_LEVEL.upper()))
-    
-    # Очищаем существующие обработчики
-    logger.handlers.clear()
-    
     # Создаем форматтер
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
+    formatter = logging.Formatter(fmt, datefmt='%Y-%m-%d %H:%M:%S')
     
-    # Обработчик для файла
-    file_handler = logging.FileHandler(LOG_FILE, encoding='utf-8')
+    # Обработчик для файла (файл открывается при первой записи); в консоль — всегда текст
+    file_handler = RotatingLogFileHandler(log_file)
     file_handler.setLevel(logging.DEBUG)
-    file_handler.setFormatter(formatter)
+    file_handler.setFormatter(JsonLineFormatter() if LOG_MODE == "json" else formatter)
+    file_handler.addFilter(record_filter)
     
     # Обработчик для консоли
     console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
+    console_handler.setLevel(console_level)
     console_handler.setFormatter(formatter)
+    console_handler.addFilter(record_filter)
     
-    # Добавляем обработчики
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
-    
-    return logger
+    return file_handler, console_handler
+
+def _get_queue_handler():
+    global _log_queue, _queue_handler, _log_listener
+    with _log_setup_lock:
+        if _queue_handler is None:
+            _log_queue = queue.Queue(maxsize=max(1, LOG_QUEUE_SIZE))
+            _queue_handler = DroppingQueueHandler(_log_queue)
+            handlers = _create_log_handlers(LOG_FILE, LOG_FORMAT, logging.INFO,
+                                            lambda record: record.name not in _dedicated_names)
+            _log_listener = LogListener(_log_queue, _queue_handler, *handlers)
+            _log_listener.start()
+            atexit.register(stop_logging)
+        return _queue_handler
+
+def setup_logger(name='bot', log_file=None, fmt=LOG_FORMAT, console_level=logging.INFO, level=None):
+    """
+    Логгер из реестра процесса: настраивается при первом вызове с этим именем,
+    дальше возвращается тот же объект без ввода-вывода. Логгер только кладет записи
+    в общую очередь, файлы и консоль пишет один фоновый поток (LogListener).
+    log_file — отдельный файл для этого логгера (с тем же механизмом ротации)
+    """
+    logger = _loggers.get(name)
+    if logger is not None:
+        return logger
+    queue_handler = _get_queue_handler()
+    with _registry_lock:
+        logger = _loggers.get(name)
+        if logger is not None:
+            return logger
+        
+        if log_file:
+            _dedicated_names.add(name)
+            handlers = _create_log_handlers(log_file, fmt, console_level,
+                                            lambda record: record.name == name)
+            with _log_setup_lock:
+                if _log_listener is not None:
+                    # Кортеж заменяется целиком: поток слушателя читает его без блокировки
+                    _log_listener.handlers = _log_listener.handlers + handlers
+                else:
+                    queue_handler.direct_handlers = queue_handler.direct_handlers + handlers
+        
+        # Настраиваем логгер
+        logger = logging.getLogger(name)
+        logger.setLevel(level if level is not None else getattr(logging, LOG_LEVEL.upper()))
+        logger.handlers.clear()
+        logger.addHandler(queue_handler)
+        _loggers[name] = logger
+        return logger
+
+def stop_logging():
+    """
+    Останавливает поток записи логов, дописав все записи из очереди.
+    Последующие записи пишутся в файл и консоль напрямую
+    """
+    global _log_listener
+    with _log_setup_lock:
+        listener, _log_listener = _log_listener, None
+        if listener is None:
+            return
+        # Новые записи сразу идут в обработчики, слушатель дописывает то, что уже в очереди
+        _queue_handler.direct_handlers = listener.handlers
+    try:
+        listener.stop()
+    except queue.Full:
+        print("⚠️ Очередь логов переполнена при остановке, часть записей потеряна")
+    for handler in listener.handlers:
+        handler.flush()
+
+def get_logging_stats() -> dict:
+    """Счетчики очереди логов и ротаций файлов"""
+    if _queue_handler is None:
+        return {}
+    handlers = _log_listener.handlers if _log_listener else (_queue_handler.direct_handlers or ())
+    return {
+        "enqueued": _queue_handler.enqueued,
+        "dropped": _queue_handler.dropped,
+        "queued": _log_queue.qsize(),
+        "loggers": len(_loggers),
+        "rotations": sum(getattr(handler, "rotations", 0) for handler in handlers)
+    }
 
 def log_user_action(logger, user_id, action, details=None):
     """Логирование действий пользователя"""
     message = f"USER {user_id}: {action}"
     if details:
         message += f" - {details}"
-    logger.info(message)
+    logger.info(message, extra={"user_id": user_id, "event_type": action})
 
 def log_admin_action(logger, admin_id, action, details=None):
     """Логирование действий администратора"""
     message = f"ADMIN {admin_id}: {action}"
     if details:
         message += f" - {details}"
-    logger.info(message)
+    logger.info(message, extra={"user_id": admin_id, "event_type": action})
 
 def log_error(logger, error, context=None):
     """Логирование ошибок"""
@@ -107,7 +311,7 @@ def log_bot_startup(logger):
     """Логирование запуска бота"""
     logger.info("🤖 Bot started successfully")
     logger.info(f"📝 Log level: {LOG_LEVEL}")
-    logger.info(f"📁 Log file: {LOG_FILE}")
+    logger.info(f"📁 Log file: {LOG_FILE} ({LOG_MODE})")
 
 def log_bot_shutdown(logger):
     """Логирование остановки бота"""
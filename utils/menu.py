@@ -1,61 +1,175 @@
 # === utils/menu.py ===
+import threading
+from collections import OrderedDict
 from telebot import types
 from config import ADMIN_ID
+from data.db import get_course_catalog
+
+# Клавиатура выбора курса, собранная для версии каталога: (version, markup)
+_courses_keyboard = (None, None)
+
+# Реестр общих клавиатур: содержимое -> собранная клавиатура
+MARKUP_REGISTRY_SIZE = 256
+_markup_registry = OrderedDict()
+_registry_lock = threading.Lock()
+_registry_stats = {"hits": 0, "misses": 0, "evicted": 0}
+
+
+class _PrebuiltMarkupMixin:
+    """
+    Клавиатура, сериализуемая один раз. telebot вызывает to_json() при каждой
+    отправке, поэтому JSON сохраняется в freeze(), а дальнейшие изменения запрещены
+    """
+
+    _json = None
+
+    def freeze(self):
+        self._json = super().to_json()
+        return self
+
+    def to_json(self):
+        if self._json is None:
+            return super().to_json()
+        return self._json
+
+    def add(self, *args, **kwargs):
+        if self._json is not None:
+            raise TypeError("Общая клавиатура не изменяется: соберите новую")
+        return super().add(*args, **kwargs)
+
+
+class PrebuiltReplyKeyboardMarkup(_PrebuiltMarkupMixin, types.ReplyKeyboardMarkup):
+    pass
+
+
+class PrebuiltInlineKeyboardMarkup(_PrebuiltMarkupMixin, types.InlineKeyboardMarkup):
+    pass
+
+
+def _get_or_build(key, build):
+    """Возвращает клавиатуру из реестра или собирает ее (LRU, MARKUP_REGISTRY_SIZE записей)"""
+    with _registry_lock:
+        markup = _markup_registry.get(key)
+        if markup is not None:
+            _markup_registry.move_to_end(key)
+            _registry_stats["hits"] += 1
+            return markup
+    markup = build().freeze()
+    with _registry_lock:
+        # Параллельная сборка той же клавиатуры: оставляем первую
+        markup = _markup_registry.setdefault(key, markup)
+        _registry_stats["misses"] += 1
+        while len(_markup_registry) > MARKUP_REGISTRY_SIZE:
+            _markup_registry.popitem(last=False)
+            _registry_stats["evicted"] += 1
+    return markup
+
+
+def reply_keyboard(rows, resize_keyboard=True, one_time_keyboard=None):
+    """
+    Общая reply-клавиатура по содержимому: rows — ряды текстов кнопок.
+    Одинаковые клавиатуры собираются и сериализуются один раз; не изменять
+    """
+    rows = tuple(tuple(row) for row in rows)
+    key = ("reply", rows, resize_keyboard, one_time_keyboard)
+
+    def build():
+        markup = PrebuiltReplyKeyboardMarkup(resize_keyboard=resize_keyboard, one_time_keyboard=one_time_keyboard)
+        for row in rows:
+            markup.row(*row)
+        return markup
+
+    return _get_or_build(key, build)
+
+
+def inline_keyboard(rows):
+    """Общая inline-клавиатура по содержимому: rows — ряды пар (текст, callback_data); не изменять"""
+    rows = tuple(tuple(tuple(button) for button in row) for row in rows)
+    key = ("inline", rows)
+
+    def build():
+        markup = PrebuiltInlineKeyboardMarkup()
+        for row in rows:
+            markup.row(*(types.InlineKeyboardButton(text, callback_data=data) for text, data in row))
+        return markup
+
+    return _get_or_build(key, build)
+
+
+def get_markup_registry_stats() -> dict:
+    """Счетчики реестра клавиатур"""
+    with _registry_lock:
+        stats = dict(_registry_stats)
+        stats["size"] = len(_markup_registry)
+    return stats
+
+
+# Статические меню собираются при импорте и отдаются всем одним экземпляром
+_MAIN_MENU = reply_keyboard((
+    ("📅 Мое занятие", "📋 Записаться"),
+    ("ℹ️ О преподавателе", "💰 Цены и форматы"),
+    ("📚 Доступные курсы", "⭐ Отзывы"),
+    ("🆘 Обратиться к админу",),
+))
+
+_ADMIN_MENU = reply_keyboard((
+    ("📋 Список заявок", "📚 Редактировать курсы"),
+    ("📝 Управление уроками",),
+    ("📨 Обращения пользователей", "📊 Статистика отзывов"),
+    ("⬇️ Выгрузить данные",),
+))
+
+_LESSON_MANAGEMENT_MENU = reply_keyboard((
+    ("📅 Посмотреть запланированные уроки",),
+    ("✅ Завершить заявку", "❌ Отменить заявку"),
+    ("🚫 Отменить урок", "🕓 Перенести урок"),
+    ("🔙 Назад в админ-меню",),
+))
+
+_CANCEL_BUTTON = reply_keyboard((("🔙 Отмена",),), one_time_keyboard=True)
+
+_COURSE_EDITOR_MENU = reply_keyboard((
+    ("➕ Добавить курс", "🗑 Удалить курс"),
+    ("❄ Заморозить курс", "📝 Отредактировать курс"),
+    ("👁 Просмотреть все курсы",),
+    ("🔙 Назад",),
+))
+
+_ADMIN_ID_STR = str(ADMIN_ID)
 
 def get_main_menu(user_id=None):
     """Меню для пользователя"""
-    markup = types.ReplyKeyboardMarkup(resize_keyboard=True)
-    markup.add("📅 Мое занятие", "📋 Записаться")
-    markup.add("ℹ️ О преподавателе", "💰 Цены и форматы")
-    markup.add("📚 Доступные курсы", "⭐ Отзывы")
-    markup.add("🆘 Обратиться к админу")
-    return markup
+    return _MAIN_MENU
 
 def get_admin_menu(): 
     """Меню для администратора"""
-    markup = types.ReplyKeyboardMarkup(resize_keyboard=True)
-    markup.row("📋 Список заявок", "📚 Редактировать курсы")
-    markup.row("📝 Управление уроками")
-    markup.add("📨 Обращения пользователей", "📊 Статистика отзывов")
-    markup.add("⬇️ Выгрузить данные")
-    return markup
+    return _ADMIN_MENU
 
 def get_appropriate_menu(user_id):
     """Возвращает подходящее меню в зависимости от роли пользователя"""
-    if str(user_id) == str(ADMIN_ID):
-        return get_admin_menu()
+    if str(user_id) == _ADMIN_ID_STR:
+        return _ADMIN_MENU
     else:
-        return get_main_menu()
+        return _MAIN_MENU
 
 def is_admin(user_id):
     """Проверяет, является ли пользователь администратором"""
-    return str(user_id) == str(ADMIN_ID)
+    return str(user_id) == _ADMIN_ID_STR
 
 def get_lesson_management_menu():
     """Меню управления уроками (на месте клавиатуры)"""
-    markup = types.ReplyKeyboardMarkup(resize_keyboard=True)
-    markup.row("📅 Посмотреть запланированные уроки")
-    markup.row("✅ Завершить заявку", "❌ Отменить заявку")
-    markup.row("🚫 Отменить урок", "🕓 Перенести урок")
-    markup.add("🔙 Назад в админ-меню")
-    return markup
+    return _LESSON_MANAGEMENT_MENU
 
 def create_confirm_menu(action_type):
     """Меню подтверждения для опасных операций"""
-    markup = types.InlineKeyboardMarkup(row_width=2)
-    
-    markup.add(
-        types.InlineKeyboardButton("✅ Да, подтверждаю", callback_data=f"confirm_{action_type}"),
-        types.InlineKeyboardButton("❌ Отмена", callback_data="cancel_action")
-    )
-    
-    return markup
+    return inline_keyboard(((
+        ("✅ Да, подтверждаю", f"confirm_{action_type}"),
+        ("❌ Отмена", "cancel_action")
+    ),))
 
 def get_cancel_button():
-    """Создает кнопку отмены"""
-    markup = types.ReplyKeyboardMarkup(resize_keyboard=True, one_time_keyboard=True)
-    markup.add("🔙 Отмена")
-    return markup
+    """Кнопка отмены"""
+    return _CANCEL_BUTTON
 
 def handle_cancel_action(bot, message, action_type="регистрация", logger=None):
     """Обрабатывает отмену действия"""
@@ -69,10 +183,11 @@ def handle_cancel_action(bot, message, action_type="регистрация", log
     # Определяем куда возвращаться
     if action_type == "курс":
         # Для админских действий с курсами - возврат в меню редактора курсов
-        markup = types.ReplyKeyboardMarkup(resize_keyboard=True)
-        markup.add("➕ Добавить курс", "🗑 Удалить курс")
-        markup.add("❄ Заморозить курс", "📝 Отредактировать курс")
-        markup.add("🔙 Назад")
+        markup = reply_keyboard((
+            ("➕ Добавить курс", "🗑 Удалить курс"),
+            ("❄ Заморозить курс", "📝 Отредактировать курс"),
+            ("🔙 Назад",),
+        ))
         bot.send_message(chat_id, "❌ Добавление курса отменено", reply_markup=markup)
     elif action_type == "урок":
         # Для назначения уроков - возврат в админ-меню
@@ -89,9 +204,45 @@ def handle_cancel_action(bot, message, action_type="регистрация", log
         logger.info(f"User {user_id} cancelled {action_type}")
 
 def get_course_editor_menu():
-    markup = types.ReplyKeyboardMarkup(resize_keyboard=True)
-    markup.add("➕ Добавить курс", "🗑 Удалить курс")
-    markup.add("❄ Заморозить курс", "📝 Отредактировать курс")
-    markup.add("👁 Просмотреть все курсы")
-    markup.add("🔙 Назад")
+    return _COURSE_EDITOR_MENU
+
+def get_courses_keyboard():
+    """Клавиатура выбора активного курса с кнопкой отмены (пересобирается только после изменения курсов).
+    Общий экземпляр: не изменять, добавлять кнопки в копию"""
+    global _courses_keyboard
+    catalog = get_course_catalog()
+    version, markup = _courses_keyboard
+    if version != catalog.version or markup is None:
+        rows = [(course[1],) for course in catalog.active]
+        rows.append(("🔙 Отмена",))
+        markup = reply_keyboard(rows, one_time_keyboard=True)
+        _courses_keyboard = (catalog.version, markup)
+    return markup
+
+def create_page_keyboard(view, page, item_buttons=()):
+    """Inline-клавиатура страницы списка: кнопки строк (по одной в ряд) и навигация ◀ ▶"""
+    markup = types.InlineKeyboardMarkup()
+    for button in item_buttons:
+        markup.row(button)
+    nav = []
+    # Ключ с NULL (строка без даты) не годится для условия (created_at, id) < (?, ?): кнопку не показываем
+    if page.has_prev and None not in page.first:
+        nav.append(types.InlineKeyboardButton("◀", callback_data=f"page:{view}:prev:{_encode_page_key(page.first)}"))
+    if page.has_next and None not in page.last:
+        nav.append(types.InlineKeyboardButton("▶", callback_data=f"page:{view}:next:{_encode_page_key(page.last)}"))
+    if nav:
+        markup.row(*nav)
     return markup
+
+def _encode_page_key(key):
+    # Ключ страницы (created_at, id) в callback_data: "2025-06-22 17:30:00|42" укладывается в 64 байта
+    return "|".join(str(value) for value in key)
+
+def parse_page_callback(data):
+    """Разбирает callback_data кнопок ◀ ▶: возвращает аргументы after/before для *_page()"""
+    _, _, direction, key = data.split(":", 3)
+    timestamp, row_id = key.rsplit("|", 1)
+    key = (timestamp, int(row_id))
+    if direction == "prev":
+        return {"before": key}
+    return {"after": key}
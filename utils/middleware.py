@@ -1,6 +1,7 @@
 from telebot import TeleBot
 from telebot.types import Message, CallbackQuery
 from utils.security import check_user_security, security_manager
+from utils.rate_limiter import GCRARateLimiter
 from utils.logger import log_error, log_user_action
 from typing import Callable, Any
 import functools
@@ -121,6 +122,9 @@ def rate_limit_middleware(bot: TeleBot, logger, custom_limit: int = None):
     """Middleware для rate limiting с кастомным лимитом"""
     
     def decorator(func: Callable) -> Callable:
+        # Отдельный счетчик на функцию с собственным лимитом
+        limiter = GCRARateLimiter(custom_limit, 60) if custom_limit else None
+        
         @functools.wraps(func)
         def wrapper(message_or_call: Message | CallbackQuery, *args, **kwargs):
             try:
@@ -135,10 +139,9 @@ def rate_limit_middleware(bot: TeleBot, logger, custom_limit: int = None):
                     return func(message_or_call, *args, **kwargs)
                 
                 # Проверяем rate limit
-                if custom_limit:
-                    # Временно изменяем лимит для этой функции
-                    original_limit = security_manager.rate_limit_data.get(user_id, [])
-                    if len(original_limit) >= custom_limit:
+                if limiter:
+                    allowed, _ = limiter.check(user_id)
+                    if not allowed:
                         error_msg = f"Слишком много запросов. Лимит: {custom_limit} в минуту"
                         if isinstance(message_or_call, Message):
                             bot.send_message(chat_id, f"🚫 {error_msg}")
@@ -0,0 +1,68 @@
+"""
+Ограничение частоты запросов пользователей (GCRA)
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+class GCRARateLimiter:
+    """
+    Generic Cell Rate Algorithm: limit запросов за period секунд с допуском
+    всплеска до limit. На пользователя хранится одно число — теоретическое
+    время прибытия следующего запроса (TAT), проверка стоит O(1).
+    Записи упорядочены по последнему обращению; устаревшие (TAT в прошлом —
+    пользователь неотличим от нового) удаляются понемногу при каждой проверке.
+    """
+
+    # Сколько устаревших записей удаляется за одну проверку
+    EVICT_PER_CHECK = 2
+
+    def __init__(self, limit: int, period: float = 60.0):
+        self.limit = max(1, limit)
+        self.period = period
+        self._interval = period / self.limit          # Интервал между запросами при равномерном потоке
+        self._tolerance = period - self._interval     # Допуск всплеска: limit запросов подряд
+        self._lock = threading.Lock()
+        self._tat = OrderedDict()                     # user_id -> TAT
+        self._stats = {"allowed": 0, "limited": 0, "evicted": 0}
+
+    def check(self, user_id, now: float = None) -> tuple[bool, int]:
+        """Учитывает запрос. Возвращает (разрешен, через сколько секунд можно повторить)"""
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            tat = max(self._tat.get(user_id, now), now)
+            wait = tat - self._tolerance - now
+            if wait > 0:
+                self._stats["limited"] += 1
+                return False, math.ceil(wait)
+            self._tat[user_id] = tat + self._interval
+            self._tat.move_to_end(user_id)
+            self._stats["allowed"] += 1
+            self._evict(now)
+            return True, 0
+
+    def reset(self, user_id):
+        """Сбрасывает счетчик пользователя"""
+        with self._lock:
+            self._tat.pop(user_id, None)
+
+    def _evict(self, now: float):
+        # Первой идет запись с самым давним обращением. Ее TAT не дальше period
+        # от того обращения, так что все записи старше period удаляются со временем.
+        for _ in range(self.EVICT_PER_CHECK):
+            user_id, tat = next(iter(self._tat.items()))
+            if tat > now:
+                break
+            del self._tat[user_id]
+            self._stats["evicted"] += 1
+
+    def get_stats(self) -> dict:
+        """Счетчики ограничителя"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["tracked_users"] = len(self._tat)
+        return stats
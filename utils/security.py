@@ -1,5 +1,4 @@
 import re
-import time
 from typing import Dict, Set, Optional, Any
 from config import MAX_MESSAGE_LENGTH, MAX_NAME_LENGTH, RATE_LIMIT_PER_MINUTE, BAN_THRESHOLD
 from utils.logger import log_error
@@ -9,6 +8,8 @@ from utils.exceptions import (
     ValidationException, handle_exception
 )
 from state.state_manager import state_manager
+from utils.rate_limiter import GCRARateLimiter
+from utils.ban_index import ban_index
 
 class SecurityManager:
     """Менеджер безопасности для валидации и rate limiting"""
@@ -16,6 +17,8 @@ class SecurityManager:
     def __init__(self):
         # Используем StateManager вместо локальных переменных
         self.logger = security_logger
+        # Счетчики rate limit живут только в памяти: окно — минута, персистентность не нужна
+        self.rate_limiter = GCRARateLimiter(RATE_LIMIT_PER_MINUTE, 60)
     
     def validate_message_length(self, text: str, max_length: int = MAX_MESSAGE_LENGTH) -> bool:
         """Валидация длины сообщения"""
@@ -88,24 +91,10 @@ class SecurityManager:
     
     def check_rate_limit(self, user_id: int) -> tuple[bool, int]:
         """Проверка rate limit для пользователя"""
-        current_time = time.time()
-        
-        # Получаем данные из StateManager
-        rate_limit_data = state_manager.get_rate_limit_data(user_id)
-        
-        # Удаляем старые записи (старше 1 минуты)
-        rate_limit_data = [
-            timestamp for timestamp in rate_limit_data
-            if current_time - timestamp < 60
-        ]
-        
-        # Сохраняем очищенные данные обратно в StateManager
-        state_manager.set_rate_limit_data(user_id, rate_limit_data)
+        allowed, remaining_time = self.rate_limiter.check(user_id)
         
         # Проверяем лимит
-        if len(rate_limit_data) >= RATE_LIMIT_PER_MINUTE:
-            remaining_time = int(60 - (current_time - rate_limit_data[0]))
-            
+        if not allowed:
             # Логируем превышение rate limit
             security_logger.log_rate_limit_exceeded(
                 user_id, 
@@ -116,24 +105,26 @@ class SecurityManager:
             
             return False, remaining_time
         
-        # Добавляем текущий запрос
-        rate_limit_data.append(current_time)
-        state_manager.set_rate_limit_data(user_id, rate_limit_data)
         return True, 0
     
     def is_user_banned(self, user_id: int) -> bool:
         """Проверка, забанен ли пользователь"""
-        return state_manager.is_user_banned(user_id)
+        return ban_index.is_banned(user_id)
     
     def ban_user(self, user_id: int, reason: str = "Нарушение правил"):
         """Бан пользователя"""
-        state_manager.add_banned_user(user_id)
+        ban_index.ban(user_id)
         
         # Логируем бан
         security_logger.log_user_banned(user_id, "unknown", reason, "system")
         
         print(f"🚫 Пользователь {user_id} заблокирован. Причина: {reason}")
     
+    def unban_user(self, user_id: int):
+        """Снятие бана пользователя"""
+        ban_index.unban(user_id)
+        print(f"✅ Пользователь {user_id} разблокирован")
+    
     def record_suspicious_activity(self, user_id: int, activity_type: str):
         """Запись подозрительной активности"""
         current_count = state_manager.get_suspicious_count(user_id)
@@ -298,6 +289,10 @@ def check_user_security(user_id: int, action_type: str = "message") -> tuple[boo
         if security_manager.is_user_banned(user_id):
             raise UserBannedException(user_id)
         
+        # Бан через обращения запрещает только писать админу
+        if action_type == "contact_admin" and ban_index.is_contact_banned(user_id):
+            raise UserBannedException(user_id, "contact_admin")
+        
         # Проверка rate limit
         allowed, remaining_time = security_manager.check_rate_limit(user_id)
         if not allowed:
@@ -321,28 +316,16 @@ def log_security_event(user_id: int, username: str, event_type: str, details: Di
         log_error(security_logger, e, f"Security event logging error for user {user_id}")
 
 def clear_old_rate_limit_data():
-    """Очищает старые rate limit данные для всех пользователей"""
+    """Удаляет rate limit данные, сохраненные прежними версиями в StateManager"""
     try:
-        import time
-        current_time = time.time()
-        
-        # Получаем всех пользователей с rate limit данными
-        all_users = list(state_manager._state["rate_limit_data"].keys())
+        # Rate limit теперь хранится в памяти GCRARateLimiter, старые списки меток не нужны.
+        # После первого запуска пространство имен пустое и проход ничего не стоит
+        all_users = state_manager.get_rate_limit_user_ids()
         
-        for user_id_str in all_users:
-            user_id = int(user_id_str)
-            rate_limit_data = state_manager.get_rate_limit_data(user_id)
-            
-            # Удаляем старые записи (старше 1 минуты)
-            cleaned_data = [
-                timestamp for timestamp in rate_limit_data
-                if current_time - timestamp < 60
-            ]
-            
-            # Сохраняем очищенные данные
-            state_manager.set_rate_limit_data(user_id, cleaned_data)
+        for user_id in all_users:
+            state_manager.clear_rate_limit_data(user_id)
         
-        print("✅ Старые rate limit данные очищены")
+        print(f"✅ Старые rate limit данные очищены ({len(all_users)})")
         
     except Exception as e:
         print(f"❌ Ошибка при очистке rate limit данных: {e}") 
\ No newline at end of file
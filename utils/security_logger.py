@@ -1,112 +1,266 @@
 import logging
-import os
+import threading
+import time
 from datetime import datetime
 from typing import Optional, Dict, Any
 import openpyxl
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font
-import re
 from config import ADMIN_ID
+from utils.logger import setup_logger
+from data.db import (
+    add_security_events, count_security_events, count_security_events_by_minute,
+    iter_security_events, delete_security_events_before
+)
 
-def rotate_security_log(log_file_path, max_size_mb=1):
-    """Ротация security лог-файла при достижении максимального размера"""
-    try:
-        if not os.path.exists(log_file_path):
+# Опциональный импорт config для случаев, когда dotenv/config.env недоступны
+try:
+    from config import SECURITY_EVENT_FLUSH_INTERVAL, SECURITY_EVENT_BUFFER_LIMIT, SECURITY_EVENT_RETENTION_DAYS
+except (ImportError, ValueError):
+    SECURITY_EVENT_FLUSH_INTERVAL = 1.0
+    SECURITY_EVENT_BUFFER_LIMIT = 1000
+    SECURITY_EVENT_RETENTION_DAYS = 90
+
+# Типы событий отчета /security_report и ключи словаря отчета
+REPORT_EVENT_TYPES = {
+    "FAILED_LOGIN": "failed_logins",
+    "SUSPICIOUS_ACTIVITY": "suspicious_activities",
+    "RATE_LIMIT_EXCEEDED": "rate_limit_exceeded",
+    "USER_BANNED": "user_bans",
+    "UNAUTHORIZED_ACCESS": "unauthorized_access",
+    "INPUT_VALIDATION_FAILED": "input_validation_failed"
+}
+
+# Глубина счетчиков в памяти: минутные корзины за сутки
+SECURITY_COUNTER_MINUTES = 24 * 60
+
+class SecurityEventBuffer:
+    """
+    Буфер событий безопасности перед записью в таблицу security_events.
+    Запись события — append в список под блокировкой, без ввода-вывода; фоновый поток
+    раз в SECURITY_EVENT_FLUSH_INTERVAL пишет накопленное одной транзакцией.
+    Без потока (скрипты, тесты) или при переполнении буфер сбрасывается на месте
+    """
+    
+    def __init__(self, flush_interval: float = SECURITY_EVENT_FLUSH_INTERVAL,
+                 limit: int = SECURITY_EVENT_BUFFER_LIMIT):
+        self.flush_interval = flush_interval
+        self.limit = max(1, limit)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._events = []
+        self._thread = None
+        self._stop_event = threading.Event()
+        self.is_running = False
+        self._stats = {"recorded": 0, "flushed": 0, "flushes": 0, "failed": 0}
+    
+    def record(self, event: tuple):
+        """Добавляет событие (ts, event_type, level, user_id, username, details)"""
+        with self._lock:
+            self._events.append(event)
+            self._stats["recorded"] += 1
+            overflow = len(self._events) >= self.limit
+        if overflow or not self.is_running:
+            self.flush()
+    
+    def flush(self) -> int:
+        """Пишет накопленные события в БД, возвращает их число"""
+        with self._flush_lock:
+            with self._lock:
+                events, self._events = self._events, []
+            if not events:
+                return 0
+            try:
+                add_security_events(events)
+            except Exception as e:
+                with self._lock:
+                    # Возвращаем пачку в начало буфера, чтобы не потерять события
+                    self._events[:0] = events[-self.limit:]
+                    self._stats["failed"] += 1
+                print(f"❌ Ошибка записи событий безопасности в БД: {e}")
+                return 0
+            with self._lock:
+                self._stats["flushed"] += len(events)
+                self._stats["flushes"] += 1
+            return len(events)
+    
+    def start(self):
+        if self.is_running:
             return
-        
-        # Проверяем размер файла в МБ
-        file_size_mb = os.path.getsize(log_file_path) / (1024 * 1024)
-        
-        if file_size_mb >= max_size_mb:
-            # Создаем имя для архива с датой
-            timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
-            archive_name = f"{log_file_path}.{timestamp}"
-            
-            # Переименовываем текущий файл
-            os.rename(log_file_path, archive_name)
-            
-            # Создаем новый пустой файл
-            with open(log_file_path, 'w', encoding='utf-8') as f:
-                pass
-            
-            print(f"📁 Security лог-файл ротирован: {log_file_path} → {archive_name} ({file_size_mb:.2f} МБ)")
-            
-    except Exception as e:
-        print(f"❌ Ошибка ротации security лог-файла: {e}")
+        self._stop_event.clear()
+        self.is_running = True
+        self._thread = threading.Thread(target=self._run, name="security-events", daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: float = 5.0):
+        self.is_running = False
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+    
+    def _run(self):
+        while not self._stop_event.wait(self.flush_interval):
+            self.flush()
+    
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["buffered"] = len(self._events)
+        return stats
+
+
+class RollingEventCounter:
+    """
+    Счетчики событий по типам в кольце минутных корзин (по умолчанию — сутки).
+    Корзина минуты m — ячейка m % size. Перед записью и чтением кольцо сдвигается
+    до текущей минуты: корзины прошедших минут обнуляются, поэтому в кольце всегда
+    только последние size минут. Запись — O(1), сумма за все кольцо хранится готовой,
+    окно короче кольца суммируется срезами списка. Точность окна — одна минута
+    """
+    
+    def __init__(self, minutes: int = SECURITY_COUNTER_MINUTES):
+        self.size = max(1, minutes)
+        self._lock = threading.Lock()
+        self._counts = {}          # event_type -> [count] * size
+        self._totals = {}          # event_type -> сумма по кольцу
+        self._head = int(time.time() // 60)
+    
+    def _advance(self, minute: int):
+        # Под self._lock
+        if minute <= self._head:
+            return
+        start = max(self._head + 1, minute - self.size + 1)
+        for m in range(start, minute + 1):
+            i = m % self.size
+            for event_type, counts in self._counts.items():
+                if counts[i]:
+                    self._totals[event_type] -= counts[i]
+                    counts[i] = 0
+        self._head = minute
+    
+    def add(self, event_type: str, ts: float = None, count: int = 1):
+        """Учитывает событие в корзине его минуты; события старше кольца отбрасываются"""
+        minute = int((time.time() if ts is None else ts) // 60)
+        with self._lock:
+            self._advance(minute)
+            if minute <= self._head - self.size:
+                return
+            counts = self._counts.get(event_type)
+            if counts is None:
+                counts = self._counts[event_type] = [0] * self.size
+                self._totals[event_type] = 0
+            counts[minute % self.size] += count
+            self._totals[event_type] += count
+    
+    def counts(self, minutes: int = None) -> Dict[str, int]:
+        """Число событий каждого типа за последние minutes минут (не больше размера кольца)"""
+        minutes = self.size if minutes is None else max(0, min(int(minutes), self.size))
+        with self._lock:
+            self._advance(int(time.time() // 60))
+            if minutes == self.size:
+                return dict(self._totals)
+            # Последние minutes ячеек, заканчивая текущей минутой: один или два среза
+            end = self._head % self.size + 1
+            start = end - minutes
+            result = {}
+            for event_type, counts in self._counts.items():
+                if start >= 0:
+                    result[event_type] = sum(counts[start:end])
+                else:
+                    result[event_type] = sum(counts[start:]) + sum(counts[:end])
+            return result
+    
+    def rebuild(self, rows):
+        """Заполняет кольцо заново из [(event_type, minute, count)]"""
+        with self._lock:
+            self._counts = {}
+            self._totals = {}
+            self._head = int(time.time() // 60)
+        for event_type, minute, count in rows:
+            self.add(event_type, minute * 60, count)
+
 
 class SecurityLogger:
-    """Специализированный логгер для событий безопасности"""
+    """
+    Специализированный логгер для событий безопасности.
+    Каждое событие пишется строкой в security.log и записью в таблицу security_events
+    (через SecurityEventBuffer) и учитывается в счетчиках RollingEventCounter.
+    Отчет за окно до суток берется из счетчиков, длиннее — из таблицы; выгрузка
+    читает таблицу по индексу
+    """
     
     def __init__(self, log_file: str = "security.log"): 
         self.log_file = log_file
-        
-        # Ротируем security лог-файл если он слишком большой
-        rotate_security_log(self.log_file, max_size_mb=1)
-        
         self.logger = self._setup_security_logger()
+        self.events = SecurityEventBuffer()
+        self.counters = RollingEventCounter()
      
     def _setup_security_logger(self) -> logging.Logger:
-        """Настройка логгера безопасности"""
-        logger = logging.getLogger('security')
-        logger.setLevel(logging.INFO)
-        
-        # Очищаем существующие обработчики
-        logger.handlers.clear()
-        
-        # Создаем форматтер для безопасности
-        formatter = logging.Formatter(
-            '%(asctime)s - SECURITY - %(levelname)s - %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
+        """
+        Логгер безопасности из общего реестра: свой файл с ротацией,
+        в консоль — только WARNING и выше
+        """
+        return setup_logger(
+            'security',
+            log_file=self.log_file,
+            fmt='%(asctime)s - SECURITY - %(levelname)s - %(message)s',
+            console_level=logging.WARNING,
+            level=logging.INFO
         )
-        
-        # Обработчик для файла безопасности
-        file_handler = logging.FileHandler(self.log_file, encoding='utf-8')
-        file_handler.setLevel(logging.INFO)
-        file_handler.setFormatter(formatter)
-        
-        # Обработчик для консоли (только критические события)
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(logging.WARNING)
-        console_handler.setFormatter(formatter)
-        
-        logger.addHandler(file_handler)
-        logger.addHandler(console_handler)
-        
-        return logger
+    
+    def _log(self, level: int, event_type: str, user_id, username, message: str):
+        """Строка в security.log и событие в буфер хранилища"""
+        try:
+            user_id = int(user_id) if user_id is not None else None
+        except (TypeError, ValueError):
+            user_id = None
+        self.logger.log(level, message, extra={"event_type": event_type, "user_id": user_id})
+        ts = time.time()
+        self.counters.add(event_type, ts)
+        self.events.record((int(ts), event_type, logging.getLevelName(level), user_id, username, message))
     
     def log_failed_login(self, user_id: int, username: str, reason: str, ip: str = "unknown"):
         """Логирование неудачной попытки входа"""
-        self.logger.warning(
+        self._log(
+            logging.WARNING, "FAILED_LOGIN", user_id, username,
             f"FAILED_LOGIN - User: {user_id} (@{username}) - Reason: {reason} - IP: {ip}"
         )
     
     def log_suspicious_activity(self, user_id: int, username: str, activity: str, details: str):
         """Логирование подозрительной активности"""
-        self.logger.warning(
+        self._log(
+            logging.WARNING, "SUSPICIOUS_ACTIVITY", user_id, username,
             f"SUSPICIOUS_ACTIVITY - User: {user_id} (@{username}) - Activity: {activity} - Details: {details}"
         )
     
     def log_rate_limit_exceeded(self, user_id: int, username: str, limit: int, time_window: int):
         """Логирование превышения rate limit"""
-        self.logger.info(
+        self._log(
+            logging.INFO, "RATE_LIMIT_EXCEEDED", user_id, username,
             f"RATE_LIMIT_EXCEEDED - User: {user_id} (@{username}) - Limit: {limit}/{time_window}s"
         )
     
     def log_user_banned(self, user_id: int, username: str, reason: str, banned_by: str = "system"):
         """Логирование бана пользователя"""
-        self.logger.warning(
+        self._log(
+            logging.WARNING, "USER_BANNED", user_id, username,
             f"USER_BANNED - User: {user_id} (@{username}) - Reason: {reason} - Banned by: {banned_by}"
         )
     
     def log_admin_action(self, admin_id: int, username: str, action: str, target: str = None):
         """Логирование действий администратора"""
         target_info = f" - Target: {target}" if target else ""
-        self.logger.info(
+        self._log(
+            logging.INFO, "ADMIN_ACTION", admin_id, username,
             f"ADMIN_ACTION - Admin: {admin_id} (@{username}) - Action: {action}{target_info}"
         )
     
     def log_unauthorized_access(self, user_id: int, username: str, resource: str, action: str):
         """Логирование несанкционированного доступа"""
-        self.logger.warning(
+        self._log(
+            logging.WARNING, "UNAUTHORIZED_ACCESS", user_id, username,
             f"UNAUTHORIZED_ACCESS - User: {user_id} (@{username}) - Resource: {resource} - Action: {action}"
         )
     
@@ -114,14 +268,16 @@ class SecurityLogger:
         """Логирование неудачной валидации входных данных"""
         # Маскируем чувствительные данные
         masked_value = self._mask_sensitive_data(value, input_type)
-        self.logger.info(
+        self._log(
+            logging.INFO, "INPUT_VALIDATION_FAILED", user_id, username,
             f"INPUT_VALIDATION_FAILED - User: {user_id} (@{username}) - Type: {input_type} - Value: {masked_value} - Error: {error}"
         )
     
     def log_security_event(self, event_type: str, user_id: int, username: str, details: Dict[str, Any]):
         """Логирование общего события безопасности"""
         details_str = " - ".join([f"{k}: {v}" for k, v in details.items()])
-        self.logger.info(
+        self._log(
+            logging.INFO, "SECURITY_EVENT", user_id, username,
             f"SECURITY_EVENT - Type: {event_type} - User: {user_id} (@{username}) - Details: {details_str}"
         )
     
@@ -129,7 +285,8 @@ class SecurityLogger:
         """Логирование критического нарушения безопасности"""
         user_info = f" - User: {user_id} (@{username})" if user_id else ""
         additional_info = f" - Additional: {additional_data}" if additional_data else ""
-        self.logger.critical(
+        self._log(
+            logging.CRITICAL, "CRITICAL_SECURITY_BREACH", user_id, username,
             f"CRITICAL_SECURITY_BREACH - {description}{user_info}{additional_info}"
         )
     
@@ -161,47 +318,22 @@ class SecurityLogger:
             return "*" * len(value)
     
     def get_security_report(self, hours: int = 24) -> Dict[str, int]:
-        """Получение отчета по событиям безопасности за последние N часов (без действий админа)"""
+        """
+        Отчет по событиям безопасности за последние N часов (без действий админа).
+        Окно до суток считается по минутным счетчикам в памяти, длиннее — GROUP BY
+        по индексу (event_type, ts) в таблице security_events
+        """
+        events = {key: 0 for key in REPORT_EVENT_TYPES.values()}
         try:
-            from datetime import datetime, timedelta
-            cutoff_time = datetime.now() - timedelta(hours=hours)
-            events = {
-                "failed_logins": 0,
-                "suspicious_activities": 0,
-                "rate_limit_exceeded": 0,
-                "user_bans": 0,
-                "unauthorized_access": 0,
-                "input_validation_failed": 0
-            }
-            if not os.path.exists(self.log_file):
-                return events
-            with open(self.log_file, 'r', encoding='utf-8') as f:
-                for line in f:
-                    try:
-                        parts = line.split(' - ')
-                        if len(parts) >= 3:
-                            log_time_str = parts[0]
-                            log_time = datetime.strptime(log_time_str, '%Y-%m-%d %H:%M:%S')
-                            if log_time < cutoff_time:
-                                continue
-                            # Пропускаем действия админа
-                            if "ADMIN_ACTION" in line and f"Admin: {ADMIN_ID}" in line:
-                                continue
-                            if "FAILED_LOGIN" in line:
-                                events["failed_logins"] += 1
-                            if "SUSPICIOUS_ACTIVITY" in line:
-                                events["suspicious_activities"] += 1
-                            if "RATE_LIMIT_EXCEEDED" in line:
-                                events["rate_limit_exceeded"] += 1
-                            if "USER_BANNED" in line:
-                                events["user_bans"] += 1
-                            if "UNAUTHORIZED_ACCESS" in line:
-                                events["unauthorized_access"] += 1
-                            if "INPUT_VALIDATION_FAILED" in line:
-                                events["input_validation_failed"] += 1
-                    except Exception as parse_error:
-                        self.logger.debug(f"Error parsing log line: {parse_error}, Line: {line.strip()}")
-                        continue
+            minutes = hours * 60
+            if minutes <= self.counters.size:
+                counts = self.counters.counts(minutes)
+            else:
+                self.events.flush()
+                counts = count_security_events(time.time() - hours * 3600, list(REPORT_EVENT_TYPES))
+            for event_type, count in counts.items():
+                if event_type in REPORT_EVENT_TYPES:
+                    events[REPORT_EVENT_TYPES[event_type]] = count
             return events
         except Exception as e:
             self.logger.error(f"Error generating security report: {e}")
@@ -209,55 +341,64 @@ class SecurityLogger:
     
     def export_security_log_to_xls(self, filepath: str, hours: int = 24) -> int:
         """Экспортирует события безопасности за последние N часов в XLS-файл (без действий админа)"""
-        from datetime import datetime, timedelta
-        cutoff_time = datetime.now() - timedelta(hours=hours)
-        events = []
-        if not os.path.exists(self.log_file):
-            return 0
-        with open(self.log_file, 'r', encoding='utf-8') as f:
-            for line in f:
-                try:
-                    parts = line.split(' - ')
-                    if len(parts) >= 4:
-                        log_time_str = parts[0]
-                        log_time = datetime.strptime(log_time_str, '%Y-%m-%d %H:%M:%S')
-                        if log_time < cutoff_time:
-                            continue
-                        # Пропускаем действия админа
-                        if "ADMIN_ACTION" in line and f"Admin: {ADMIN_ID}" in line:
-                            continue
-                        event_type = parts[3].strip()
-                        details = ' - '.join(parts[4:]).strip() if len(parts) > 4 else ''
-                        # Пытаемся вытащить user_id и username
-                        user_id = ''
-                        username = ''
-                        m = re.search(r'User: (\d+)', details)
-                        if m:
-                            user_id = m.group(1)
-                        m2 = re.search(r'@([\w_]+)', details)
-                        if m2:
-                            username = m2.group(1)
-                        events.append([
-                            log_time.strftime('%Y-%m-%d %H:%M:%S'),
-                            event_type,
-                            user_id,
-                            username,
-                            details
-                        ])
-                except Exception as e:
-                    continue
-        # Создаем XLS
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = f"SecurityLog_{hours}h"
-        headers = ["Время", "Тип события", "User ID", "Username", "Детали"]
-        ws.append(headers)
-        for cell in ws[1]:
+        self.events.flush()
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet(f"SecurityLog_{hours}h")
+        header = []
+        for title in ["Время", "Тип события", "User ID", "Username", "Детали"]:
+            cell = WriteOnlyCell(ws, value=title)
             cell.font = Font(bold=True)
-        for row in events:
-            ws.append(row)
-        wb.save(filepath)
-        return len(events)
+            header.append(cell)
+        ws.append(header)
+        count = 0
+        # Диапазон по индексу ts, строки читаются пачками
+        for _, ts, event_type, _, user_id, username, details in iter_security_events(
+                time.time() - hours * 3600, exclude_admin_id=ADMIN_ID):
+            ws.append([
+                datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S'),
+                event_type,
+                user_id if user_id is not None else '',
+                username or '',
+                details
+            ])
+            count += 1
+        if count:
+            wb.save(filepath)
+        return count
+    
+    def rebuild_counters(self) -> int:
+        """Восстанавливает минутные счетчики из таблицы (при запуске), возвращает число событий"""
+        self.events.flush()
+        rows = count_security_events_by_minute(time.time() - self.counters.size * 60)
+        self.counters.rebuild(rows)
+        return sum(count for _, _, count in rows)
+    
+    def cleanup_old_events(self, days: int = SECURITY_EVENT_RETENTION_DAYS) -> int:
+        """Удаляет из хранилища события старше days дней"""
+        return delete_security_events_before(time.time() - days * 86400)
 
 # Глобальный экземпляр логгера безопасности
-security_logger = SecurityLogger() 
\ No newline at end of file
+security_logger = SecurityLogger()
+
+def init_security_event_store():
+    """
+    Запускает фоновую запись событий безопасности, восстанавливает счетчики
+    за последние сутки и удаляет устаревшие события
+    """
+    security_logger.events.start()
+    try:
+        restored = security_logger.rebuild_counters()
+        print(f"✅ Счетчики событий безопасности восстановлены ({restored} событий за сутки)")
+    except Exception as e:
+        print(f"⚠️ Не удалось восстановить счетчики событий безопасности: {e}")
+    try:
+        removed = security_logger.cleanup_old_events()
+        if removed:
+            print(f"🧹 Удалено {removed} событий безопасности старше {SECURITY_EVENT_RETENTION_DAYS} дней")
+    except Exception as e:
+        print(f"⚠️ Не удалось очистить старые события безопасности: {e}")
+    return security_logger.events
+
+def stop_security_event_store():
+    """Останавливает фоновую запись и сбрасывает буфер в БД"""
+    security_logger.events.stop()